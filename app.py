@@ -1,453 +1,17 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from ortools.sat.python import cp_model
 from datetime import datetime, timedelta
-import io
+import time
 
-# ==============================================================================
-# 1. CONFIGURAZIONE COSTANTI & REGOLE
-# ==============================================================================
-
-STAFF_SOLO_MATTINA = ["Giuseppe Sergi", "Piero Cappi", "Marco Salierno"]
-ROTAZIONE_ORDINE = [
-    "Matteo Costanzi", "Augusto Novelli", "Paolo Nucci", "Fabrizio Loria",
-    "Walter Araujo", "Alberto Rink", "Marco Celentano", "Marco Lorentino",
-    "Simone Esposito"
-]
-STAFF_NOTTE = ROTAZIONE_ORDINE.copy()
-STAFF_ODDS = ["Walter Savino", "Gennaro Auriemma", "Claudio Condemi", "Michele di Chiaro", "Aytac Yener", "Klajd Goxho"]
-LISTA_ACCETTATORI = ["Giuseppe Sergi", "Antonio Mandica", "Matteo Costanzi", "Piero Cappi", "Fabrizio Loria", "Augusto Novelli", "Paolo Nucci", "Marco Salierno", "Marco Mirabella", "Alberto Rink", "Marco Lorentino", "Walter Araujo", "Marco Celentano", "Simone Esposito"]
-STAFF_SOLO_POMERIGGIO = ["Simone Esposito"]
-STAFF_EXTRA = ["Antonio Mandica", "Marco Mirabella"]
-
-ALL_STAFF = list(set(STAFF_SOLO_MATTINA + STAFF_NOTTE + STAFF_ODDS + STAFF_EXTRA + STAFF_SOLO_POMERIGGIO))
-ALL_STAFF.sort()
-NUM_STAFF = len(ALL_STAFF)
-
-GIORNI_SETT_IT = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
-
-TEXT_TO_ID = {
-    "-": 0, "FERIE": 0, "REQ": 0, "ASSENTE": 0,
-    "07:00": 1, "08:00": 2, "09:00": 3, "10:00": 4, "11:00": 5,
-    "12:00": 6, "15:00": 7, "16:00": 8, "17:00": 10,
-    "CHIUSURA": 9, "18-02": 9, "20-04": 9
-}
-
-TURNI_CONFIG = {
-    1:  {"txt": "07:00",    "cat": "M", "critico": 2, "ideale": 3, "bg": "#B4C6E7", "font": "#000000"},
-    2:  {"txt": "08:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#8EA9DB", "font": "#000000"},
-    3:  {"txt": "09:00",    "cat": "M", "critico": 1, "ideale": 1, "bg": "#305496", "font": "#FFFFFF"},
-    4:  {"txt": "10:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#D9E1F2", "font": "#000000"},
-    5:  {"txt": "11:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#E2EFDA", "font": "#000000"},
-    6:  {"txt": "12:00",    "cat": "M", "critico": 1, "ideale": 2, "bg": "#A9D08E", "font": "#000000"},
-    7:  {"txt": "15:00",    "cat": "L", "critico": 0, "ideale": 1, "bg": "#FFF2CC", "font": "#000000"},
-    8:  {"txt": "16:00",    "cat": "L", "critico": 3, "ideale": 3, "bg": "#FFD966", "font": "#000000"},
-    10: {"txt": "17:00",    "cat": "L", "critico": 0, "ideale": 1, "bg": "#F4B084", "font": "#000000"}, 
-    9:  {"txt": "CHIUSURA", "cat": "L", "critico": 1, "ideale": 1, "bg": "#C00000", "font": "#FFFFFF"},
-}
-RIPOSO_CFG = {"txt": "-", "bg": "#FFFFFF", "font": "#D3D3D3"}
-
-# ==============================================================================
-# 2. MOTORE DI CALCOLO
-# ==============================================================================
-
-def parse_uploaded_schedule(file, start_date_obj, num_days):
-    try:
-        df = pd.read_excel(file, header=0)
-        if 'Dipendente' not in df.columns: return None, "Colonna 'Dipendente' non trovata."
-        previous_matrix = {}
-        for idx, row in df.iterrows():
-            nome = row['Dipendente']
-            if nome not in ALL_STAFF: continue
-            col_idx = 0
-            for col_name in df.columns:
-                if any(x in str(col_name) for x in ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]):
-                    val_str = str(row[col_name]).strip()
-                    t_id = TEXT_TO_ID.get(val_str, 0)
-                    if val_str in ["FERIE", "REQ"]: t_id = 0
-                    if col_idx < num_days:
-                        previous_matrix[(nome, col_idx)] = t_id
-                        col_idx += 1
-        return previous_matrix, None
-    except Exception as e: return None, str(e)
-
-def solve_turni(start_date, weeks_to_generate, list_assenze, list_req_turni, previous_solution=None):
-    NUM_SETTIMANE = weeks_to_generate
-    NUM_GIORNI = 7 * NUM_SETTIMANE 
-    if isinstance(start_date, datetime): start_date = start_date
-    else: start_date = datetime.combine(start_date, datetime.min.time())
-    
-    FERIE_INDICI = {}
-    REQ_OFF_INDICI = {}
-    REQ_TURNI_INDICI = {}
-
-    for item in list_assenze:
-        nome = item['nome']
-        tipo = item['tipo']
-        d_input = item['data']
-        if not isinstance(d_input, datetime): d_input = datetime.combine(d_input, datetime.min.time())
-        delta = (d_input - start_date).days
-        if 0 <= delta < NUM_GIORNI:
-            if tipo == "Ferie": FERIE_INDICI.setdefault(nome, []).append(delta)
-            elif tipo == "Richiesta OFF": REQ_OFF_INDICI.setdefault(nome, []).append(delta)
-
-    for item in list_req_turni:
-        nome = item['nome']
-        d_input = item['data']
-        if not isinstance(d_input, datetime): d_input = datetime.combine(d_input, datetime.min.time())
-        t_id = int(str(item['turno']).split(" - ")[0])
-        delta = (d_input - start_date).days
-        if 0 <= delta < NUM_GIORNI: REQ_TURNI_INDICI.setdefault(nome, {})[delta] = t_id
-
-    model = cp_model.CpModel()
-    shifts = {}
-    for n in range(NUM_STAFF):
-        for d in range(NUM_GIORNI): shifts[(n, d)] = model.NewIntVar(0, 10, f's_{n}_{d}')
-
-    # APPLICAZIONI INPUT
-    for nome, indices in FERIE_INDICI.items():
-        if nome in ALL_STAFF:
-            n_idx = ALL_STAFF.index(nome)
-            for d in indices: model.Add(shifts[(n_idx, d)] == 0)
-    for nome, indices in REQ_OFF_INDICI.items():
-        if nome in ALL_STAFF:
-            n_idx = ALL_STAFF.index(nome)
-            for d in indices: model.Add(shifts[(n_idx, d)] == 0)
-    for nome, req_map in REQ_TURNI_INDICI.items():
-        if nome in ALL_STAFF:
-            n_idx = ALL_STAFF.index(nome)
-            for d, t_id in req_map.items(): model.Add(shifts[(n_idx, d)] == t_id)
-
-    # MODALITA' RIPARAZIONE
-    score_stability = 0
-    if previous_solution:
-        for n in range(NUM_STAFF):
-            nome = ALL_STAFF[n]
-            for d in range(NUM_GIORNI):
-                if (nome, d) in previous_solution:
-                    old_val = previous_solution[(nome, d)]
-                    is_now_ferie = (d in FERIE_INDICI.get(nome, []) or d in REQ_OFF_INDICI.get(nome, []))
-                    if not is_now_ferie:
-                        is_same = model.NewBoolVar(f'same_{n}_{d}')
-                        model.Add(shifts[(n, d)] == old_val).OnlyEnforceIf(is_same)
-                        model.Add(shifts[(n, d)] != old_val).OnlyEnforceIf(is_same.Not())
-                        score_stability += is_same * 500
-
-    # VINCOLI RUOLI
-    for n in range(NUM_STAFF):
-        nome = ALL_STAFF[n]
-        is_acceptor = nome in LISTA_ACCETTATORI
-        for d in range(NUM_GIORNI):
-            giorno_sett = d % 7
-            is_weekend = (giorno_sett == 5 or giorno_sett == 6)
-            is_weekend_night = (giorno_sett == 4 or giorno_sett == 5)
-
-            if nome == "Piero Cappi":
-                for t in [4, 5, 6, 7, 8, 10, 9]: model.Add(shifts[(n, d)] != t)
-                if not is_weekend: model.Add(shifts[(n, d)] != 2)
-                else: 
-                    model.Add(shifts[(n, d)] != 1)
-                    model.Add(shifts[(n, d)] != 2)
-            elif nome in STAFF_SOLO_MATTINA:
-                for t in [4, 5, 6, 7, 8, 10, 9]: model.Add(shifts[(n, d)] != t)
-            if nome in STAFF_SOLO_POMERIGGIO:
-                for t in [1, 2, 3, 4, 5]: model.Add(shifts[(n, d)] != t)
-            if nome in STAFF_ODDS:
-                model.Add(shifts[(n, d)] != 9)
-                model.Add(shifts[(n, d)] != 10)
-            if nome == "Marco Mirabella":
-                if is_weekend_night: model.Add(shifts[(n, d)] != 9)
-            elif nome not in STAFF_NOTTE:
-                model.Add(shifts[(n, d)] != 9)
-            if not is_acceptor:
-                model.Add(shifts[(n, d)] != 10)
-                model.Add(shifts[(n, d)] != 9)
-
-    for n in range(NUM_STAFF):
-        if ALL_STAFF[n] == "Simone Esposito":
-            for w in range(NUM_SETTIMANE):
-                s = w * 7; e = s + 7
-                count_12 = []
-                for d in range(s, e):
-                    if d < NUM_GIORNI:
-                        b = model.NewBoolVar(f'sim_12_{d}')
-                        model.Add(shifts[(n, d)] == 6).OnlyEnforceIf(b)
-                        model.Add(shifts[(n, d)] != 6).OnlyEnforceIf(b.Not())
-                        count_12.append(b)
-                model.Add(sum(count_12) <= 2)
-
-    for w in range(NUM_SETTIMANE):
-        idx_rot = w % len(ROTAZIONE_ORDINE)
-        nome_rot = ROTAZIONE_ORDINE[idx_rot]
-        ven = 4 + (w*7); sab = 5 + (w*7); dom = 6 + (w*7)
-        if ven < NUM_GIORNI:
-            skip_rot = False
-            if nome_rot in FERIE_INDICI and (ven in FERIE_INDICI[nome_rot] or sab in FERIE_INDICI[nome_rot]): skip_rot = True
-            if nome_rot in REQ_OFF_INDICI and (ven in REQ_OFF_INDICI[nome_rot] or sab in REQ_OFF_INDICI[nome_rot]): skip_rot = True
-            if nome_rot in ALL_STAFF and not skip_rot:
-                idx = ALL_STAFF.index(nome_rot)
-                model.Add(shifts[(idx, ven)] == 9)
-                if sab < NUM_GIORNI: model.Add(shifts[(idx, sab)] == 9)
-                if dom < NUM_GIORNI: model.Add(shifts[(idx, dom)] == 0)
-
-    score_coverage = 0 
-    score_balance = 0
-    score_weekend_balance = 0
-    staff_m_counts = [[] for _ in range(NUM_STAFF)]
-    staff_l_counts = [[] for _ in range(NUM_STAFF)]
-
-    for d in range(NUM_GIORNI):
-        counts = {t: [] for t in TURNI_CONFIG}
-        acc_eve = []
-        seniors = []
-        giorno_sett = d % 7
-        is_weekend_night = (giorno_sett == 4 or giorno_sett == 5)
-        
-        weight_day = 20
-        if giorno_sett == 5 or giorno_sett == 6: weight_day = 100 
-        elif giorno_sett == 0 or giorno_sett == 4: weight_day = 1   
-
-        for n in range(NUM_STAFF):
-            nome = ALL_STAFF[n]
-            for t in TURNI_CONFIG:
-                b = model.NewBoolVar(f'is_{t}_{n}_{d}')
-                model.Add(shifts[(n, d)] == t).OnlyEnforceIf(b)
-                model.Add(shifts[(n, d)] != t).OnlyEnforceIf(b.Not())
-                counts[t].append(b)
-                if TURNI_CONFIG[t]['cat'] == 'M': staff_m_counts[n].append(b)
-                elif TURNI_CONFIG[t]['cat'] == 'L': staff_l_counts[n].append(b)
-
-            if nome in LISTA_ACCETTATORI:
-                v_eve = model.NewBoolVar(f'acc_eve_{n}_{d}')
-                model.Add(shifts[(n, d)] >= 8).OnlyEnforceIf(v_eve)
-                model.Add(shifts[(n, d)] < 8).OnlyEnforceIf(v_eve.Not())
-                acc_eve.append(v_eve)
-                v_pres = model.NewBoolVar(f'pres_{n}_{d}')
-                model.Add(shifts[(n, d)] > 0).OnlyEnforceIf(v_pres)
-                model.Add(shifts[(n, d)] == 0).OnlyEnforceIf(v_pres.Not())
-                seniors.append(v_pres)
-
-        if is_weekend_night: model.Add(sum(counts[10]) == 1)
-        else: model.Add(sum(counts[10]) == 0)
-        model.Add(sum(counts[9]) == 1)
-
-        for t, cfg in TURNI_CONFIG.items():
-            if t == 10 or t == 9: continue
-            if cfg['critico'] > 0: model.Add(sum(counts[t]) >= cfg['critico'])
-            if cfg['ideale'] > cfg['critico'] or cfg['critico'] == 0:
-                covered = model.NewBoolVar(f'cov_{t}_{d}')
-                model.Add(sum(counts[t]) >= cfg['ideale']).OnlyEnforceIf(covered)
-                weight_shift = 10
-                if t == 1: weight_shift = 50 
-                elif t == 7: weight_shift = 5 
-                score_coverage += covered * weight_day * weight_shift
-
-        model.Add(sum(acc_eve) >= 2)
-        model.Add(sum(seniors) >= 3)
-
-    for n in range(NUM_STAFF):
-        nome = ALL_STAFF[n]
-        if nome not in STAFF_SOLO_MATTINA and nome not in STAFF_SOLO_POMERIGGIO:
-            tot_m = sum(staff_m_counts[n])
-            tot_l = sum(staff_l_counts[n])
-            diff = model.NewIntVar(0, NUM_GIORNI, f'diff_ml_{n}')
-            model.Add(diff >= tot_m - tot_l)
-            model.Add(diff >= tot_l - tot_m)
-            score_balance -= diff * 5
-
-    for n in range(NUM_STAFF):
-        we_days_worked = []
-        for w in range(NUM_SETTIMANE):
-            idx_sab = 5 + (w * 7); idx_dom = 6 + (w * 7)
-            if idx_dom < NUM_GIORNI:
-                is_we_active = model.NewBoolVar(f'we_act_{n}_{w}')
-                model.Add(shifts[(n, idx_sab)] + shifts[(n, idx_dom)] > 0).OnlyEnforceIf(is_we_active)
-                model.Add(shifts[(n, idx_sab)] + shifts[(n, idx_dom)] == 0).OnlyEnforceIf(is_we_active.Not())
-                we_days_worked.append(is_we_active)
-        tot_we = sum(we_days_worked)
-        excess = model.NewIntVar(0, NUM_SETTIMANE, f'exc_we_{n}')
-        model.Add(tot_we <= int(NUM_SETTIMANE * 0.7) + excess)
-        score_weekend_balance -= excess * 50
-
-    for n in range(NUM_STAFF):
-        for d in range(NUM_GIORNI - 1):
-            is_weekend_night = ((d % 7) == 4 or (d % 7) == 5)
-            if is_weekend_night: 
-                for v in [1, 2, 3, 4, 5, 6]: model.AddForbiddenAssignments([shifts[(n, d)], shifts[(n, d+1)]], [(9, v)])
-            else:
-                 for v in [1, 2, 3, 4, 5, 6]: model.AddForbiddenAssignments([shifts[(n, d)], shifts[(n, d+1)]], [(9, v)])
-            for v in [1, 2, 3, 4, 5]: model.AddForbiddenAssignments([shifts[(n, d)], shifts[(n, d+1)]], [(10, v)])
-            for v in [1, 2, 3, 4]: model.AddForbiddenAssignments([shifts[(n, d)], shifts[(n, d+1)]], [(8, v)])
-            for v in [1, 2, 3]: model.AddForbiddenAssignments([shifts[(n, d)], shifts[(n, d+1)]], [(7, v)])
-
-        for w in range(NUM_SETTIMANE):
-            s = w*7; e = s+7
-            giorni_ferie_sett = 0
-            if ALL_STAFF[n] in FERIE_INDICI:
-                for fd in FERIE_INDICI[ALL_STAFF[n]]:
-                    if s <= fd < e: giorni_ferie_sett += 1
-            if ALL_STAFF[n] in REQ_OFF_INDICI:
-                for fd in REQ_OFF_INDICI[ALL_STAFF[n]]:
-                    if s <= fd < e: giorni_ferie_sett += 1
-            target = max(0, 5 - giorni_ferie_sett)
-            worked = []
-            for d in range(s, min(e, NUM_GIORNI)):
-                bw = model.NewBoolVar(f'wk_{n}_{d}')
-                model.Add(shifts[(n, d)] > 0).OnlyEnforceIf(bw)
-                model.Add(shifts[(n, d)] == 0).OnlyEnforceIf(bw.Not())
-                worked.append(bw)
-            model.Add(sum(worked) == target)
-        
-        for d in range(NUM_GIORNI - 6):
-            window = [model.NewBoolVar(f'w_{n}_{d+k}') for k in range(6)]
-            for k in range(6):
-                model.Add(shifts[(n, d+k)] > 0).OnlyEnforceIf(window[k])
-                model.Add(shifts[(n, d+k)] == 0).OnlyEnforceIf(window[k].Not())
-            model.Add(sum(window) <= 5)
-
-    for d in range(NUM_GIORNI):
-        for nome in ["Giuseppe Sergi", "Marco Salierno"]:
-            if nome in ALL_STAFF:
-                i = ALL_STAFF.index(nome)
-                b = model.NewBoolVar(f'p7_{d}_{i}')
-                model.Add(shifts[(i, d)] == 1).OnlyEnforceIf(b)
-                score_coverage += b * 5
-
-    model.Maximize(score_coverage + score_balance + score_weekend_balance + score_stability)
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 300
-    status = solver.Solve(model)
-
-    if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-        output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        workbook = writer.book
-        sheet = workbook.add_worksheet("Turni")
-        
-        fmt_base = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter'})
-        fmt_head = workbook.add_format({'border': 1, 'bold': True, 'bg_color': '#E7E6E6', 'align': 'center'})
-        fmt_name = workbook.add_format({'border': 1, 'bold': True, 'align': 'left', 'valign': 'vcenter'})
-        fmt_pct = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'num_format': '0%'})
-        fmt_total = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bold': True, 'bg_color': '#FFFF00'})
-        fmt_ferie = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#595959', 'font_color': '#FFFFFF', 'bold': True})
-        fmt_req = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#E4DFEC', 'font_color': '#000000', 'bold': True})
-        
-        formats = {}
-        formats[0] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': RIPOSO_CFG['bg'], 'font_color': RIPOSO_CFG['font']})
-        for t, cfg in TURNI_CONFIG.items():
-            formats[t] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': cfg['bg'], 'font_color': cfg['font']})
-        
-        formats_req_shift = {}
-        for t, cfg in TURNI_CONFIG.items():
-            formats_req_shift[t] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': cfg['bg'], 'font_color': '#0000CC', 'bold': True})
-
-        headers_cal = ['Ruolo', 'Dipendente']
-        for d in range(NUM_GIORNI):
-            curr_date = start_date + timedelta(days=d)
-            day_str = GIORNI_SETT_IT[d % 7]
-            date_str = curr_date.strftime("%d/%m")
-            headers_cal.append(f"{day_str} {date_str}")
-        
-        shift_ids = sorted(TURNI_CONFIG.keys())
-        headers_stats = ["Tot", "Weekend", "Mat %", "Sera %", "Bilancio"] + [TURNI_CONFIG[t]['txt'] for t in shift_ids]
-        sheet.write_row(0, 0, headers_cal + headers_stats, fmt_head)
-
-        sorted_staff = sorted(ALL_STAFF, key=lambda x: (
-            0 if x in STAFF_SOLO_MATTINA else 
-            1 if x == "Simone Esposito" else 
-            2 if x in STAFF_NOTTE else 
-            3 if x in STAFF_ODDS else 4
-        ))
-
-        r = 1
-        daily_staff_count = {d: 0 for d in range(NUM_GIORNI)}
-        daily_shift_breakdown = {t: {d: 0 for d in range(NUM_GIORNI)} for t in TURNI_CONFIG}
-
-        for nome in sorted_staff:
-            n = ALL_STAFF.index(nome)
-            role = "Staff"
-            if nome in STAFF_SOLO_MATTINA: role = "Solo Mattina"
-            elif nome == "Simone Esposito": role = "Solo Pom"
-            elif nome in STAFF_NOTTE: role = "Team Notte"
-            elif nome in STAFF_ODDS: role = "Odds"
-            elif nome in LISTA_ACCETTATORI: role = "Accettatore"
-
-            sheet.write(r, 0, role, fmt_base)
-            sheet.write(r, 1, nome, fmt_name)
-
-            cnt_tot, cnt_m, cnt_l = 0, 0, 0
-            p_counts = {t: 0 for t in TURNI_CONFIG}
-            weekend_worked = 0
-
-            for d in range(NUM_GIORNI):
-                val = solver.Value(shifts[(n, d)])
-                if val > 0:
-                    cnt_tot += 1
-                    daily_staff_count[d] += 1
-                    daily_shift_breakdown[val][d] += 1
-                    p_counts[val] += 1
-                    if TURNI_CONFIG[val]['cat'] == 'M': cnt_m += 1
-                    elif TURNI_CONFIG[val]['cat'] == 'L': cnt_l += 1
-                
-                is_ferie = nome in FERIE_INDICI and d in FERIE_INDICI[nome]
-                is_req = nome in REQ_OFF_INDICI and d in REQ_OFF_INDICI[nome]
-                is_req_turn = False
-                if nome in REQ_TURNI_INDICI and d in REQ_TURNI_INDICI[nome]:
-                    if REQ_TURNI_INDICI[nome][d] == val: is_req_turn = True
-
-                if is_ferie: sheet.write(r, d+2, "FERIE", fmt_ferie)
-                elif is_req: sheet.write(r, d+2, "REQ", fmt_req)
-                else:
-                    txt = TURNI_CONFIG[val]['txt'] if val > 0 else "-"
-                    if val == 9: txt = "20-04" if (d%7) in [4, 5] else "18-02"
-                    
-                    used_fmt = formats_req_shift[val] if is_req_turn and val > 0 else formats[val]
-                    sheet.write(r, d+2, txt, used_fmt)
-            
-            for w in range(NUM_SETTIMANE):
-                sab_idx = 5+w*7
-                dom_idx = 6+w*7
-                if sab_idx < NUM_GIORNI:
-                    v_s = solver.Value(shifts[(n, sab_idx)])
-                    v_d = 0
-                    if dom_idx < NUM_GIORNI: v_d = solver.Value(shifts[(n, dom_idx)])
-                    if v_s > 0 or v_d > 0: weekend_worked += 1
-
-            col = NUM_GIORNI + 2
-            sheet.write(r, col, cnt_tot, fmt_base)
-            sheet.write(r, col+1, weekend_worked, fmt_base)
-            sheet.write(r, col+2, cnt_m/cnt_tot if cnt_tot else 0, fmt_pct)
-            sheet.write(r, col+3, cnt_l/cnt_tot if cnt_tot else 0, fmt_pct)
-            
-            bal = "OK"
-            if abs((cnt_m/cnt_tot if cnt_tot else 0) - (cnt_l/cnt_tot if cnt_tot else 0)) > 0.4: bal = "Sbil."
-            if role in ["Solo Mattina", "Solo Pom"]: bal = "Fix"
-            sheet.write(r, col+4, bal, fmt_base)
-            
-            off = 5
-            for t_id in shift_ids:
-                sheet.write(r, col+off, p_counts[t_id], fmt_base)
-                off += 1
-            r += 1
-
-        r += 2
-        sheet.write(r, 1, "STAFF AL LAVORO:", fmt_total)
-        for d in range(NUM_GIORNI): sheet.write(r, d+2, daily_staff_count[d], fmt_total)
-        r += 2
-        sheet.write(r, 1, "DETTAGLIO ORARI:", fmt_head)
-        r += 1
-        for t_id in shift_ids:
-            sheet.write(r, 1, TURNI_CONFIG[t_id]['txt'], formats[t_id])
-            for d in range(NUM_GIORNI):
-                sheet.write(r, d+2, daily_shift_breakdown[t_id][d], fmt_base)
-            r += 1
-
-        sheet.set_column(0, 1, 20)
-        sheet.set_column(2, NUM_GIORNI+2, 5)
-        writer.close()
-        return output
-    else:
-        return None
+from turni.archivio import Archivio
+from turni.config import ALL_STAFF, ORGANICO, PROFILI_SOLVER, TURNI_CONFIG
+from turni.importa import MANCANTE, leggi_piano
+from turni.esporta import FORMATI_TABELLA, TESTI, esporta_tabella, matrice_da_soluzione
+from turni.regole import testo_giorno
+from turni.jobs import GestoreJob, IN_CODA, IN_ESECUZIONE, COMPLETATO, FALLITO, ANNULLATO
+from turni.scenari import (BASE, TURNI, Scenario, EsitoScenario, calcolo_base, calcoli_scenari, esito_job,
+                           scoperture, tabella_confronto)
 
 # ==============================================================================
 # UI STREAMLIT
@@ -457,8 +21,205 @@ st.set_page_config(page_title="Gestore Turni Pro", layout="wide")
 st.title("🧩 Gestore Turni Avanzato")
 
 st.sidebar.header("Impostazioni Generali")
+if ORGANICO.sede: st.sidebar.caption(f"Sede: {ORGANICO.sede} ({len(ALL_STAFF)} dipendenti)")
 start_d = st.sidebar.date_input("Data Inizio Calendario", datetime(2026, 1, 5))
-weeks_num = st.sidebar.slider("Numero di Settimane", min_value=1, max_value=12, value=9)
+weeks_num = st.sidebar.slider("Numero di Settimane", min_value=1, max_value=52, value=9)
+MODELLI = {"Booleano (one-hot)": "bool", "Intero (storico)": "int"}
+model_backend = MODELLI[st.sidebar.selectbox("Modello", list(MODELLI))]
+settimane_blocco = st.sidebar.number_input("Settimane per blocco (orizzonte mobile, 0 = modello unico)", min_value=0,
+                                           max_value=12, value=0 if weeks_num <= 12 else 4, disabled=model_backend != "bool",
+                                           help="Oltre le 12 settimane il piano va calcolato a blocchi, con il modello booleano.")
+if model_backend != "bool": settimane_blocco = 0  # l'orizzonte mobile esiste solo per il modello bool
+sovrapposizione = st.sidebar.number_input("Settimane di sovrapposizione tra blocchi", min_value=0, max_value=4, value=1,
+                                          disabled=not settimane_blocco)
+profilo = st.sidebar.selectbox("Profilo di calcolo", list(PROFILI_SOLVER), index=1,
+                               format_func=lambda k: f"{PROFILI_SOLVER[k]['label']} (max {PROFILI_SOLVER[k]['max_time']} s)")
+OBIETTIVI_UI = {"Pesato (una sola ricerca)": "pesato", "A fasi: copertura, poi stabilita', poi equilibrio": "a_fasi"}
+obiettivo = OBIETTIVI_UI[st.sidebar.selectbox("Obiettivo", list(OBIETTIVI_UI),
+                                              help="A fasi ogni livello raggiunto resta fisso nelle fasi successive.")]
+simmetrie = st.sidebar.checkbox("Rompi le simmetrie tra dipendenti intercambiabili", value=False,
+                                help="Chi ha stessi ruoli, assenze e richieste riceve le righe in un ordine fisso: "
+                                     "il solver non ne prova le permutazioni.")
+report_sheet = st.sidebar.checkbox("Foglio 'Statistiche' nell'Excel", value=False)
+usa_storico = st.sidebar.checkbox("Equilibrio anche sui piani gia' pubblicati", value=False, disabled=model_backend != "bool",
+                                  help="Weekend e mattine/sere contano anche le settimane pubblicate nell'archivio; "
+                                       "riposi e giorni consecutivi proseguono dal piano precedente. Solo modello booleano.")
+settimane_storico = st.sidebar.number_input("Settimane di storico (0 = tutto l'archivio)", min_value=0, max_value=104, value=12,
+                                            disabled=not usa_storico)
+
+@st.cache_resource
+def archivio():
+    """Archivio SQLite dei piani pubblicati, condiviso da tutte le sessioni."""
+    return Archivio()
+
+def storico():
+    """Contesto dei piani pubblicati prima di start_d, se richiesto dalla sidebar."""
+    if not usa_storico or model_backend != "bool": return None
+    return archivio().contesto(start_d, int(settimane_storico) or None)
+
+@st.cache_resource
+def gestore_job():
+    """Coda di calcolo condivisa da tutte le sessioni del server."""
+    return GestoreJob()
+
+st.sidebar.caption(f"Calcoli in esecuzione sul server: {sum(1 for j in gestore_job().elenco() if j.stato == IN_ESECUZIONE)}"
+                   f"/{gestore_job().max_concorrenti}")
+
+def avvia_job(chiave, descrizione, **kwargs):
+    """Accoda il calcolo e ricorda l'id in sessione e nell'URL, cosi' sopravvive al reload."""
+    job_id = gestore_job().invia(descrizione, **kwargs)
+    st.session_state[chiave] = job_id
+    st.query_params[chiave] = job_id
+
+def pannello_job(chiave, nome_file):
+    """Stato del job della scheda: progresso live se attivo, altrimenti l'esito."""
+    if chiave not in st.session_state and chiave in st.query_params:
+        st.session_state[chiave] = st.query_params[chiave]
+    job_id = st.session_state.get(chiave)
+    if not job_id: return
+    job = gestore_job().job(job_id)
+    if job is None:
+        st.warning("Calcolo non piu' disponibile sul server.")
+    elif job.attivo:
+        progresso_job(chiave, job_id)
+    elif job.stato == COMPLETATO:
+        if job.excel:
+            st.success("Fatto! ♻️ Risultato identico gia' calcolato, preso dalla cache." if job.da_cache else "Fatto!")
+            st.download_button("📥 Scarica Excel", job.excel, nome_file, key=f"dl_{chiave}")
+            scarica_tabella(chiave, job, nome_file)
+            pubblica(chiave, job)
+        else:
+            st.error("Nessuna soluzione trovata.")
+            mostra_diagnosi(job.report)
+        mostra_report(job.report)
+    elif job.stato == FALLITO:
+        st.error("Errore durante il calcolo.")
+        st.code(job.errore)
+    elif job.stato == ANNULLATO:
+        st.warning("Calcolo annullato.")
+
+def mostra_diagnosi(report):
+    """Perche' il piano e' impossibile: problemi della verifica preliminare o conflitto minimo."""
+    if report.problemi:
+        st.markdown("**Il calcolo non e' partito, il piano e' impossibile:**")
+        st.markdown("\n".join(f"- {p}" for p in report.problemi))
+    elif report.conflitto:
+        st.markdown("**Questi input insieme non ammettono soluzione (togline almeno uno):**")
+        st.markdown("\n".join(f"- {c}" for c in report.conflitto))
+
+def scarica_tabella(chiave, job, nome_file):
+    """Lo stesso piano in forma tabellare (dipendente, data, turno) per payroll e BI."""
+    matrice = matrice_da_soluzione(job.soluzione, 7 * job.kwargs["weeks_to_generate"])
+    for colonna, (formato, mime) in zip(st.columns(len(FORMATI_TABELLA)), FORMATI_TABELLA.items()):
+        try: dati = esporta_tabella(job.kwargs["start_date"], matrice, formato)
+        except ImportError:
+            colonna.caption(f"{formato.upper()} non disponibile (manca pyarrow)")
+            continue
+        colonna.download_button(f"📄 {formato.upper()}", dati, nome_file.replace(".xlsx", f".{formato}"), mime=mime,
+                                key=f"dl_{formato}_{chiave}")
+
+def pubblica(chiave, job):
+    """Salva il piano nell'archivio: da li' lo riprendono la riparazione e lo storico dei piani successivi."""
+    pubblicati = st.session_state.setdefault("pubblicati", {})
+    if job.id in pubblicati:
+        st.caption(f"🗄️ Pubblicato nell'archivio come piano {pubblicati[job.id]}.")
+    elif st.button("🗄️ Pubblica nell'archivio", key=f"pubblica_{chiave}"):
+        opzioni = {k: v for k, v in job.kwargs.items() if k not in ("start_date", "list_assenze", "list_req_turni", "previous_solution",
+                                                                     "hint", "storico")}
+        pubblicati[job.id] = archivio().salva(job.kwargs["start_date"], job.soluzione, job.kwargs["list_assenze"],
+                                              job.kwargs["list_req_turni"], job.report, job.descrizione, **opzioni)
+        st.rerun()
+
+@st.fragment(run_every=1)
+def progresso_job(chiave, job_id):
+    """Si ridisegna ogni secondo finche' il job e' attivo, poi ricarica la pagina con l'esito."""
+    job = gestore_job().job(job_id)
+    if job is None or not job.attivo:
+        st.rerun()
+    if job.stato == IN_CODA:
+        st.info(f"In coda (posizione {gestore_job().posizione_in_coda(job_id)})...")
+    else:
+        trascorso = time.time() - job.avviato
+        if job.progressi:
+            p = job.progressi[-1]
+            blocco = f" (blocco {p['blocco']})" if "blocco" in p else ""
+            st.info(f"Calcolo in corso da {trascorso:.0f} s{blocco} — soluzione {p['soluzione']}: obiettivo {p['obiettivo']:.0f} "
+                    f"(bound {p['bound']:.0f}), copertura ideale {p['copertura']:.0%}")
+            st.line_chart(pd.DataFrame(job.progressi).set_index("tempo")[["obiettivo", "bound"]])
+        else:
+            st.info(f"Calcolo in corso da {trascorso:.0f} s, nessuna soluzione ancora...")
+    if st.button("⛔ Annulla calcolo", key=f"annulla_{chiave}"):
+        gestore_job().annulla(job_id)
+        st.rerun()
+
+def mostra_report(report):
+    with st.expander("📊 Statistiche modello e solver"):
+        riepilogo = report.riepilogo()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Costruzione", f"{report.tempo_modello:.2f} s")
+        c2.metric("Ricerca", f"{report.tempo_solver:.2f} s")
+        c3.metric("Stato", report.stato)
+        c4.metric("Gap", riepilogo["Gap"])
+        st.table([{"Voce": k, "Valore": str(v)} for k, v in riepilogo.items()])
+        st.dataframe(pd.DataFrame(report.tabella_famiglie()), hide_index=True)
+        if report.blocchi: st.dataframe(pd.DataFrame(report.blocchi), hide_index=True)
+        if report.fasi: st.dataframe(pd.DataFrame(report.fasi), hide_index=True)
+
+def lancia_scenari(scenari, richiesta, piano_base):
+    """Accoda gli scenari come riparazioni di piano_base, accanto ai job gia' in sessione."""
+    calcoli = calcoli_scenari(scenari=scenari, piano_base=piano_base, **richiesta)
+    st.session_state.scenari_job.update({nome: gestore_job().invia(descrizione, **kwargs) for nome, descrizione, kwargs in calcoli})
+
+def pannello_scenari():
+    """Avanzamento degli scenari in corso, poi tabella di confronto e download per variante."""
+    ids = st.session_state.get("scenari_job")
+    if not ids: return
+    jobs = {nome: gestore_job().job(job_id) for nome, job_id in ids.items()}
+    if any(job is None for job in jobs.values()):
+        st.warning("Scenari non piu' disponibili sul server.")
+    elif any(job.attivo for job in jobs.values()):
+        progresso_scenari()
+    else:
+        attesa = st.session_state.pop("scenari_attesa", None)
+        if attesa and jobs[BASE].stato == COMPLETATO and jobs[BASE].soluzione:
+            lancia_scenari(*attesa, jobs[BASE].soluzione)
+            st.rerun()
+        if attesa: st.warning("Il piano base non ha soluzione: scenari non avviati.")
+        num_giorni = 7 * next(iter(jobs.values())).kwargs["weeks_to_generate"]
+        esiti = [esito_job(nome, job, num_giorni) for nome, job in jobs.items()]
+        piano_base = st.session_state.get("scenari_base")
+        if piano_base is not None:
+            esiti.insert(0, EsitoScenario(BASE, "PUBBLICATO", matrice_da_soluzione(piano_base, num_giorni)))
+        st.dataframe(pd.DataFrame(tabella_confronto(esiti)), hide_index=True)
+        risolti = {e.nome: e for e in esiti if e.risolto}
+        if risolti:
+            scelto = st.selectbox("Scoperture per turno e giorno", list(risolti), key="scenario_dettaglio")
+            giorni = [testo_giorno(start_d, d) for d in range(num_giorni)]
+            st.dataframe(pd.DataFrame(scoperture(risolti[scelto].matrice), columns=giorni,
+                                      index=[TURNI_CONFIG[t]['txt'] for t in TURNI]))
+        for colonna, esito in zip(st.columns(max(1, len(esiti))), esiti):
+            if esito.excel:
+                colonna.download_button(f"📥 {esito.nome}", esito.excel, f"Scenario_{esito.nome}.xlsx", key=f"dl_scen_{esito.nome}")
+            elif esito.errore:
+                colonna.error(f"{esito.nome}: errore")
+            elif esito.report is not None and (esito.report.problemi or esito.report.conflitto):
+                with colonna.expander(f"{esito.nome}: perche' impossibile"): mostra_diagnosi(esito.report)
+
+@st.fragment(run_every=1)
+def progresso_scenari():
+    jobs = {nome: gestore_job().job(job_id) for nome, job_id in st.session_state["scenari_job"].items()}
+    if not any(job is not None and job.attivo for job in jobs.values()):
+        st.rerun()
+    righe = []
+    for nome, job in jobs.items():
+        p = job.progressi[-1] if job.progressi else {}
+        righe.append({"Scenario": nome, "Stato": job.stato, "Soluzioni": p.get("soluzione", 0),
+                      "Obiettivo": p.get("obiettivo"), "Copertura": f"{p['copertura']:.0%}" if p else "-"})
+    st.info("Scenari in calcolo...")
+    st.dataframe(pd.DataFrame(righe), hide_index=True)
+    if st.button("⛔ Annulla scenari"):
+        for job in jobs.values(): gestore_job().annulla(job.id)
+        st.rerun()
 
 ALL_STAFF_UI = ALL_STAFF.copy()
 ALL_STAFF_UI.sort()
@@ -470,8 +231,9 @@ SHIFT_OPTIONS = {
 
 if 'list_assenze' not in st.session_state: st.session_state.list_assenze = []
 if 'list_turni' not in st.session_state: st.session_state.list_turni = []
+if 'scenari' not in st.session_state: st.session_state.scenari = {}
 
-tab1, tab2 = st.tabs(["🆕 Nuova Pianificazione", "🛠️ Modalità Riparazione"])
+tab1, tab2, tab3, tab4 = st.tabs(["🆕 Nuova Pianificazione", "🛠️ Modalità Riparazione", "🔀 Scenari", "✅ Controllo Piano"])
 
 with tab1:
     col1, col2 = st.columns(2)
@@ -513,35 +275,138 @@ with tab1:
                 st.experimental_rerun()
 
     st.divider()
+    usa_cache_hint = st.checkbox("Parti da un piano gia' calcolato che copre lo stesso periodo", value=True,
+                                 help="Il piano in cache con piu' giorni in comune viene passato al solver come hint.")
     if st.button("🚀 GENERA TURNI", type="primary"):
-        with st.spinner("Calcolo in corso..."):
-            res = solve_turni(start_d, weeks_num, st.session_state.list_assenze, st.session_state.list_turni)
-            if res:
-                st.success("Fatto!")
-                st.download_button("📥 Scarica Excel", res.getvalue(), "Turni_Generati.xlsx")
-            else:
-                st.error("Nessuna soluzione trovata.")
+        hint = gestore_job().cache.piano_sovrapposto(start_d, 7 * weeks_num) if usa_cache_hint else None
+        avvia_job("job", f"Nuovo piano {start_d} x {weeks_num} sett.",
+                  start_date=start_d, weeks_to_generate=weeks_num,
+                  list_assenze=list(st.session_state.list_assenze), list_req_turni=list(st.session_state.list_turni),
+                  model_backend=model_backend, report_sheet=report_sheet, profilo=profilo, hint=hint,
+                  settimane_blocco=int(settimane_blocco) or None, sovrapposizione=int(sovrapposizione), obiettivo=obiettivo,
+                  simmetrie=simmetrie, storico=storico())
+    pannello_job("job", "Turni_Generati.xlsx")
 
 with tab2:
-    st.info("Carica un Excel esistente per aggiungere assenze impreviste.")
-    uploaded_file = st.file_uploader("Carica Excel", type=["xlsx"])
+    st.info("Riprendi il piano pubblicato nell'archivio (o carica un Excel esistente) per aggiungere assenze impreviste.")
+    FONTI = {"Archivio dei piani pubblicati": "archivio", "Excel": "excel"}
+    fonte = FONTI[st.radio("Piano da riparare", list(FONTI), horizontal=True)]
+    uploaded_file = st.file_uploader("Carica Excel", type=["xlsx"]) if fonte == "excel" else None
+    if fonte == "archivio":
+        piano_archivio = archivio().carica(start_d, 7 * weeks_num)
+        if piano_archivio.giorni_trovati:
+            st.caption(f"{piano_archivio.giorni_trovati} giorni su {7 * weeks_num} dai piani {', '.join(map(str, piano_archivio.piani))}, "
+                       f"con {len(piano_archivio.assenze)} assenze e {len(piano_archivio.richieste)} richieste.")
+        else: st.warning("Nessun piano pubblicato nell'archivio per questo periodo.")
     
     st.write("### Nuova Assenza")
     with st.form("form_repair"):
         r_nome = st.selectbox("Dipendente", ALL_STAFF_UI)
         r_tipo = st.selectbox("Tipo", ["Ferie", "Richiesta OFF"])
         r_data = st.date_input("Data")
+        r_stabile = st.checkbox("Premia le celle invariate (stabilita')", value=True)
+        r_ripara = st.checkbox("Ripara il piano caricato come punto di partenza (repair hint)", value=True)
+        r_locale = st.checkbox("Ricalcola solo le settimane vicine all'assenza (modello booleano)", value=True,
+                               help="Le altre settimane restano identiche; se non basta l'intorno viene allargato.")
+        r_vicinato = st.number_input("Settimane vicine per lato", min_value=0, max_value=4, value=1)
         sub_repair = st.form_submit_button("Ricalcola")
 
-    if sub_repair and uploaded_file:
+    if sub_repair and (uploaded_file or fonte == "archivio"):
         num_days = 7 * weeks_num
-        prev_sol, err = parse_uploaded_schedule(uploaded_file, start_d, num_days)
+        new_abs = [{"nome": r_nome, "tipo": r_tipo, "data": r_data}]
+        if fonte == "archivio":
+            prev_sol = piano_archivio.come_soluzione() or None
+            err = None if prev_sol else "nessun piano pubblicato nell'archivio per questo periodo"
+            assenze, richieste = piano_archivio.input_riparazione(new_abs)
+        else:
+            try:
+                piano_excel = leggi_piano(uploaded_file, start_d, num_days)
+                prev_sol, err = piano_excel.come_soluzione(), piano_excel.avvisi()
+                assenze, richieste = piano_excel.input_riparazione(new_abs)
+            except Exception as e: prev_sol, err = None, str(e)
+        if prev_sol and err: st.warning(err)
         if prev_sol:
-            new_abs = [{"nome": r_nome, "tipo": r_tipo, "data": r_data}]
-            with st.spinner("Riparazione..."):
-                res = solve_turni(start_d, weeks_num, new_abs, [], prev_sol)
-                if res:
-                    st.success("Fatto!")
-                    st.download_button("Scarica Excel Aggiornato", res.getvalue(), "Turni_Riparati.xlsx")
-                else: st.error("Impossibile riparare.")
-        else: st.error(f"Errore file: {err}")
+            avvia_job("job_rip", f"Riparazione {r_nome} {r_data}",
+                      start_date=start_d, weeks_to_generate=weeks_num, list_assenze=assenze, list_req_turni=richieste,
+                      previous_solution=prev_sol, model_backend=model_backend, report_sheet=report_sheet, profilo=profilo,
+                      repair_hint=r_ripara, peso_stabilita=500 if r_stabile else 0,
+                      riparazione_locale=r_locale, vicinato=int(r_vicinato), obiettivo=obiettivo, simmetrie=simmetrie,
+                      storico=storico())
+        else: st.error(f"Errore: {err}")
+    pannello_job("job_rip", "Turni_Riparati.xlsx")
+
+with tab3:
+    st.info("Confronta varianti prima di approvare: ogni scenario aggiunge assenze a quelle della prima scheda. "
+            "Gli scenari sono riparazioni del piano base: quello pubblicato, se lo carichi, altrimenti calcolato prima di loro.")
+    base_file = st.file_uploader("Piano base pubblicato (opzionale)", type=["xlsx"], key="file_base_scenari")
+
+    with st.form("form_scenario", clear_on_submit=True):
+        s_nome = st.text_input("Scenario", placeholder="Ferie A sett. 3")
+        s_dip = st.selectbox("Dipendente", ALL_STAFF_UI, key="s_dip")
+        s_tipo = st.selectbox("Tipo", ["Ferie", "Richiesta OFF"], key="s_tipo")
+        s_date = st.date_input("Dal / al", value=(start_d, start_d), key="s_date")
+        if st.form_submit_button("Aggiungi allo scenario") and s_nome.strip():
+            dal, al = (s_date[0], s_date[-1]) if isinstance(s_date, (tuple, list)) else (s_date, s_date)
+            scenario = st.session_state.scenari.setdefault(s_nome.strip(), Scenario(s_nome.strip()))
+            scenario.assenze += [{"nome": s_dip, "tipo": s_tipo, "data": dal + timedelta(days=i)} for i in range((al - dal).days + 1)]
+
+    if st.session_state.scenari:
+        st.table([{"Scenario": s.nome, "Assenze": ", ".join(f"{a['nome']} {a['data']:%d/%m}" for a in s.assenze)}
+                  for s in st.session_state.scenari.values()])
+        if st.button("Cancella Scenari"):
+            st.session_state.scenari = {}
+            st.rerun()
+
+    s_tempo = st.number_input("Secondi massimi per scenario", min_value=5, max_value=600, value=60)
+    if st.button("🔀 CONFRONTA SCENARI", type="primary", disabled=not st.session_state.scenari):
+        piano_base, err = None, None
+        assenze_base, richieste_base = st.session_state.list_assenze, st.session_state.list_turni
+        if base_file:
+            try:
+                piano_letto = leggi_piano(base_file, start_d, 7 * weeks_num)
+                piano_base, err = piano_letto.come_soluzione(), piano_letto.avvisi()
+                assenze_base, richieste_base = piano_letto.input_riparazione(assenze_base, richieste_base)
+            except Exception as e: err = str(e)
+        if err: st.warning(err)
+        if base_file and piano_base is None: st.error(f"Errore file: {err}")
+        else:
+            richiesta = dict(start_date=start_d, settimane=weeks_num, assenze_base=assenze_base, richieste_base=richieste_base,
+                             profilo=profilo, max_tempo=int(s_tempo), model_backend=model_backend, report_sheet=report_sheet,
+                             obiettivo=obiettivo, simmetrie=simmetrie, storico=storico(), paralleli=gestore_job().max_concorrenti)
+            scenari = list(st.session_state.scenari.values())
+            st.session_state.scenari_base = piano_base
+            st.session_state.scenari_job = {}
+            st.session_state.pop("scenari_attesa", None)
+            if piano_base is None:
+                # prima il base, poi gli scenari come sue riparazioni (vedi pannello_scenari)
+                _, descrizione, kwargs = calcolo_base(**richiesta)
+                st.session_state.scenari_job[BASE] = gestore_job().invia(descrizione, **kwargs)
+                st.session_state.scenari_attesa = (scenari, richiesta)
+            else: lancia_scenari(scenari, richiesta, piano_base)
+    pannello_scenari()
+
+with tab4:
+    st.info("Carica un piano modificato a mano: le regole del modello sono controllate subito, senza calcolo.")
+    file_controllo = st.file_uploader("Piano da controllare", type=["xlsx"], key="file_controllo")
+    c_input = st.checkbox("Considera anche assenze e richieste della prima scheda", value=True)
+    if file_controllo:
+        from turni.controllo import controlla_piano, tabella_violazioni  # importa il motore: solo quando serve
+        try: piano_controllo = leggi_piano(file_controllo, start_d, 7 * weeks_num)
+        except Exception as e: st.error(f"Errore file: {e}")
+        else:
+            if piano_controllo.avvisi(): st.warning(piano_controllo.avvisi())
+            nuovi = (st.session_state.list_assenze, st.session_state.list_turni) if c_input else ((), ())
+            t0 = time.perf_counter()
+            violazioni = controlla_piano(start_d, piano_controllo.turni, *piano_controllo.input_riparazione(*nuovi), storico=storico())
+            ms = 1000 * (time.perf_counter() - t0)
+            if not violazioni: st.success(f"Il piano rispetta tutte le regole (controllo in {ms:.0f} ms).")
+            else:
+                st.error(f"{len(violazioni)} violazioni (controllo in {ms:.0f} ms).")
+                st.dataframe(pd.DataFrame(tabella_violazioni(violazioni, start_d)), hide_index=True)
+                matrice = piano_controllo.turni
+                giorni = [testo_giorno(start_d, d) for d in range(matrice.shape[1])]
+                griglia = pd.DataFrame(np.where(matrice == MANCANTE, "?", TESTI[np.maximum(matrice, 0)]), index=ALL_STAFF, columns=giorni)
+                colori = pd.DataFrame("", index=griglia.index, columns=griglia.columns)
+                for v in violazioni:
+                    if v.dipendente: colori.iloc[ORGANICO.indice[v.dipendente], v.giorno] = "background-color: #F8CBAD"
+                st.dataframe(griglia.style.apply(lambda _: colori, axis=None))
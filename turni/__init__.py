@@ -0,0 +1,36 @@
+"""Gestore turni: motore di calcolo CP-SAT e servizi usati dall'app Streamlit.
+
+Il pacchetto si importa senza costi: le funzioni principali sono risolte al primo accesso
+(`turni.pianifica`, `turni.solve_turni`, ...), cosi' CLI, job e test caricano ortools,
+pandas e openpyxl solo se li usano davvero.
+"""
+
+import importlib
+
+_ESPORTATI = {
+    "pianifica": "turni.api",
+    "confronta": "turni.api",
+    "RisultatoPiano": "turni.api",
+    "solve_turni": "turni.engine",
+    "ripara_locale": "turni.engine",
+    "risolvi_orizzonte_mobile": "turni.engine",
+    "ReportSolver": "turni.engine",
+    "leggi_piano": "turni.importa",
+    "parse_uploaded_schedule": "turni.importa",
+    "scrivi_excel": "turni.esporta",
+    "esporta_tabella": "turni.esporta",
+    "Organico": "turni.organico",
+    "carica_organico": "turni.organico",
+    "verifica_preliminare": "turni.diagnosi",
+    "spiega_conflitto": "turni.diagnosi",
+    "Archivio": "turni.archivio",
+    "controlla_piano": "turni.controllo",
+    "controlla_matrice": "turni.controllo",
+}
+
+__all__ = list(_ESPORTATI)
+
+
+def __getattr__(nome):
+    if nome not in _ESPORTATI: raise AttributeError(f"module 'turni' has no attribute {nome!r}")
+    return getattr(importlib.import_module(_ESPORTATI[nome]), nome)
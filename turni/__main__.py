@@ -0,0 +1,3 @@
+from turni.cli import main
+
+raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""API a dati semplici del motore, senza Streamlit: per job schedulati, test e CLI.
+
+Input come nella UI (liste di dict con nome, tipo/turno, data) ma con date anche in
+formato ISO e turni anche come testo ("07:00"); output un RisultatoPiano con la matrice
+dipendente x giorno e le statistiche. Il solver viene importato alla prima chiamata.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from turni.config import TEXT_TO_ID
+
+
+@dataclass
+class RisultatoPiano:
+    """Esito di `pianifica`: `matrice[n, d]` e' l'id turno di ALL_STAFF[n] al giorno d (None se non risolto)."""
+    stato: str
+    inizio: date
+    matrice: object = None
+    statistiche: dict = field(default_factory=dict)
+    report: object = None
+    excel: bytes | None = None
+
+    @property
+    def risolto(self):
+        return self.matrice is not None
+
+    def soluzione(self):
+        """Formato di previous_solution, {(nome, giorno): turno}."""
+        from turni.esporta import soluzione_da_matrice
+        return soluzione_da_matrice(self.matrice) if self.risolto else None
+
+    def tabella(self, formato):
+        """La matrice in forma lunga come bytes: "csv", "json" o "parquet"."""
+        from turni.esporta import esporta_tabella
+        return esporta_tabella(self.inizio, self.matrice, formato)
+
+
+def _data(valore):
+    if isinstance(valore, (date, datetime)): return valore
+    return date.fromisoformat(str(valore).strip()[:10])
+
+
+def _turno(valore):
+    """Id turno da id, "id - testo" (formato della UI) o testo di TEXT_TO_ID."""
+    testo = str(valore).strip()
+    if testo in TEXT_TO_ID: return TEXT_TO_ID[testo]
+    return int(testo.split(" - ")[0])
+
+
+def _assenze(voci):
+    return [dict(a, data=_data(a['data'])) for a in voci]
+
+
+def _richieste(voci):
+    return [dict(r, data=_data(r['data']), turno=_turno(r['turno'])) for r in voci]
+
+
+def pianifica(inizio, settimane, assenze=(), richieste=(), piano_precedente=None, **opzioni):
+    """Calcola il piano di `settimane` settimane da `inizio` e restituisce un RisultatoPiano.
+
+    `assenze`: dict con nome, tipo ("Ferie" o "Richiesta OFF") e data; `richieste`: dict con
+    nome, data e turno. `piano_precedente` ({(nome, giorno): turno}) attiva la riparazione;
+    le `opzioni` passano a solve_turni (profilo, model_backend, settimane_blocco, ...).
+    """
+    from turni.engine import solve_turni
+    from turni.esporta import matrice_da_soluzione
+
+    inizio = _data(inizio)
+    output, report, soluzione = solve_turni(inizio, settimane, _assenze(assenze), _richieste(richieste),
+                                            previous_solution=piano_precedente, **opzioni)
+    matrice = matrice_da_soluzione(soluzione, 7 * settimane) if soluzione else None
+    return RisultatoPiano(report.stato, inizio, matrice, report.riepilogo(), report,
+                          output.getvalue() if output is not None else None)
+
+
+def confronta(inizio, settimane, scenari, assenze=(), richieste=(), piano_precedente=None, **opzioni):
+    """Risolve in parallelo le varianti `scenari` come riparazioni del piano base e restituisce gli EsitoScenario.
+
+    Ogni scenario e' un dict con nome, assenze e richieste (stesso formato di `pianifica`),
+    in aggiunta a `assenze` e `richieste` del base; senza `piano_precedente` il base e'
+    calcolato prima degli scenari. Le `opzioni` passano a
+    turni.scenari.confronta_scenari (max_tempo, paralleli, profilo, ...); la tabella di
+    confronto si ottiene con turni.scenari.tabella_confronto.
+    """
+    from turni.scenari import Scenario, confronta_scenari
+
+    varianti = [Scenario(s['nome'], _assenze(s.get('assenze', ())), _richieste(s.get('richieste', ()))) for s in scenari]
+    return confronta_scenari(_data(inizio), settimane, varianti, _assenze(assenze), _richieste(richieste),
+                             piano_precedente, **opzioni)
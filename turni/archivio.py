@@ -0,0 +1,216 @@
+"""Archivio SQLite dei piani pubblicati: celle, input e statistiche del solver.
+
+Ogni piano salvato e' una riga di `piani` (periodo, input in JSON, riepilogo del report)
+piu' una riga di `celle` per dipendente e giorno, con il tipo della cella (ferie, richiesta
+OFF, turno richiesto) che l'Excel perde. Su una data vale il piano salvato per ultimo che
+la copre: riparazione e storico leggono le celle "effettive" con una query indicizzata su
+(dipendente, data), senza rileggere i workbook.
+
+Il file e' `TURNI_ARCHIVIO`; ogni operazione apre la sua connessione, quindi un Archivio
+si puo' condividere tra i thread del server.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from turni.config import ALL_STAFF, MAX_GIORNI_CONSECUTIVI, NUM_STAFF, ORGANICO, TURNI_CONFIG
+from turni.importa import MANCANTE, unisci_input
+
+ARCHIVIO = os.environ.get("TURNI_ARCHIVIO", os.path.join(os.path.expanduser("~"), ".local", "share", "gestore-turni",
+                                                         "archivio.sqlite"))
+
+# Tipo della cella oltre al turno: quello che nell'Excel diventa "FERIE", "REQ" o un turno in grassetto
+FERIE, OFF, RICHIESTO = "FERIE", "REQ", "RICHIESTO"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS piani (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    salvato TEXT NOT NULL,
+    descrizione TEXT NOT NULL DEFAULT '',
+    sede TEXT NOT NULL DEFAULT '',
+    inizio TEXT NOT NULL,
+    giorni INTEGER NOT NULL,
+    stato TEXT,
+    obiettivo REAL,
+    input TEXT NOT NULL,
+    statistiche TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS celle (
+    piano INTEGER NOT NULL REFERENCES piani(id) ON DELETE CASCADE,
+    dipendente TEXT NOT NULL,
+    data TEXT NOT NULL,
+    turno INTEGER NOT NULL,
+    tipo TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS celle_dipendente_data ON celle (dipendente, data, piano);
+CREATE INDEX IF NOT EXISTS celle_piano ON celle (piano);
+CREATE INDEX IF NOT EXISTS celle_data ON celle (data);
+"""
+
+# Celle effettive in [?, ?): per (dipendente, data) la riga del piano salvato per ultimo
+# (SQLite prende le colonne nude dalla riga del MAX)
+_EFFETTIVE = """
+SELECT dipendente, data, turno, tipo, MAX(piano) AS piano FROM celle
+WHERE data >= ? AND data < ? GROUP BY dipendente, data
+"""
+
+_MATTINA = [t for t, cfg in TURNI_CONFIG.items() if cfg["cat"] == "M"]
+_SERA = [t for t, cfg in TURNI_CONFIG.items() if cfg["cat"] == "L"]
+
+
+def _data(valore):
+    if isinstance(valore, datetime): return valore.date()
+    if isinstance(valore, date): return valore
+    return date.fromisoformat(str(valore).strip()[:10])
+
+
+@dataclass
+class PianoArchiviato:
+    """Piano effettivo su un periodo: `turni[n, d]` come in PianoImportato, piu' gli input delle celle."""
+    inizio: date
+    turni: np.ndarray
+    assenze: list = field(default_factory=list)     # {"nome", "tipo", "data"}, come nella UI
+    richieste: list = field(default_factory=list)   # {"nome", "data", "turno"}
+    piani: list = field(default_factory=list)       # id dei piani da cui vengono le celle
+
+    @property
+    def giorni_trovati(self):
+        return int((self.turni != MANCANTE).any(axis=0).sum())
+
+    def come_soluzione(self):
+        """Formato di previous_solution, {(nome, giorno): turno}, senza le celle mancanti."""
+        righe, giorni = np.nonzero(self.turni != MANCANTE)
+        return {(ALL_STAFF[n], int(d)): int(self.turni[n, d]) for n, d in zip(righe, giorni)}
+
+    def input_riparazione(self, assenze=(), richieste=()):
+        """(assenze, richieste) del piano archiviato piu' quelle nuove; sullo stesso giorno prevalgono le nuove."""
+        return unisci_input(self.assenze, self.richieste, assenze, richieste)
+
+
+class Archivio:
+    """Piani pubblicati in un file SQLite; vedi il docstring del modulo per lo schema."""
+
+    def __init__(self, percorso=ARCHIVIO):
+        self.percorso = percorso
+        if os.path.dirname(percorso): os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        with self._connessione() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connessione(self):
+        con = sqlite3.connect(self.percorso, timeout=30)
+        try:
+            con.execute("PRAGMA foreign_keys=ON")
+            with con: yield con
+        finally:
+            con.close()
+
+    def salva(self, start_date, soluzione, list_assenze=(), list_req_turni=(), report=None, descrizione="", **opzioni):
+        """Pubblica il piano {(nome, giorno): turno} che parte da start_date e ne restituisce l'id.
+
+        Assenze e richieste sono quelle passate a solve_turni: finiscono nel tipo delle celle e,
+        insieme alle `opzioni` del calcolo, nel JSON degli input; del report si tiene il riepilogo.
+        """
+        inizio = _data(start_date)
+        giorni = 1 + max((d for _, d in soluzione), default=-1)
+        tipi = {}
+        for a in list_assenze:
+            tipo = {"Ferie": FERIE, "Richiesta OFF": OFF}.get(a["tipo"])
+            if tipo: tipi[(a["nome"], (_data(a["data"]) - inizio).days)] = tipo
+        for r in list_req_turni:
+            chiave = (r["nome"], (_data(r["data"]) - inizio).days)
+            if soluzione.get(chiave) == int(str(r["turno"]).split(" - ")[0]): tipi.setdefault(chiave, RICHIESTO)
+        documento = {"assenze": list(list_assenze), "richieste": list(list_req_turni), "opzioni": opzioni}
+        statistiche = report.riepilogo() if report is not None else {}
+        celle = [(nome, (inizio + timedelta(days=d)).isoformat(), int(t), tipi.get((nome, d), ""))
+                 for (nome, d), t in soluzione.items()]
+        with self._connessione() as con:
+            cur = con.execute("INSERT INTO piani (salvato, descrizione, sede, inizio, giorni, stato, obiettivo, input, statistiche) "
+                              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (datetime.now().isoformat(timespec="seconds"), descrizione, ORGANICO.sede or "", inizio.isoformat(),
+                               giorni, getattr(report, "stato", None), getattr(report, "obiettivo", None),
+                               json.dumps(documento, default=str), json.dumps(statistiche, default=str)))
+            piano = cur.lastrowid
+            con.executemany("INSERT INTO celle (piano, dipendente, data, turno, tipo) VALUES (?, ?, ?, ?, ?)",
+                            [(piano, *cella) for cella in celle])
+        return piano
+
+    def elenco(self):
+        """I piani salvati, dal piu' recente: id, data di salvataggio, periodo, stato e descrizione."""
+        with self._connessione() as con:
+            con.row_factory = sqlite3.Row
+            righe = con.execute("SELECT id, salvato, descrizione, sede, inizio, giorni, stato, obiettivo FROM piani "
+                                "ORDER BY id DESC").fetchall()
+        return [dict(r) for r in righe]
+
+    def elimina(self, piano):
+        """Toglie un piano: sulle sue date tornano a valere i piani salvati prima."""
+        with self._connessione() as con: con.execute("DELETE FROM piani WHERE id = ?", (piano,))
+
+    def _effettive(self, dal, al):
+        with self._connessione() as con:
+            return con.execute(_EFFETTIVE, (dal.isoformat(), al.isoformat())).fetchall()
+
+    def carica(self, start_date, num_giorni):
+        """PianoArchiviato delle celle effettive in [start_date, +num_giorni), gli input ricostruiti dai tipi."""
+        inizio = _data(start_date)
+        indici = ORGANICO.indice
+        turni = np.full((NUM_STAFF, num_giorni), MANCANTE, dtype=np.int8)
+        assenze, richieste, piani = [], [], set()
+        for nome, testo, turno, tipo, piano in self._effettive(inizio, inizio + timedelta(days=num_giorni)):
+            if nome not in indici: continue
+            giorno = date.fromisoformat(testo)
+            turni[indici[nome], (giorno - inizio).days] = turno
+            piani.add(piano)
+            if tipo == FERIE: assenze.append({"nome": nome, "tipo": "Ferie", "data": giorno})
+            elif tipo == OFF: assenze.append({"nome": nome, "tipo": "Richiesta OFF", "data": giorno})
+            elif tipo == RICHIESTO: richieste.append({"nome": nome, "data": giorno, "turno": turno})
+        return PianoArchiviato(inizio, turni, assenze, richieste, sorted(piani))
+
+    def totali(self, dal, al):
+        """Totali per dipendente sulle celle effettive in [dal, al): {nome: {"giorni", "weekend", "mattine", "sere"}}.
+
+        Un weekend conta se il dipendente lavora il sabato o la domenica della settimana (da lunedi').
+        """
+        segnaposto = lambda turni: ", ".join("?" * len(turni))
+        query = f"""
+            SELECT dipendente, SUM(turno > 0),
+                   COUNT(DISTINCT CASE WHEN turno > 0 AND strftime('%w', data) IN ('0', '6')
+                                       THEN date(data, '-' || ((strftime('%w', data) + 6) % 7) || ' days') END),
+                   SUM(turno IN ({segnaposto(_MATTINA)})), SUM(turno IN ({segnaposto(_SERA)}))
+            FROM ({_EFFETTIVE}) GROUP BY dipendente
+        """
+        with self._connessione() as con:
+            righe = con.execute(query, (*_MATTINA, *_SERA, _data(dal).isoformat(), _data(al).isoformat())).fetchall()
+        return {nome: {"giorni": g, "weekend": w, "mattine": m, "sere": s} for nome, g, w, m, s in righe}
+
+    def contesto(self, start_date, settimane=None):
+        """ContestoBlocco per un piano che parte da start_date e prosegue quelli pubblicati.
+
+        Weekend e mattine/sere sono i totali delle `settimane` precedenti (tutto l'archivio se
+        None, mai piu' di quante l'archivio ne copre) e lo storico sono gli ultimi giorni prima di start_date, per riposi e giorni
+        consecutivi a cavallo dei due periodi. Da passare a solve_turni come `storico`.
+        """
+        from turni.engine import ContestoBlocco
+        inizio = _data(start_date)
+        with self._connessione() as con:
+            primo = con.execute("SELECT MIN(data) FROM celle WHERE data < ?", (inizio.isoformat(),)).fetchone()[0]
+        disponibili = -(-(inizio - date.fromisoformat(primo)).days // 7) if primo else 0
+        settimane = disponibili if settimane is None else min(settimane, disponibili)
+        totali = self.totali(inizio - timedelta(weeks=settimane), inizio) if settimane else {}
+
+        ultimi = self.carica(inizio - timedelta(days=MAX_GIORNI_CONSECUTIVI), MAX_GIORNI_CONSECUTIVI).turni
+        storico = {}
+        for nome, riga in zip(ALL_STAFF, ultimi.tolist()):
+            noti = riga[len(riga) - next((k for k, t in enumerate(reversed(riga)) if t == MANCANTE), len(riga)):]
+            if noti: storico[nome] = noti
+        return ContestoBlocco(0, storico, {nome: t["weekend"] for nome, t in totali.items()},
+                              {nome: t["mattine"] for nome, t in totali.items()}, {nome: t["sere"] for nome, t in totali.items()},
+                              settimane)
@@ -0,0 +1,293 @@
+"""Benchmark riproducibile del motore: `python -m turni.benchmark -o risultati.json --baseline base.json`.
+
+Ogni caso descrive un input sintetico realistico (orizzonte, organico scalato, densita' di
+richieste OFF, ferie raggruppate attorno a settimane di picco, richieste di turno) ed e'
+generato da un seme, quindi due esecuzioni risolvono esattamente lo stesso problema.
+L'organico scalato moltiplica i dipendenti della sede mantenendo ruoli, permessi e
+rotazione ("Nome #2", "Nome #3", ...).
+
+Ogni caso gira in un processo a se' (l'organico si legge all'import e il picco di memoria
+va misurato per caso) e misura costruzione del modello, prima soluzione, ultima soluzione
+migliorativa, tempo totale di ricerca, obiettivo e gap, picco di memoria ed export Excel;
+il piano trovato torna poi come piano precedente con le statistiche, e deve risultare VALIDO
+senza avviare il solver (la convalida di turni.controllo), altrimenti e' una regressione.
+Il file dei risultati e' JSON; confrontato con una baseline segnala le regressioni oltre
+le soglie (relative, con un minimo assoluto per non inseguire il rumore) ed esce con 1.
+Se la baseline non esiste ancora, i risultati la creano.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+
+_RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INIZIO = date(2026, 1, 5)
+
+
+@dataclass
+class CasoBenchmark:
+    """Un input sintetico: stesso nome e stessi parametri danno lo stesso problema."""
+    nome: str
+    settimane: int
+    scala: int = 1                 # copie di ogni dipendente della sede
+    densita_off: float = 0.03      # probabilita' di una richiesta OFF per dipendente e giorno
+    ferie: float = 0.2             # quota di dipendenti con un blocco di ferie
+    picchi_ferie: int = 1          # settimane attorno a cui si raggruppano le ferie
+    richieste: float = 0.5         # richieste di turno per dipendente e settimana
+    seme: int = 0
+    profilo: str = "bozza"
+    max_tempo: float = 20
+    model_backend: str = "bool"
+    settimane_blocco: int | None = None   # orizzonte mobile, come in solve_turni
+    obiettivo: str = "pesato"
+    simmetrie: bool = False
+
+
+CASI_DEFAULT = [
+    CasoBenchmark("1 settimana", 1),
+    CasoBenchmark("4 settimane", 4),
+    CasoBenchmark("9 settimane", 9, max_tempo=60),
+    CasoBenchmark("12 settimane a blocchi", 12, settimane_blocco=4),
+    CasoBenchmark("4 settimane, ferie di picco", 4, ferie=0.4, picchi_ferie=1, seme=1),
+    CasoBenchmark("4 settimane, molte richieste", 4, densita_off=0.06, richieste=1.5, seme=2),
+    CasoBenchmark("4 settimane, organico x2", 4, scala=2, seme=3),
+    CasoBenchmark("4 settimane, organico x4", 4, scala=4, seme=4, max_tempo=40),
+    CasoBenchmark("4 settimane, modello int", 4, model_backend="int", seme=5),
+    CasoBenchmark("4 settimane, obiettivo a fasi", 4, obiettivo="a_fasi"),
+    CasoBenchmark("4 settimane, pochi input", 4, densita_off=0.01, ferie=0.1, richieste=0.1, seme=6),
+    CasoBenchmark("4 settimane, pochi input, simmetrie", 4, densita_off=0.01, ferie=0.1, richieste=0.1, seme=6, simmetrie=True),
+    CasoBenchmark("4 settimane, simmetrie", 4, simmetrie=True),
+]
+
+# Peggioramento relativo tollerato e differenza assoluta sotto cui non e' una regressione
+SOGLIE_DEFAULT = {
+    "tempo_modello": (0.25, 0.05),
+    "tempo_prima_soluzione": (0.50, 0.5),
+    "tempo_ultima_soluzione": (0.50, 2.0),
+    "tempo_export": (0.25, 0.05),
+    "memoria_mb": (0.15, 20),
+    "gap": (0.50, 0.01),
+}
+_STATI_RISOLTI = ("OPTIMAL", "FEASIBLE")
+
+
+def organico_scalato(dati, scala):
+    """Il JSON dell'organico con ogni dipendente ripetuto `scala` volte."""
+    if scala <= 1: return dati
+    copia = lambda nome, k: nome if k == 1 else f"{nome} #{k}"
+    dipendenti = [dict(d, nome=copia(d["nome"], k)) for k in range(1, scala + 1) for d in dati.get("dipendenti", [])]
+    rotazione = [copia(nome, k) for k in range(1, scala + 1) for nome in dati.get("rotazione_notti", [])]
+    return dict(dati, sede=f"{dati.get('sede', '')} x{scala}", dipendenti=dipendenti, rotazione_notti=rotazione)
+
+
+def genera_input(caso, start_date=INIZIO):
+    """(assenze, richieste) del caso per l'organico caricato, nel formato di solve_turni.
+
+    Le richieste sono scelte nei domini delle celle del motore (ruoli, assenze e rotazione
+    notti applicati), mai in giorni vicini dello stesso dipendente e mai oltre il carico
+    settimanale: l'input e' denso ma non impossibile per costruzione.
+    """
+    from turni.config import ALL_STAFF
+    from turni.regole import applica_rotazione, domini_turni, indici_input, target_settimanale
+
+    rng = random.Random(caso.seme)
+    num_giorni = 7 * caso.settimane
+    giorno = lambda d: start_date + timedelta(days=d)
+    picchi = [rng.randrange(caso.settimane) for _ in range(max(1, caso.picchi_ferie))]
+    assenze, presi = [], set()
+    for n, nome in enumerate(ALL_STAFF):
+        if rng.random() < caso.ferie:
+            durata = rng.randint(3, 7)
+            inizio = max(0, min(num_giorni - durata, 7 * rng.choice(picchi) + rng.randint(-3, 3)))
+            for d in range(inizio, min(num_giorni, inizio + durata)):
+                assenze.append({"nome": nome, "tipo": "Ferie", "data": giorno(d)})
+                presi.add((n, d))
+        for d in range(num_giorni):
+            if (n, d) not in presi and rng.random() < caso.densita_off:
+                assenze.append({"nome": nome, "tipo": "Richiesta OFF", "data": giorno(d)})
+                presi.add((n, d))
+
+    _, ferie, off, _ = indici_input(start_date, num_giorni, assenze, [])
+    domini = domini_turni(num_giorni, ferie, off, {})
+    applica_rotazione(domini, num_giorni, caso.settimane, ferie, off)
+    richieste, vicini, carico = [], set(), {}
+    for n, nome in enumerate(ALL_STAFF):
+        for _ in range(int(caso.richieste * caso.settimane + rng.random())):
+            d = rng.randrange(num_giorni)
+            turni = sorted(domini[(n, d)] - {0, 9, 10})
+            w = d // 7
+            if (n, d) in presi or (n, d) in vicini or not turni or len(domini[(n, d)]) == 1: continue
+            if carico.get((n, w), 0) >= target_settimanale(nome, 7 * w, 7 * w + 7, ferie, off) - 1: continue
+            richieste.append({"nome": nome, "data": giorno(d), "turno": rng.choice(turni)})
+            presi.add((n, d))
+            vicini.update({(n, d - 1), (n, d + 1)})
+            carico[(n, w)] = carico.get((n, w), 0) + 1
+    return assenze, richieste
+
+
+def misura(caso):
+    """Risolve il caso nel processo corrente (con l'organico gia' scelto) e ne restituisce le metriche."""
+    import resource
+
+    from turni.config import ORGANICO, PROFILI_SOLVER
+    from turni.engine import solve_turni
+    from turni.esporta import matrice_da_soluzione, scrivi_excel
+    from turni.regole import indici_input
+
+    assenze, richieste = genera_input(caso)
+    profilo = dict(PROFILI_SOLVER[caso.profilo], max_time=caso.max_tempo)
+    progressi = []
+    t0 = time.perf_counter()
+    _, report, soluzione = solve_turni(INIZIO, caso.settimane, assenze, richieste, model_backend=caso.model_backend,
+                                       profilo=profilo, on_progress=progressi.append, settimane_blocco=caso.settimane_blocco,
+                                       obiettivo=caso.obiettivo, simmetrie=caso.simmetrie, diagnosi=False)
+    totale = time.perf_counter() - t0
+    tempo_export = convalida = tempo_convalida = None
+    if soluzione is not None:
+        _, ferie, off, req = indici_input(INIZIO, 7 * caso.settimane, assenze, richieste)
+        matrice = matrice_da_soluzione(soluzione, 7 * caso.settimane)
+        t0 = time.perf_counter()
+        scrivi_excel(INIZIO, matrice, ferie, off, req, report)
+        tempo_export = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        _, convalida, _ = solve_turni(INIZIO, caso.settimane, assenze, richieste, previous_solution=soluzione,
+                                      model_backend=caso.model_backend, profilo=profilo, report_sheet=True, diagnosi=False)
+        tempo_convalida = time.perf_counter() - t0
+    return {
+        "caso": asdict(caso),
+        "dipendenti": len(ORGANICO.nomi),
+        "assenze": len(assenze),
+        "richieste": len(richieste),
+        "stato": report.stato,
+        "gruppi_simmetrici": report.gruppi_simmetrici,
+        "tempo_modello": report.tempo_modello,
+        "tempo_prima_soluzione": progressi[0]["tempo"] if progressi else None,
+        "tempo_ultima_soluzione": progressi[-1]["tempo"] if progressi else None,
+        "tempo_solver": report.tempo_solver,
+        "tempo_totale": totale,
+        "soluzioni": report.soluzioni,
+        "obiettivo": report.obiettivo,
+        "bound": report.bound,
+        "gap": report.gap,
+        "variabili": sum(f["variabili"] for f in report.famiglie.values()),
+        "vincoli": sum(f["vincoli"] for f in report.famiglie.values()),
+        "tempo_export": tempo_export,
+        "convalida": convalida.stato if convalida is not None else None,
+        "tempo_convalida": tempo_convalida,
+        "memoria_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def esegui_caso(caso):
+    """Metriche del caso misurate in un processo separato con l'organico scalato."""
+    from turni.config import ORGANICO
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(organico_scalato(ORGANICO.dati, caso.scala), f)
+    try:
+        env = dict(os.environ, TURNI_ORGANICO=f.name)
+        esito = subprocess.run([sys.executable, "-m", "turni.benchmark", "--interno"], input=json.dumps(asdict(caso)),
+                               capture_output=True, text=True, cwd=_RADICE, env=env)
+    finally:
+        os.unlink(f.name)
+    if esito.returncode != 0: raise RuntimeError(f"Caso '{caso.nome}' fallito:\n{esito.stderr}")
+    return json.loads(esito.stdout)
+
+
+def esegui(casi, stampa=None):
+    """Documento dei risultati: ambiente e metriche di ogni caso."""
+    from ortools import __version__ as versione_ortools
+
+    risultati = []
+    for caso in casi:
+        risultati.append(esegui_caso(caso))
+        if stampa: stampa(risultati[-1])
+    return {"data": date.today().isoformat(), "python": platform.python_version(), "ortools": versione_ortools,
+            "cpu": os.cpu_count(), "casi": risultati}
+
+
+def regressioni(risultati, baseline, soglie=SOGLIE_DEFAULT, avvisi=None):
+    """Frasi per ogni metrica peggiorata oltre soglia rispetto alla baseline (lista vuota se nessuna).
+
+    I casi con parametri diversi dalla baseline non si confrontano: non sono regressioni e,
+    se c'e', finiscono nella lista `avvisi`. Un piano trovato che non risulta VALIDO come piano
+    precedente e' una regressione anche senza baseline.
+    """
+    precedenti = {r["caso"]["nome"]: r for r in baseline.get("casi", [])}
+    trovate = []
+    for r in risultati["casi"]:
+        nome = r["caso"]["nome"]
+        if r.get("convalida") not in (None, "VALIDO"):
+            trovate.append(f"{nome}: il piano trovato non supera la convalida (stato {r['convalida']})")
+        b = precedenti.get(nome)
+        if b is None: continue
+        if asdict(CasoBenchmark(**b["caso"])) != r["caso"]:  # i campi aggiunti dopo la baseline valgono il default
+            if avvisi is not None: avvisi.append(f"{nome}: parametri diversi dalla baseline, confronto saltato")
+            continue
+        if b["stato"] in _STATI_RISOLTI and r["stato"] not in _STATI_RISOLTI:
+            trovate.append(f"{nome}: stato {r['stato']} (baseline {b['stato']})")
+            continue
+        for metrica, (relativa, assoluta) in soglie.items():
+            vecchio, nuovo = b.get(metrica), r.get(metrica)
+            if vecchio is None or nuovo is None: continue
+            if nuovo - vecchio > max(assoluta, relativa * abs(vecchio)):
+                trovate.append(f"{nome}: {metrica} {nuovo:.3f} (baseline {vecchio:.3f}, +{(nuovo - vecchio) / max(abs(vecchio), 1e-9):.0%})")
+    return trovate
+
+
+def _leggi_casi(percorso):
+    with open(percorso, encoding="utf-8") as f: return [CasoBenchmark(**c) for c in json.load(f)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m turni.benchmark", description="Benchmark riproducibile di solve_turni.")
+    parser.add_argument("--casi", help="file JSON con la lista dei casi (default: la suite interna)")
+    parser.add_argument("--solo", action="append", default=[], help="esegue solo i casi con questo nome (ripetibile)")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="file JSON dei risultati")
+    parser.add_argument("--baseline", help="risultati di riferimento con cui confrontare")
+    parser.add_argument("--aggiorna-baseline", action="store_true", help="scrive i risultati sulla baseline (anche se manca)")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        # processo figlio: il caso arriva su stdin, le metriche escono su stdout
+        caso = CasoBenchmark(**json.load(sys.stdin))
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        stdout.write(json.dumps(misura(caso)))
+        return 0
+
+    casi = _leggi_casi(args.casi) if args.casi else CASI_DEFAULT
+    if args.solo: casi = [c for c in casi if c.nome in args.solo]
+    stampa = lambda r: print(f"{r['caso']['nome']:<40} {r['stato']:<10} modello {r['tempo_modello']:6.2f} s  "
+                             f"prima {r['tempo_prima_soluzione'] or 0:6.2f} s  ultima {r['tempo_ultima_soluzione'] or 0:6.2f} s  "
+                             f"gap {r['gap'] if r['gap'] is not None else float('nan'):6.2%}  "
+                             f"export {r['tempo_export'] or 0:5.2f} s  convalida {r['tempo_convalida'] or 0:5.3f} s  memoria {r['memoria_mb']:5.0f} MB", file=sys.stderr)
+    risultati = esegui(casi, stampa)
+    with open(args.output, "w", encoding="utf-8") as f: json.dump(risultati, f, indent=1)
+    print(f"Scritto {args.output}", file=sys.stderr)
+
+    baseline = {}
+    if args.baseline and (args.aggiorna_baseline or not os.path.exists(args.baseline)):
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(risultati, f, indent=1)
+        print(f"Baseline aggiornata: {args.baseline}", file=sys.stderr)
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+    avvisi = []
+    trovate = regressioni(risultati, baseline, avvisi=avvisi)
+    for riga in avvisi: print(f"Attenzione: {riga}", file=sys.stderr)
+    for riga in trovate: print(f"REGRESSIONE {riga}")
+    if trovate: return 1
+    if baseline: print("Nessuna regressione rispetto alla baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""Cache dei piani risolti, indirizzata per contenuto.
+
+La chiave e' lo SHA-256 di una serializzazione canonica di tutti gli input del calcolo,
+delle costanti di reparto e dei sorgenti del pacchetto: stessi input, stesse regole, stesso
+codice danno la stessa chiave. I risultati restano in un LRU in memoria e su disco in
+`TURNI_CACHE_DIR`, con eviction dei file meno usati oltre `TURNI_CACHE_MB`.
+
+Un piccolo indice (chiave -> periodo coperto) permette di ritrovare i piani che si
+sovrappongono a un nuovo periodo, da usare come punto di partenza del solver.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+
+from turni import config
+
+CACHE_DIR = os.environ.get("TURNI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "gestore-turni"))
+CACHE_MAX_BYTES = int(float(os.environ.get("TURNI_CACHE_MB", 200)) * 1024 * 1024)
+CACHE_MAX_MEMORIA = 32
+
+# Costanti che cambiano il risultato del calcolo
+_COSTANTI = ["ALL_STAFF", "RUOLO_ACCETTATORI", "TURNI_CONFIG", "REGOLE_RIPOSO", "MAX_GIORNI_CONSECUTIVI",
+             "GIORNI_LAVORO_SETTIMANA", "PROFILI_SOLVER", "TEXT_TO_ID", "RIPOSO_CFG", "FASI_OBIETTIVO", "OBIETTIVI"]
+# Tutti i moduli del pacchetto: Excel (esporta), scorciatoia VALIDO (controllo), import, organico...
+_CARTELLA_MOTORE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _canonico(valore):
+    """Porta un valore in forma JSON stabile: date ISO, chiavi ordinate, tuple come liste, dataclass come dict."""
+    if isinstance(valore, (datetime, date)): return valore.isoformat()[:10]
+    if is_dataclass(valore) and not isinstance(valore, type): return _canonico(asdict(valore))
+    if isinstance(valore, dict):
+        if all(isinstance(k, str) for k in valore):
+            return {k: _canonico(v) for k, v in sorted(valore.items())}
+        return sorted([[_canonico(k), _canonico(v)] for k, v in valore.items()], key=json.dumps)
+    if isinstance(valore, (list, tuple, set)):
+        return [_canonico(v) for v in valore]
+    return valore
+
+
+def _impronta_motore():
+    """SHA-256 dei sorgenti di turni/*.py, in ordine di nome."""
+    impronta = hashlib.sha256()
+    for nome in sorted(f for f in os.listdir(_CARTELLA_MOTORE) if f.endswith(".py")):
+        impronta.update(nome.encode())
+        with open(os.path.join(_CARTELLA_MOTORE, nome), "rb") as f: impronta.update(f.read())
+    return impronta.hexdigest()
+
+
+def chiave_calcolo(**kwargs):
+    """Chiave di cache per una chiamata a solve_turni con questi argomenti.
+
+    L'hint orienta solo la ricerca e non definisce il problema, quindi non entra nella chiave.
+    """
+    kwargs = {k: v for k, v in kwargs.items() if k not in ("hint", "repair_hint")}
+    for lista in ("list_assenze", "list_req_turni"):
+        if lista in kwargs:
+            kwargs[lista] = sorted((_canonico(x) for x in kwargs[lista]), key=json.dumps)
+    motore = _impronta_motore()
+    documento = {
+        "input": _canonico(kwargs),
+        "costanti": {nome: _canonico(getattr(config, nome)) for nome in _COSTANTI},
+        "organico": _canonico(config.ORGANICO.dati),
+        "motore": motore,
+    }
+    testo = json.dumps(documento, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(testo.encode()).hexdigest()
+
+
+class CacheRisultati:
+    """LRU in memoria davanti a un archivio su disco di file pickle, uno per chiave."""
+
+    def __init__(self, cartella=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_memoria=CACHE_MAX_MEMORIA):
+        self.cartella = cartella
+        self.max_bytes = max_bytes
+        self.max_memoria = max_memoria
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cartella, exist_ok=True)
+        self._indice = {}
+        try:
+            with open(os.path.join(cartella, "indice.json")) as f: self._indice = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _percorso(self, chiave):
+        return os.path.join(self.cartella, f"{chiave}.pkl")
+
+    def get(self, chiave):
+        with self._lock:
+            if chiave in self._memoria:
+                self._memoria.move_to_end(chiave)
+                return self._memoria[chiave]
+        percorso = self._percorso(chiave)
+        try:
+            with open(percorso, "rb") as f: voce = pickle.load(f)
+            os.utime(percorso)  # l'mtime fa da "ultimo uso" per l'eviction
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self._in_memoria(chiave, voce)
+        return voce
+
+    def put(self, chiave, voce):
+        voce = dict(voce, salvato=time.time())
+        self._in_memoria(chiave, voce)
+        fd, tmp = tempfile.mkstemp(dir=self.cartella, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f: pickle.dump(voce, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._percorso(chiave))
+        kwargs = voce.get("kwargs", {})
+        if "start_date" in kwargs and "weeks_to_generate" in kwargs:
+            with self._lock:
+                self._indice[chiave] = {"inizio": _canonico(kwargs["start_date"]), "giorni": 7 * kwargs["weeks_to_generate"]}
+        self._evizione()
+
+    def piano_sovrapposto(self, start_date, num_giorni):
+        """Soluzione in cache che copre piu' giorni di [start_date, +num_giorni), riportata sui suoi indici.
+
+        Restituisce {(nome, giorno): turno} nel formato di previous_solution, o None.
+        """
+        inizio = datetime.fromisoformat(_canonico(start_date))
+        migliore, copertura = None, 0
+        with self._lock: indice = list(self._indice.items())
+        for chiave, meta in indice:
+            offset = (datetime.fromisoformat(meta["inizio"]) - inizio).days
+            comuni = min(num_giorni, offset + meta["giorni"]) - max(0, offset)
+            if comuni > copertura: migliore, copertura = (chiave, offset), comuni
+        if migliore is None: return None
+        voce = self.get(migliore[0])
+        if voce is None or not voce.get("soluzione"): return None
+        offset = migliore[1]
+        return {(nome, d + offset): t for (nome, d), t in voce["soluzione"].items() if 0 <= d + offset < num_giorni}
+
+    def _in_memoria(self, chiave, voce):
+        with self._lock:
+            self._memoria[chiave] = voce
+            self._memoria.move_to_end(chiave)
+            while len(self._memoria) > self.max_memoria: self._memoria.popitem(last=False)
+
+    def _evizione(self):
+        nomi = [n for n in os.listdir(self.cartella) if n.endswith(".pkl")]
+        nomi.sort(key=lambda n: os.path.getmtime(os.path.join(self.cartella, n)))
+        totale = sum(os.path.getsize(os.path.join(self.cartella, n)) for n in nomi)
+        rimossi = []
+        for nome in nomi:
+            if totale <= self.max_bytes: break
+            percorso = os.path.join(self.cartella, nome)
+            totale -= os.path.getsize(percorso)
+            os.remove(percorso)
+            rimossi.append(nome[:-4])
+        with self._lock:
+            for chiave in rimossi: self._indice.pop(chiave, None)
+            fd, tmp = tempfile.mkstemp(dir=self.cartella, suffix=".tmp")
+            with os.fdopen(fd, "w") as f: json.dump(self._indice, f)
+            os.replace(tmp, os.path.join(self.cartella, "indice.json"))
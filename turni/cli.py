@@ -0,0 +1,168 @@
+"""Riga di comando: `python -m turni --inizio 2026-01-05 --settimane 9 -o Turni.xlsx`.
+
+Assenze e richieste arrivano da file JSON (lista di oggetti) o CSV con intestazione:
+nome,tipo,data per le assenze e nome,data,turno per le richieste. Con `--precedente`
+il piano Excel indicato viene riparato invece di partire da zero. `--organico` sceglie il
+file JSON della sede (come TURNI_ORGANICO).
+
+L'archivio SQLite dei piani pubblicati (`--archivio`, default TURNI_ARCHIVIO) sostituisce il
+giro dall'Excel: `--da-archivio` ripara il piano pubblicato sul periodo, con le sue ferie e
+richieste; `--pubblica` vi salva il piano calcolato; `--storico` bilancia weekend e
+mattine/sere anche sulle settimane gia' pubblicate.
+
+Con `--controlla` il piano Excel indicato e' solo controllato contro le regole, senza
+solver: stampa una violazione per riga ed esce con 1 se ce ne sono.
+
+Con `--scenari` (JSON: lista di {"nome", "assenze", "richieste"}) le varianti del piano
+base (`--precedente`, o calcolato prima) ne sono riparazioni risolte in parallelo: stampa la tabella di confronto e scrive un workbook per
+scenario, `<output>_<nome>.xlsx`.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+
+
+def _leggi_voci(percorso):
+    if percorso is None: return []
+    if percorso.lower().endswith(".json"):
+        with open(percorso, encoding="utf-8") as f: return json.load(f)
+    with open(percorso, newline="", encoding="utf-8-sig") as f: return list(csv.DictReader(f))
+
+
+def _parser():
+    from turni.config import OBIETTIVI, PROFILI_SOLVER
+    parser = argparse.ArgumentParser(prog="python -m turni", description="Genera o ripara un piano turni senza interfaccia.")
+    parser.add_argument("--organico", help="file JSON dell'organico della sede (default: TURNI_ORGANICO o turni/organico.json)")
+    parser.add_argument("--inizio", required=True, type=date.fromisoformat, help="data d'inizio del piano (AAAA-MM-GG, un lunedi')")
+    parser.add_argument("--settimane", type=int, default=9)
+    parser.add_argument("--assenze", help="file JSON o CSV con nome, tipo (Ferie / Richiesta OFF), data")
+    parser.add_argument("--richieste", help="file JSON o CSV con nome, data, turno (id o testo, es. 07:00)")
+    parser.add_argument("--precedente", help="Excel di un piano gia' pubblicato da riparare")
+    parser.add_argument("--controlla", metavar="EXCEL", help="controlla il piano contro le regole senza calcolarlo")
+    parser.add_argument("--locale", action="store_true", help="con --precedente o --da-archivio ricalcola solo le settimane toccate")
+    parser.add_argument("--archivio", help="file SQLite dei piani pubblicati (default: TURNI_ARCHIVIO)")
+    parser.add_argument("--da-archivio", action="store_true", help="ripara il piano pubblicato nell'archivio sul periodo")
+    parser.add_argument("--pubblica", action="store_true", help="salva il piano calcolato nell'archivio")
+    parser.add_argument("--storico", type=int, default=None, metavar="SETTIMANE",
+                        help="bilancia anche sulle ultime SETTIMANE pubblicate nell'archivio (0 = tutte; solo modello bool)")
+    parser.add_argument("-o", "--output", default="Turni_Generati.xlsx", help="workbook da scrivere")
+    parser.add_argument("--tabella", action="append", choices=["csv", "json", "parquet"], default=[],
+                        help="scrive anche la tabella del piano accanto al workbook (ripetibile)")
+    parser.add_argument("--profilo", choices=list(PROFILI_SOLVER), default="bilanciato")
+    parser.add_argument("--modello", choices=["bool", "int"], default="bool")
+    parser.add_argument("--obiettivo", choices=list(OBIETTIVI), default="pesato",
+                        help="a_fasi: prima copertura, poi stabilita', poi equilibrio, ognuna con la sua quota di tempo")
+    parser.add_argument("--simmetrie", action="store_true", help="ordina le righe dei dipendenti intercambiabili (rottura delle simmetrie)")
+    parser.add_argument("--blocco", type=int, default=None, help="settimane per blocco (orizzonte mobile, solo modello bool)")
+    parser.add_argument("--sovrapposizione", type=int, default=1)
+    parser.add_argument("--statistiche", action="store_true", help="aggiunge il foglio 'Statistiche'")
+    parser.add_argument("--scenari", help="file JSON di scenari what-if da confrontare con il piano base")
+    parser.add_argument("--tempo-scenario", type=int, default=60, help="secondi massimi per scenario")
+    parser.add_argument("-v", "--verbose", action="store_true", help="stampa su stderr ogni soluzione migliorativa")
+    return parser
+
+
+def main(argv=None):
+    # l'organico si legge all'import di turni.config: va scelto prima di costruire il parser
+    scelta = argparse.ArgumentParser(add_help=False)
+    scelta.add_argument("--organico")
+    organico = scelta.parse_known_args(argv)[0].organico
+    if organico: os.environ["TURNI_ORGANICO"] = organico
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.blocco and args.settimane > args.blocco and args.modello != "bool":
+        parser.error("--blocco (orizzonte mobile) richiede --modello bool")
+    from turni.api import _assenze, _richieste, pianifica
+
+    piano_precedente, archivio, storico = None, None, None
+    assenze, richieste = _assenze(_leggi_voci(args.assenze)), _richieste(_leggi_voci(args.richieste))
+    if args.da_archivio or args.pubblica or args.storico is not None:
+        from turni.archivio import ARCHIVIO, Archivio
+        archivio = Archivio(args.archivio or ARCHIVIO)
+    if args.storico is not None: storico = archivio.contesto(args.inizio, args.storico or None)
+    if args.controlla:
+        return _controlla(args, assenze, richieste, storico)
+    if args.precedente:
+        from turni.importa import leggi_piano
+        piano = leggi_piano(args.precedente, args.inizio, 7 * args.settimane)
+        if piano.avvisi(): print(f"Attenzione: {piano.avvisi()}", file=sys.stderr)
+        piano_precedente = piano.come_soluzione()
+        assenze, richieste = piano.input_riparazione(assenze, richieste)
+    elif args.da_archivio:
+        piano = archivio.carica(args.inizio, 7 * args.settimane)
+        if not piano.giorni_trovati:
+            print("Nessun piano pubblicato nell'archivio per questo periodo.", file=sys.stderr)
+            return 1
+        print(f"Dall'archivio: {piano.giorni_trovati} giorni dei piani {', '.join(map(str, piano.piani))}", file=sys.stderr)
+        piano_precedente = piano.come_soluzione()
+        assenze, richieste = piano.input_riparazione(assenze, richieste)
+
+    if args.scenari:
+        return _scenari(args, piano_precedente, assenze, richieste, storico)
+
+    progresso = None
+    if args.verbose:
+        progresso = lambda p: print(f"[{p['tempo']:7.1f} s] soluzione {p['soluzione']}: obiettivo {p['obiettivo']:.0f} "
+                                    f"(bound {p['bound']:.0f}), copertura {p['copertura']:.0%}", file=sys.stderr)
+    opzioni = dict(model_backend=args.modello, profilo=args.profilo, settimane_blocco=args.blocco, sovrapposizione=args.sovrapposizione,
+                   riparazione_locale=args.locale, obiettivo=args.obiettivo, simmetrie=args.simmetrie, storico=storico)
+    risultato = pianifica(args.inizio, args.settimane, assenze, richieste, piano_precedente=piano_precedente,
+                          report_sheet=args.statistiche, on_progress=progresso, **opzioni)
+
+    for k, v in risultato.statistiche.items(): print(f"{k}: {v}")
+    if not risultato.risolto:
+        print("Nessuna soluzione trovata.", file=sys.stderr)
+        for riga in risultato.report.problemi or risultato.report.conflitto: print(f"  - {riga}", file=sys.stderr)
+        return 1
+    with open(args.output, "wb") as f: f.write(risultato.excel)
+    print(f"Scritto {args.output}")
+    for formato in args.tabella:
+        percorso = f"{os.path.splitext(args.output)[0]}.{formato}"
+        with open(percorso, "wb") as f: f.write(risultato.tabella(formato))
+        print(f"Scritto {percorso}")
+    if args.pubblica:
+        opzioni.pop("storico")
+        piano = archivio.salva(args.inizio, risultato.soluzione(), assenze, richieste, risultato.report, f"CLI {args.output}", **opzioni)
+        print(f"Pubblicato nell'archivio come piano {piano}")
+    return 0
+
+
+def _controlla(args, assenze, richieste, storico):
+    from turni.controllo import controlla_piano
+    from turni.importa import leggi_piano
+
+    piano = leggi_piano(args.controlla, args.inizio, 7 * args.settimane)
+    if piano.avvisi(): print(f"Attenzione: {piano.avvisi()}", file=sys.stderr)
+    t0 = time.perf_counter()
+    violazioni = controlla_piano(args.inizio, piano.turni, *piano.input_riparazione(assenze, richieste), storico=storico)
+    for v in violazioni: print(v.testo(args.inizio))
+    print(f"{len(violazioni)} violazioni in {1000 * (time.perf_counter() - t0):.1f} ms", file=sys.stderr)
+    return 1 if violazioni else 0
+
+
+def _scenari(args, piano_precedente, assenze, richieste, storico):
+    from turni.api import confronta
+    from turni.scenari import tabella_confronto
+
+    with open(args.scenari, encoding="utf-8") as f: scenari = json.load(f)
+    esiti = confronta(args.inizio, args.settimane, scenari, assenze, richieste,
+                      piano_precedente=piano_precedente, max_tempo=args.tempo_scenario, model_backend=args.modello,
+                      report_sheet=args.statistiche, profilo=args.profilo, riparazione_locale=args.locale,
+                      obiettivo=args.obiettivo, simmetrie=args.simmetrie, storico=storico)
+    righe = tabella_confronto(esiti)
+    colonne = list(dict.fromkeys(k for riga in righe for k in riga))
+    writer = csv.DictWriter(sys.stdout, colonne, delimiter="\t")
+    writer.writeheader()
+    writer.writerows(righe)
+    for esito in esiti:
+        if not esito.excel: continue
+        percorso = f"{os.path.splitext(args.output)[0]}_{re.sub(r'[^A-Za-z0-9_-]+', '_', esito.nome)}.xlsx"
+        with open(percorso, "wb") as f: f.write(esito.excel)
+        print(f"Scritto {percorso}", file=sys.stderr)
+    return 0 if any(e.risolto for e in esiti) else 1
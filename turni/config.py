@@ -0,0 +1,62 @@
+"""Costanti di reparto: turni, regole e organico della sede usati dal motore e dalla UI."""
+
+import os
+
+from turni.organico import ORGANICO_DEFAULT, carica_organico
+
+# ==============================================================================
+# 1. CONFIGURAZIONE COSTANTI & REGOLE
+# ==============================================================================
+
+# Riposi minimi: dopo il turno in chiave, i turni in lista sono vietati il giorno seguente
+REGOLE_RIPOSO = {
+    9:  [1, 2, 3, 4, 5, 6],
+    10: [1, 2, 3, 4, 5],
+    8:  [1, 2, 3, 4],
+    7:  [1, 2, 3],
+}
+MAX_GIORNI_CONSECUTIVI = 5
+GIORNI_LAVORO_SETTIMANA = 5
+
+GIORNI_SETT_IT = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
+
+TEXT_TO_ID = {
+    "-": 0, "FERIE": 0, "REQ": 0, "ASSENTE": 0,
+    "07:00": 1, "08:00": 2, "09:00": 3, "10:00": 4, "11:00": 5,
+    "12:00": 6, "15:00": 7, "16:00": 8, "17:00": 10,
+    "CHIUSURA": 9, "18-02": 9, "20-04": 9
+}
+
+TURNI_CONFIG = {
+    1:  {"txt": "07:00",    "cat": "M", "critico": 2, "ideale": 3, "bg": "#B4C6E7", "font": "#000000"},
+    2:  {"txt": "08:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#8EA9DB", "font": "#000000"},
+    3:  {"txt": "09:00",    "cat": "M", "critico": 1, "ideale": 1, "bg": "#305496", "font": "#FFFFFF"},
+    4:  {"txt": "10:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#D9E1F2", "font": "#000000"},
+    5:  {"txt": "11:00",    "cat": "M", "critico": 0, "ideale": 1, "bg": "#E2EFDA", "font": "#000000"},
+    6:  {"txt": "12:00",    "cat": "M", "critico": 1, "ideale": 2, "bg": "#A9D08E", "font": "#000000"},
+    7:  {"txt": "15:00",    "cat": "L", "critico": 0, "ideale": 1, "bg": "#FFF2CC", "font": "#000000"},
+    8:  {"txt": "16:00",    "cat": "L", "critico": 3, "ideale": 3, "bg": "#FFD966", "font": "#000000"},
+    10: {"txt": "17:00",    "cat": "L", "critico": 0, "ideale": 1, "bg": "#F4B084", "font": "#000000"}, 
+    9:  {"txt": "CHIUSURA", "cat": "L", "critico": 1, "ideale": 1, "bg": "#C00000", "font": "#FFFFFF"},
+}
+RIPOSO_CFG = {"txt": "-", "bg": "#FFFFFF", "font": "#D3D3D3"}
+
+# Organico della sede (dipendenti, ruoli, permessi, rotazione notti): un file JSON per
+# sede, scelto con TURNI_ORGANICO. ALL_STAFF[n] e' il dipendente con id n.
+ORGANICO = carica_organico(os.environ.get("TURNI_ORGANICO") or ORGANICO_DEFAULT, TURNI_CONFIG, GIORNI_SETT_IT)
+ALL_STAFF = list(ORGANICO.nomi)
+NUM_STAFF = len(ALL_STAFF)
+RUOLO_ACCETTATORI = "accettatore"  # copertura minima di accettatori in servizio e di sera
+
+# Profili di calcolo: worker paralleli (limitati ai core disponibili), gap relativo
+# a cui fermarsi e tempo massimo in secondi
+PROFILI_SOLVER = {
+    "bozza":        {"label": "Bozza rapida",  "workers": 4,  "gap": 0.05, "max_time": 30},
+    "bilanciato":   {"label": "Bilanciato",    "workers": 8,  "gap": 0.01, "max_time": 120},
+    "approfondito": {"label": "Approfondito",  "workers": 16, "gap": 0.0,  "max_time": 300},
+}
+
+# Obiettivo a fasi (lessicografico): fasi in ordine di priorita' e quota del tempo massimo
+# del profilo per ciascuna; una fase senza termini cede la sua quota alle successive
+FASI_OBIETTIVO = {"copertura": 0.6, "stabilita": 0.15, "equilibrio": 0.25}
+OBIETTIVI = ("pesato", "a_fasi")
@@ -0,0 +1,182 @@
+"""Controllo istantaneo di un piano gia' fatto (anche modificato a mano) contro le regole del modello.
+
+Lavora sulla matrice dipendente x giorno degli id turno, con operazioni numpy sull'intera
+matrice: turni ammessi da ruolo, assenze, richieste e rotazione (gli stessi domini del
+motore), riposi minimi, giorni di fila, giorni lavorati e massimi per settimana, copertura
+critica, una CHIUSURA al giorno, il 17:00 di venerdi' e sabato, accettatori di sera e in
+servizio. Restituisce ogni violazione con la sua cella, in pochi millisecondi e senza solver.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from turni.config import (
+    ALL_STAFF, NUM_STAFF, ORGANICO, RUOLO_ACCETTATORI, REGOLE_RIPOSO, MAX_GIORNI_CONSECUTIVI, GIORNI_LAVORO_SETTIMANA,
+    TURNI_CONFIG,
+)
+from turni.engine import ContestoBlocco
+from turni.esporta import matrice_da_soluzione
+from turni.importa import MANCANTE
+from turni.regole import (
+    MAX_ID_TURNO, TURNI_SERA, applica_rotazione, domini_turni, indici_input, testo_giorno, turni_ammessi,
+)
+
+REGOLE = {
+    "cella": "Cella vuota o non riconosciuta",
+    "ruolo": "Turno non ammesso dal ruolo",
+    "assenza": "Turno in un giorno di ferie o richiesta OFF",
+    "richiesta": "Turno diverso da quello richiesto",
+    "rotazione": "Rotazione notti non rispettata",
+    "riposo": "Riposo minimo dopo il turno precedente",
+    "consecutivi": f"Piu' di {MAX_GIORNI_CONSECUTIVI} giorni di lavoro di fila",
+    "carico": "Giorni lavorati nella settimana",
+    "max_settimana": "Massimo settimanale di un turno",
+    "copertura": "Copertura critica",
+    "chiusura": "Una CHIUSURA al giorno",
+    "17:00": "Un 17:00 il venerdi' e il sabato",
+    "accettatori_sera": "Almeno 2 accettatori di sera",
+    "accettatori": "Almeno 3 accettatori in servizio",
+}
+
+_VIETATI = np.zeros((MAX_ID_TURNO + 1, MAX_ID_TURNO + 1), dtype=bool)  # [turno, turno del giorno dopo]
+for _t, _vietati in REGOLE_RIPOSO.items(): _VIETATI[_t, _vietati] = True
+_RUOLO = np.zeros((NUM_STAFF, 7, MAX_ID_TURNO + 1), dtype=bool)   # [dipendente, giorno della settimana, turno]
+for _n in range(NUM_STAFF):
+    for _g in range(7): _RUOLO[_n, _g, list(turni_ammessi(_n, _g))] = True
+
+
+@dataclass(frozen=True)
+class Violazione:
+    """Regola violata (chiave di REGOLE) nel giorno `giorno`; `dipendente` e' None per le regole del giorno intero.
+
+    Le regole settimanali (carico, max_settimana) indicano il lunedi' della settimana.
+    """
+    regola: str
+    giorno: int
+    dipendente: str | None
+    dettaglio: str
+
+    def testo(self, start_date):
+        chi = f", {self.dipendente}" if self.dipendente else ""
+        return f"{testo_giorno(start_date, self.giorno)}{chi}: {REGOLE[self.regola]} ({self.dettaglio})"
+
+
+def _testo_turno(t):
+    return TURNI_CONFIG[t]['txt'] if t in TURNI_CONFIG else "riposo"
+
+
+def controlla_matrice(matrice, FERIE_INDICI=None, REQ_OFF_INDICI=None, REQ_TURNI_INDICI=None, contesto=None):
+    """Violazioni della matrice NUM_STAFF x giorni (MANCANTE per le celle vuote), ordinate per giorno.
+
+    Gli indici sono quelli di solve_turni; con `contesto` (ContestoBlocco) rotazione, riposi e
+    giorni di fila proseguono dalle settimane precedenti come nel modello.
+    """
+    FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI = FERIE_INDICI or {}, REQ_OFF_INDICI or {}, REQ_TURNI_INDICI or {}
+    contesto = contesto or ContestoBlocco()
+    matrice = np.asarray(matrice)
+    NUM_GIORNI = matrice.shape[1]
+    NUM_SETTIMANE = NUM_GIORNI // 7
+    violazioni = []
+
+    def aggiungi(regola, dipendenti, giorni_violati, dettagli):
+        for n, d, dettaglio in zip(dipendenti, giorni_violati, dettagli):
+            violazioni.append(Violazione(regola, int(d), ALL_STAFF[n] if n is not None else None, dettaglio))
+
+    mancante = (matrice < 0) | (matrice > MAX_ID_TURNO)
+    aggiungi("cella", *np.nonzero(mancante), (f"valore {v}" for v in matrice[mancante].tolist()))
+    turni = np.where(mancante, 0, matrice).astype(np.int64)
+    righe, giorni = np.arange(NUM_STAFF)[:, None], np.arange(NUM_GIORNI)[None, :]
+    lavorato = turni > 0
+
+    # turni ammessi: ruolo, poi assenze, richieste e rotazione come nei domini del motore
+    domini = domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, contesto.settimana)
+    ammessi = np.zeros((NUM_STAFF, NUM_GIORNI, MAX_ID_TURNO + 1), dtype=bool)
+    for (n, d), dominio in domini.items(): ammessi[n, d, list(dominio)] = True
+    assenti = np.zeros((NUM_STAFF, NUM_GIORNI), dtype=np.int64)   # giorni contati due volte come nel carico del motore
+    richiesti = np.full((NUM_STAFF, NUM_GIORNI), -1)
+    for n, nome in enumerate(ALL_STAFF):
+        for indici in (FERIE_INDICI, REQ_OFF_INDICI):
+            np.add.at(assenti[n], [d for d in indici.get(nome, ()) if 0 <= d < NUM_GIORNI], 1)
+        for d, t in REQ_TURNI_INDICI.get(nome, {}).items():
+            if 0 <= d < NUM_GIORNI: richiesti[n, d] = t
+    fuori_ruolo = ~_RUOLO[righe, giorni % 7, turni] & ~mancante
+    fuori_dominio = ~ammessi[righe, giorni, turni] & ~mancante & ~fuori_ruolo
+    aggiungi("ruolo", *np.nonzero(fuori_ruolo), map(_testo_turno, turni[fuori_ruolo].tolist()))
+    in_assenza = fuori_dominio & (assenti > 0)
+    aggiungi("assenza", *np.nonzero(in_assenza), map(_testo_turno, turni[in_assenza].tolist()))
+    diverso = fuori_dominio & ~in_assenza & (richiesti >= 0)
+    aggiungi("richiesta", *np.nonzero(diverso), (f"{_testo_turno(t)} invece di {_testo_turno(r)}"
+                                                 for t, r in zip(turni[diverso].tolist(), richiesti[diverso].tolist())))
+    rotazione = fuori_dominio & ~in_assenza & (richiesti < 0)
+    atteso = lambda n, d: "/".join(map(_testo_turno, sorted(domini[(n, d)]))) or "nessun turno ammesso"
+    aggiungi("rotazione", *np.nonzero(rotazione), (f"{_testo_turno(t)} invece di {atteso(n, d)}"
+                                                   for n, d, t in zip(*np.nonzero(rotazione), turni[rotazione].tolist())))
+
+    # riposi e giorni di fila, con gli ultimi giorni del contesto davanti alla matrice
+    storia = np.zeros((NUM_STAFF, MAX_GIORNI_CONSECUTIVI), dtype=np.int64)
+    for n, nome in enumerate(ALL_STAFF):
+        ultimi = list(contesto.storico.get(nome, []))[-MAX_GIORNI_CONSECUTIVI:]
+        if ultimi: storia[n, -len(ultimi):] = ultimi
+    esteso = np.concatenate([storia, turni], axis=1)
+    riposo = _VIETATI[esteso[:, MAX_GIORNI_CONSECUTIVI - 1:-1], turni]
+    aggiungi("riposo", *np.nonzero(riposo), (f"{_testo_turno(a)} seguito da {_testo_turno(b)}" for a, b in
+                                             zip(esteso[:, MAX_GIORNI_CONSECUTIVI - 1:-1][riposo].tolist(), turni[riposo].tolist())))
+    cumulati = np.concatenate([np.zeros((NUM_STAFF, 1), dtype=np.int64), np.cumsum(esteso > 0, axis=1)], axis=1)
+    finestra = cumulati[:, MAX_GIORNI_CONSECUTIVI + 1:] - cumulati[:, :NUM_GIORNI]   # giorni lavorati in [d - 5, d]
+    di_fila = finestra > MAX_GIORNI_CONSECUTIVI
+    aggiungi("consecutivi", *np.nonzero(di_fila), (f"{MAX_GIORNI_CONSECUTIVI + 1}° giorno di fila" for _ in range(di_fila.sum())))
+
+    # settimane: giorni lavorati uguali al carico, massimi personali per turno
+    settimane = lavorato[:, :7 * NUM_SETTIMANE].reshape(NUM_STAFF, NUM_SETTIMANE, 7).sum(axis=2)
+    carico = np.maximum(0, GIORNI_LAVORO_SETTIMANA - assenti[:, :7 * NUM_SETTIMANE].reshape(NUM_STAFF, NUM_SETTIMANE, 7).sum(axis=2))
+    fuori_carico = settimane != carico
+    aggiungi("carico", np.nonzero(fuori_carico)[0], 7 * np.nonzero(fuori_carico)[1],
+             (f"{s} invece di {c}" for s, c in zip(settimane[fuori_carico].tolist(), carico[fuori_carico].tolist())))
+    for n, t, massimo in ORGANICO.max_settimana:
+        conteggi = (turni[n, :7 * NUM_SETTIMANE] == t).reshape(NUM_SETTIMANE, 7).sum(axis=1)
+        for w in np.nonzero(conteggi > massimo)[0]:
+            aggiungi("max_settimana", [n], [7 * w], [f"{conteggi[w]} turni {_testo_turno(t)}, massimo {massimo}"])
+
+    # copertura del giorno
+    ids = np.array(sorted(TURNI_CONFIG))
+    conteggi = dict(zip(ids.tolist(), (turni[None, :, :] == ids[:, None, None]).sum(axis=1)))
+    for t, cfg in TURNI_CONFIG.items():
+        if t in (9, 10) or not cfg['critico']: continue
+        for d in np.nonzero(conteggi[t] < cfg['critico'])[0]:
+            aggiungi("copertura", [None], [d], [f"{conteggi[t][d]} persone al {cfg['txt']}, minimo {cfg['critico']}"])
+    for d in np.nonzero(conteggi[9] != 1)[0]:
+        aggiungi("chiusura", [None], [d], [f"{conteggi[9][d]} CHIUSURE"])
+    ven_sab = np.isin(np.arange(NUM_GIORNI) % 7, (4, 5))
+    for d in np.nonzero(ven_sab & (conteggi[10] != 1))[0]:
+        aggiungi("17:00", [None], [d], [f"{conteggi[10][d]} turni 17:00"])
+    acc = ORGANICO.con_ruolo(RUOLO_ACCETTATORI)
+    sera = np.isin(turni[acc], TURNI_SERA).sum(axis=0)
+    for d in np.nonzero(sera < 2)[0]:
+        aggiungi("accettatori_sera", [None], [d], [f"{sera[d]} di sera"])
+    in_servizio = lavorato[acc].sum(axis=0)
+    for d in np.nonzero(in_servizio < 3)[0]:
+        aggiungi("accettatori", [None], [d], [f"{in_servizio[d]} in servizio"])
+
+    violazioni.sort(key=lambda v: (v.giorno, v.dipendente or "", v.regola))
+    return violazioni
+
+
+def controlla_piano(start_date, piano, list_assenze=(), list_req_turni=(), num_giorni=None, storico=None):
+    """Violazioni di `piano` con gli input di solve_turni.
+
+    `piano` e' una soluzione {(nome, giorno): turno} o una matrice come PianoImportato.turni.
+    `num_giorni` di default copre tutto il piano a settimane intere; le celle che mancano sono
+    violazioni "cella". `storico` come in solve_turni.
+    """
+    if isinstance(piano, dict):
+        if num_giorni is None: num_giorni = 7 * -(-(1 + max((d for _, d in piano), default=-1)) // 7)
+        piano = matrice_da_soluzione(piano, num_giorni, MANCANTE)
+    _, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI = indici_input(start_date, piano.shape[1], list_assenze, list_req_turni)
+    return controlla_matrice(piano, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, storico)
+
+
+def tabella_violazioni(violazioni, start_date):
+    """Una riga per violazione (giorno, dipendente, regola, dettaglio), per la UI e gli export."""
+    return [{"Giorno": testo_giorno(start_date, v.giorno), "Dipendente": v.dipendente or "-", "Regola": REGOLE[v.regola], "Dettaglio": v.dettaglio} for v in violazioni]
@@ -0,0 +1,206 @@
+"""Diagnosi dei piani impossibili: verifica preliminare e conflitto minimo tra gli input.
+
+`verifica_preliminare` guarda solo i domini delle celle (ruoli, assenze, richieste e
+rotazione gia' applicati) e in pochi millisecondi trova i casi evidenti: giorni senza
+abbastanza accettatori, personale di notte o copertura critica, settimane in cui il carico
+non torna, richieste che violano un riposo. Se trova qualcosa il solver non parte.
+
+`spiega_conflitto` serve quando il solver non trova soluzione: ricostruisce i vincoli
+duri in un modello di sola ammissibilita' dove ogni assenza, richiesta, slot di rotazione,
+regola di copertura giornaliera e carico settimanale e' un gruppo attivato da un
+letterale di assunzione. Dal nucleo restituito da CP-SAT toglie un gruppo alla volta
+finche' resta impossibile: quello che rimane e' un insieme minimo di input in conflitto.
+"""
+
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from turni.config import (
+    ALL_STAFF, NUM_STAFF, ORGANICO, RUOLO_ACCETTATORI, REGOLE_RIPOSO, MAX_GIORNI_CONSECUTIVI,
+    TURNI_CONFIG,
+)
+from turni.regole import MAX_ID_TURNO, TURNI_SERA, applica_rotazione, domini_turni, target_settimanale, testo_giorno
+
+# Tempo massimo dell'intera spiegazione e di ogni prova di rimozione di un gruppo
+DIAGNOSI_MAX_TEMPO = 30
+DIAGNOSI_TEMPO_PROVA = 3
+
+
+def verifica_preliminare(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI):
+    """Problemi evidenti del piano, come frasi per l'utente (lista vuota se non ne trova)."""
+    NUM_GIORNI = 7 * NUM_SETTIMANE
+    domini = domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI)
+    ammessi = np.zeros((NUM_STAFF, NUM_GIORNI, MAX_ID_TURNO + 1), dtype=bool)
+    for (n, d), dominio in domini.items(): ammessi[n, d, list(dominio)] = True
+    lavora = ammessi[:, :, 1:].any(axis=2)
+    obbligato = ~ammessi[:, :, 0]
+    unico = ammessi.sum(axis=2) == 1
+    fisso = np.where(unico, ammessi.argmax(axis=2), -1)
+    acc = np.zeros(NUM_STAFF, dtype=bool)
+    acc[ORGANICO.con_ruolo(RUOLO_ACCETTATORI)] = True
+
+    problemi = []
+    for n, d in zip(*np.nonzero(~ammessi.any(axis=2))):
+        problemi.append(f"{ALL_STAFF[n]} {testo_giorno(start_date, d)}: nessun turno possibile (richiesta, assenza, ruolo o rotazione si escludono)")
+
+    for d in range(NUM_GIORNI):
+        giorno = testo_giorno(start_date, d)
+        per_notte = [9] + ([10] if d % 7 in (4, 5) else [])
+        for t in per_notte:
+            if not ammessi[:, d, t].any(): problemi.append(f"{giorno}: nessuno disponibile per il {TURNI_CONFIG[t]['txt']}")
+            if (fisso[:, d] == t).sum() > 1: problemi.append(f"{giorno}: {TURNI_CONFIG[t]['txt']} imposto a piu' persone")
+        necessari = len(per_notte)
+        for t, cfg in TURNI_CONFIG.items():
+            if t in (9, 10) or not cfg['critico']: continue
+            necessari += cfg['critico']
+            if ammessi[:, d, t].sum() < cfg['critico']:
+                problemi.append(f"{giorno}: {TURNI_CONFIG[t]['txt']} richiede {cfg['critico']} persone, disponibili {ammessi[:, d, t].sum()}")
+        if lavora[:, d].sum() < necessari:
+            problemi.append(f"{giorno}: la copertura minima richiede {necessari} persone, disponibili {lavora[:, d].sum()}")
+        if (lavora[:, d] & acc).sum() < 3:
+            problemi.append(f"{giorno}: servono 3 accettatori in servizio, disponibili {(lavora[:, d] & acc).sum()}")
+        if (ammessi[:, d, TURNI_SERA].any(axis=1) & acc).sum() < 2:
+            problemi.append(f"{giorno}: servono 2 accettatori di sera, disponibili {(ammessi[:, d, TURNI_SERA].any(axis=1) & acc).sum()}")
+
+    for n, nome in enumerate(ALL_STAFF):
+        for w in range(NUM_SETTIMANE):
+            s, e = 7 * w, 7 * w + 7
+            target = target_settimanale(nome, s, e, FERIE_INDICI, REQ_OFF_INDICI)
+            if lavora[n, s:e].sum() < target:
+                problemi.append(f"{nome} sett. {w + 1}: deve lavorare {target} giorni ma ne ha solo {lavora[n, s:e].sum()} possibili")
+            if obbligato[n, s:e].sum() > target:
+                problemi.append(f"{nome} sett. {w + 1}: {obbligato[n, s:e].sum()} giorni imposti oltre il carico di {target}")
+        for d in range(NUM_GIORNI - 1):
+            t1, t2 = fisso[n, d], fisso[n, d + 1]
+            if t2 in REGOLE_RIPOSO.get(t1, ()):
+                problemi.append(f"{nome} {testo_giorno(start_date, d)}: {TURNI_CONFIG[t1]['txt']} seguito da "
+                                f"{TURNI_CONFIG[t2]['txt']} viola il riposo minimo")
+        finestra = np.convolve(obbligato[n].astype(int), np.ones(MAX_GIORNI_CONSECUTIVI + 1, dtype=int), "valid")
+        for d in np.nonzero(finestra > MAX_GIORNI_CONSECUTIVI)[0][:1]:
+            problemi.append(f"{nome} dal {testo_giorno(start_date, d)}: piu' di {MAX_GIORNI_CONSECUTIVI} giorni di lavoro imposti di fila")
+    return problemi
+
+
+def _modello_diagnosi(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI):
+    """Vincoli duri del modello bool con gli input e le regole per giorno attivati da letterali.
+
+    Restano sempre attivi solo ruoli, riposi tra giorni consecutivi e massimo di giorni di fila.
+    """
+    NUM_GIORNI = 7 * NUM_SETTIMANE
+    model = cp_model.CpModel()
+    gruppi = []
+
+    def gruppo(etichetta):
+        a = model.NewBoolVar(f"g_{len(gruppi)}")
+        gruppi.append((a, etichetta))
+        return a
+
+    domini = domini_turni(NUM_GIORNI, {}, {}, {})
+    x, worked = {}, {}
+    for (n, d), dominio in domini.items():
+        x[(n, d)] = {t: model.NewBoolVar(f"x_{n}_{d}_{t}") for t in sorted(dominio)}
+        model.AddExactlyOne(x[(n, d)].values())
+        worked[(n, d)] = sum(b for t, b in x[(n, d)].items() if t > 0)
+
+    def fissa(n, d, t, a):
+        if t in x[(n, d)]: model.AddImplication(a, x[(n, d)][t])
+        else: model.AddBoolOr([a.Not()])
+
+    indice = ORGANICO.indice
+    for tipo, indici in (("Ferie", FERIE_INDICI), ("Richiesta OFF", REQ_OFF_INDICI)):
+        for nome, giorni in indici.items():
+            if nome not in indice: continue
+            for d in giorni: fissa(indice[nome], d, 0, gruppo(f"{tipo} di {nome} {testo_giorno(start_date, d)}"))
+    for nome, richieste in REQ_TURNI_INDICI.items():
+        if nome not in indice: continue
+        for d, t in richieste.items():
+            fissa(indice[nome], d, t, gruppo(f"Richiesta {TURNI_CONFIG[t]['txt']} di {nome} {testo_giorno(start_date, d)}"))
+
+    for w in range(NUM_SETTIMANE if ORGANICO.rotazione else 0):
+        # stessa regola di applica_rotazione: chi e' assente venerdi' o sabato salta il turno
+        n = ORGANICO.rotazione[w % len(ORGANICO.rotazione)]
+        ven, sab, dom = 7 * w + 4, 7 * w + 5, 7 * w + 6
+        assenze = set(FERIE_INDICI.get(ALL_STAFF[n], [])) | set(REQ_OFF_INDICI.get(ALL_STAFF[n], []))
+        if ven in assenze or sab in assenze: continue
+        a = gruppo(f"Rotazione notti sett. {w + 1}: {ALL_STAFF[n]} in CHIUSURA venerdi' e sabato")
+        for d, t in ((ven, 9), (sab, 9), (dom, 0)): fissa(n, d, t, a)
+
+    for n, turno, massimo in ORGANICO.max_settimana:
+        for w in range(NUM_SETTIMANE):
+            conteggio = [x[(n, d)][turno] for d in range(7 * w, 7 * w + 7) if turno in x[(n, d)]]
+            a = gruppo(f"Massimo {massimo} turni {TURNI_CONFIG[turno]['txt']} di {ALL_STAFF[n]} sett. {w + 1}")
+            model.Add(sum(conteggio) <= massimo).OnlyEnforceIf(a)
+
+    acc_idx = ORGANICO.con_ruolo(RUOLO_ACCETTATORI)
+    for d in range(NUM_GIORNI):
+        giorno = testo_giorno(start_date, d)
+        counts = {t: [x[(n, d)][t] for n in range(NUM_STAFF) if t in x[(n, d)]] for t in TURNI_CONFIG}
+        model.Add(sum(counts[9]) == 1).OnlyEnforceIf(gruppo(f"Una CHIUSURA {giorno}"))
+        if d % 7 in (4, 5): model.Add(sum(counts[10]) == 1).OnlyEnforceIf(gruppo(f"Un 17:00 {giorno}"))
+        for t, cfg in TURNI_CONFIG.items():
+            if t in (9, 10) or not cfg['critico']: continue
+            model.Add(sum(counts[t]) >= cfg['critico']).OnlyEnforceIf(gruppo(f"Copertura minima {cfg['txt']} ({cfg['critico']}) {giorno}"))
+        model.Add(sum(x[(n, d)][t] for n in acc_idx for t in TURNI_SERA if t in x[(n, d)]) >= 2).OnlyEnforceIf(
+            gruppo(f"2 accettatori di sera {giorno}"))
+        model.Add(sum(worked[(n, d)] for n in acc_idx) >= 3).OnlyEnforceIf(gruppo(f"3 accettatori in servizio {giorno}"))
+
+    for n, nome in enumerate(ALL_STAFF):
+        for d in range(NUM_GIORNI - 1):
+            for t, vietati in REGOLE_RIPOSO.items():
+                if t not in x[(n, d)]: continue
+                dopo = [x[(n, d + 1)][v] for v in vietati if v in x[(n, d + 1)]]
+                if dopo: model.Add(x[(n, d)][t] + sum(dopo) <= 1)
+        for d in range(NUM_GIORNI - MAX_GIORNI_CONSECUTIVI):
+            model.Add(sum(worked[(n, d + k)] for k in range(MAX_GIORNI_CONSECUTIVI + 1)) <= MAX_GIORNI_CONSECUTIVI)
+        for w in range(NUM_SETTIMANE):
+            target = target_settimanale(nome, 7 * w, 7 * w + 7, FERIE_INDICI, REQ_OFF_INDICI)
+            model.Add(sum(worked[(n, d)] for d in range(7 * w, 7 * w + 7)) == target).OnlyEnforceIf(
+                gruppo(f"Carico di {target} giorni di {nome} sett. {w + 1}"))
+    return model, gruppi
+
+
+def _prova(model, assunzioni, max_tempo):
+    """Stato del modello con solo `assunzioni` attive e, se impossibile, il nucleo (indici di variabile)."""
+    model.ClearAssumptions()
+    model.AddAssumptions(assunzioni)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_tempo
+    solver.parameters.num_workers = 1
+    status = solver.Solve(model)
+    nucleo = set(solver.SufficientAssumptionsForInfeasibility()) if status == cp_model.INFEASIBLE else None
+    return status, nucleo
+
+
+def spiega_conflitto(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, max_tempo=DIAGNOSI_MAX_TEMPO):
+    """Insieme minimo di input e regole in conflitto, come etichette; lista vuota se i vincoli sono compatibili.
+
+    Se il tempo finisce prima di ridurre il nucleo, restituisce quello trovato fin li'
+    (sempre impossibile, ma non necessariamente minimo) con una nota in fondo.
+    """
+    t0 = time.perf_counter()
+    model, gruppi = _modello_diagnosi(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    etichette = {a.Index(): etichetta for a, etichetta in gruppi}
+    status, nucleo = _prova(model, [a for a, _ in gruppi], max_tempo)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return []
+    if nucleo is None:
+        return ["Diagnosi non conclusa nel tempo disponibile"]
+    if not nucleo:
+        return ["Regole di base incompatibili con l'organico (ruoli, riposi, giorni consecutivi)"]
+
+    # riduzione per eliminazione: un gruppo resta solo se senza di lui il piano diventa possibile
+    minimo = True
+    for indice in sorted(nucleo):
+        if indice not in nucleo: continue
+        resto = time.perf_counter() - t0
+        if resto >= max_tempo:
+            minimo = False
+            break
+        prova = [model.GetBoolVarFromProtoIndex(i) for i in nucleo if i != indice]
+        status, ridotto = _prova(model, prova, min(DIAGNOSI_TEMPO_PROVA, max_tempo - resto))
+        if status == cp_model.INFEASIBLE: nucleo = ridotto
+        elif status == cp_model.UNKNOWN: minimo = False
+    return [etichette[i] for i in sorted(nucleo)] + ([] if minimo else ["(insieme non necessariamente minimo)"])
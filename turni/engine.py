@@ -0,0 +1,1012 @@
+"""Motore di calcolo: modello CP-SAT dei turni; import ed export sono in turni.importa e turni.esporta."""
+
+import numpy as np
+from ortools.sat.python import cp_model
+from dataclasses import dataclass, field
+from collections import OrderedDict
+import os
+import time
+
+from turni.config import (
+    ALL_STAFF, NUM_STAFF, ORGANICO, RUOLO_ACCETTATORI, REGOLE_RIPOSO, MAX_GIORNI_CONSECUTIVI,
+    GIORNI_LAVORO_SETTIMANA, TURNI_CONFIG, PROFILI_SOLVER, FASI_OBIETTIVO, OBIETTIVI,
+)
+from turni.esporta import CATEGORIE, matrice_da_soluzione, scrivi_excel, soluzione_da_matrice
+from turni.importa import MANCANTE
+from turni.regole import TURNI_SERA, applica_rotazione, domini_turni, indici_input, target_settimanale
+
+# ==============================================================================
+# 2. MOTORE DI CALCOLO
+# ==============================================================================
+
+# Modelli base (la parte del modello bool che non dipende dagli input) tenuti in memoria, uno per orizzonte
+MAX_MODELLI_BASE = int(os.environ.get("TURNI_MAX_MODELLI_BASE", 4))
+_MODELLI_BASE = OrderedDict()
+
+class _Misuratore:
+    """Accumula tempo, variabili e vincoli che ogni famiglia di vincoli aggiunge al modello."""
+    def __init__(self, model):
+        self.model = model
+        self.famiglie = {}
+        self._corrente = None
+
+    def inizio(self, famiglia):
+        self.fine()
+        proto = self.model.Proto()
+        self._corrente = (famiglia, time.perf_counter(), len(proto.variables), len(proto.constraints))
+
+    def fine(self):
+        if self._corrente is None: return
+        famiglia, t0, n_var, n_vinc = self._corrente
+        proto = self.model.Proto()
+        f = self.famiglie.setdefault(famiglia, {"secondi": 0.0, "variabili": 0, "vincoli": 0})
+        f["secondi"] += time.perf_counter() - t0
+        f["variabili"] += len(proto.variables) - n_var
+        f["vincoli"] += len(proto.constraints) - n_vinc
+        self._corrente = None
+
+@dataclass
+class ReportSolver:
+    """Dove va il tempo di una risoluzione: costruzione per famiglia di vincoli e ricerca CP-SAT."""
+    backend: str
+    famiglie: dict = field(default_factory=dict)
+    tempo_modello: float = 0.0
+    stato: str = ""
+    tempo_solver: float = 0.0
+    conflitti: int = 0
+    branch: int = 0
+    obiettivo: float | None = None
+    bound: float | None = None                      # con l'obiettivo a fasi: bound e gap dell'ultima fase
+    gap: float | None = None
+    profilo: str = ""
+    celle_hint: int = 0
+    soluzioni: int = 0
+    tempo_prima_soluzione: float | None = None
+    giorni_liberi: int | None = None
+    espansioni: int = 0
+    blocchi: list = field(default_factory=list)
+    gruppi_simmetrici: list | None = None           # con la rottura delle simmetrie: nomi di ogni gruppo intercambiabile
+    fasi: list = field(default_factory=list)        # obiettivo a fasi: una riga per fase (e per blocco)
+    problemi: list = field(default_factory=list)    # dalla verifica preliminare: il solver non e' partito
+    conflitto: list = field(default_factory=list)   # insieme minimo di input in conflitto, se non risolto
+    violazioni: list | None = None                  # controllo del piano precedente (turni.controllo), se c'era
+
+    def registra_solver(self, solver, status):
+        self.stato = solver.StatusName(status)
+        self.tempo_solver = solver.WallTime()
+        self.conflitti = solver.NumConflicts()
+        self.branch = solver.NumBranches()
+        if status in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            self.obiettivo = solver.ObjectiveValue()
+            self.bound = solver.BestObjectiveBound()
+            self.gap = abs(self.bound - self.obiettivo) / max(1.0, abs(self.obiettivo))
+
+    def riepilogo(self):
+        return {
+            "Modello": self.backend,
+            "Stato": self.stato,
+            "Costruzione modello (s)": round(self.tempo_modello, 3),
+            "Profilo": self.profilo,
+            "Ricerca CP-SAT (s)": round(self.tempo_solver, 3),
+            "Celle con hint": self.celle_hint,
+            "Riparazione locale": f"{self.giorni_liberi} giorni liberi, {self.espansioni} espansioni" if self.giorni_liberi is not None else "-",
+            "Blocchi orizzonte mobile": len(self.blocchi) if self.blocchi else "-",
+            "Prima soluzione (s)": round(self.tempo_prima_soluzione, 3) if self.tempo_prima_soluzione is not None else "-",
+            "Soluzioni migliorative": self.soluzioni,
+            "Variabili": sum(f["variabili"] for f in self.famiglie.values()),
+            "Vincoli": sum(f["vincoli"] for f in self.famiglie.values()),
+            "Conflitti": self.conflitti,
+            "Branch": self.branch,
+            "Obiettivo": self.obiettivo if self.obiettivo is not None else "-",
+            "Best bound": self.bound if self.bound is not None else "-",
+            "Gap": f"{self.gap:.2%}" if self.gap is not None else "-",
+            "Gruppi simmetrici": (f"{len(self.gruppi_simmetrici)} gruppi, {sum(map(len, self.gruppi_simmetrici))} dipendenti"
+                                  if self.gruppi_simmetrici is not None else "-"),
+            "Obiettivo a fasi": "; ".join(f"{f['Fase']} {f['Valore']} ({f['Stato']})" for f in self.fasi) if self.fasi else "-",
+            "Verifica preliminare": f"{len(self.problemi)} problemi" if self.problemi else "OK",
+            "Conflitto": "; ".join(self.conflitto) if self.conflitto else "-",
+            "Piano precedente": ("-" if self.violazioni is None else f"{len(self.violazioni)} violazioni" if self.violazioni
+                                 else "valido, solver non avviato"),
+        }
+
+    def aggiungi_blocco(self, settimana, settimane, report):
+        """Somma al report complessivo quello di un blocco dell'orizzonte mobile."""
+        self.blocchi.append({"Blocco": len(self.blocchi) + 1, "Settimane": f"{settimana + 1}-{settimana + settimane}",
+                             "Stato": report.stato, "Secondi": round(report.tempo_modello + report.tempo_solver, 3),
+                             "Obiettivo": report.obiettivo if report.obiettivo is not None else "-"})
+        self.fasi += [dict(f, Blocco=len(self.blocchi)) for f in report.fasi]
+        if report.gruppi_simmetrici is not None: self.gruppi_simmetrici = report.gruppi_simmetrici
+        for nome, f in report.famiglie.items():
+            tot = self.famiglie.setdefault(nome, {"secondi": 0.0, "variabili": 0, "vincoli": 0})
+            for k in tot: tot[k] += f[k]
+        self.tempo_modello += report.tempo_modello
+        self.tempo_solver += report.tempo_solver
+        self.conflitti += report.conflitti
+        self.branch += report.branch
+        self.soluzioni += report.soluzioni
+        self.celle_hint += report.celle_hint
+        if self.tempo_prima_soluzione is None: self.tempo_prima_soluzione = report.tempo_prima_soluzione
+        self.stato, self.obiettivo, self.bound, self.gap = report.stato, report.obiettivo, report.bound, report.gap
+
+    def tabella_famiglie(self):
+        return [{"Famiglia": k, "Secondi": round(f["secondi"], 4), "Variabili": f["variabili"], "Vincoli": f["vincoli"]}
+                for k, f in sorted(self.famiglie.items(), key=lambda kv: -kv[1]["secondi"])]
+
+@dataclass
+class ModelloTurni:
+    """Modello costruito: `shifts[(n, d)]` vale l'id del turno; `lits` sono i letterali one-hot (solo bool)."""
+    model: cp_model.CpModel
+    shifts: dict
+    objective: object
+    famiglie: dict
+    lits: dict | None = None
+    carichi: dict | None = None    # solo modello base: (n, settimana) -> giorni da lavorare, fissati dagli input
+    obiettivi: dict = field(default_factory=dict)   # fase di FASI_OBIETTIVO -> termine; `objective` ne e' la somma
+
+    def matrice(self, solver):
+        """La soluzione come matrice NUM_STAFF x giorni di id turno, letta in blocco dalla risposta del solver."""
+        valori = np.array(solver.ResponseProto().solution, dtype=np.int64)
+        NUM_GIORNI = len(self.shifts) // NUM_STAFF
+        if self.lits is None:
+            indici = np.array([[self.shifts[(n, d)].Index() for d in range(NUM_GIORNI)] for n in range(NUM_STAFF)])
+            return valori[indici].astype(np.int8)
+        celle, turni, indici = [], [], []
+        for (n, d), lits in self.lits.items():
+            for t, b in lits.items():
+                celle.append(n * NUM_GIORNI + d)
+                turni.append(t)
+                indici.append(b.Index())
+        piatta = np.bincount(celle, weights=np.array(turni) * valori[indici], minlength=NUM_STAFF * NUM_GIORNI)
+        return piatta.reshape(NUM_STAFF, NUM_GIORNI).astype(np.int8)
+
+    def aggiungi_hint(self, hint):
+        """Suggerisce al solver l'assegnazione {(n, d): turno}; le celle fuori dominio restano libere."""
+        celle = 0
+        for (n, d), t in hint.items():
+            if (n, d) not in self.shifts: continue
+            if self.lits is None: self.model.AddHint(self.shifts[(n, d)], t)
+            elif t in self.lits[(n, d)]:
+                for v, b in self.lits[(n, d)].items(): self.model.AddHint(b, v == t)
+            else: continue
+            celle += 1
+        return celle
+
+@dataclass
+class ContestoBlocco:
+    """Stato che un blocco dell'orizzonte mobile eredita dalle settimane gia' fissate."""
+    settimana: int = 0                              # settimane gia' fissate (posizione nella rotazione notti)
+    storico: dict = field(default_factory=dict)     # nome -> turni degli ultimi giorni, dal piu' vecchio
+    weekend: dict = field(default_factory=dict)     # nome -> weekend lavorati finora
+    mattine: dict = field(default_factory=dict)
+    sere: dict = field(default_factory=dict)
+    settimane_precedenti: int = 0                   # settimane di piani gia' pubblicati contate in weekend e mattine/sere
+
+    @property
+    def settimane_contate(self):
+        return self.settimana + self.settimane_precedenti
+
+    @classmethod
+    def da_matrice(cls, matrice, settimana, precedente=None):
+        """Contesto per un blocco che parte dalla settimana `settimana` della matrice dipendente x giorno.
+
+        Con `precedente` (lo storico dell'archivio passato al primo blocco) i suoi totali si sommano.
+        """
+        precedente = precedente or cls()
+        fissate = matrice[:, :7 * settimana]
+        lavorato = fissate > 0
+        storico = fissate[:, -MAX_GIORNI_CONSECUTIVI:].tolist() if settimana else [precedente.storico.get(n, []) for n in ALL_STAFF]
+        weekend = (lavorato[:, 5::7] | lavorato[:, 6::7]).sum(axis=1).tolist()
+        mattine = (CATEGORIE[fissate] == "M").sum(axis=1).tolist()
+        sere = (CATEGORIE[fissate] == "L").sum(axis=1).tolist()
+        somma = lambda valori, prima: {nome: v + prima.get(nome, 0) for nome, v in zip(ALL_STAFF, valori)}
+        return cls(settimana, dict(zip(ALL_STAFF, storico)), somma(weekend, precedente.weekend),
+                   somma(mattine, precedente.mattine), somma(sere, precedente.sere), precedente.settimane_precedenti)
+
+class _CallbackProgresso(cp_model.CpSolverSolutionCallback):
+    """Registra ogni soluzione migliorativa e la inoltra a `on_progress`, se presente.
+
+    Oltre a obiettivo e bound riporta la copertura: la quota di coppie (giorno, turno)
+    che raggiungono il numero ideale di persone.
+    """
+    def __init__(self, shifts, NUM_GIORNI, report, on_progress=None):
+        super().__init__()
+        self.shifts = shifts
+        self.NUM_GIORNI = NUM_GIORNI
+        self.report = report
+        self.on_progress = on_progress
+
+    def on_solution_callback(self):
+        self.report.soluzioni += 1
+        if self.report.tempo_prima_soluzione is None: self.report.tempo_prima_soluzione = self.WallTime()
+        if self.on_progress is None: return
+        coperti, obiettivi = 0, 0
+        for d in range(self.NUM_GIORNI):
+            counts = {t: 0 for t in TURNI_CONFIG}
+            for n in range(NUM_STAFF):
+                val = self.Value(self.shifts[(n, d)])
+                if val > 0: counts[val] += 1
+            for t, cfg in TURNI_CONFIG.items():
+                if t == 10 and d % 7 not in (4, 5): continue
+                obiettivi += 1
+                if counts[t] >= cfg['ideale']: coperti += 1
+        self.on_progress({
+            "soluzione": self.report.soluzioni,
+            "tempo": self.WallTime(),
+            "obiettivo": self.ObjectiveValue(),
+            "bound": self.BestObjectiveBound(),
+            "copertura": coperti / obiettivi,
+        })
+
+def _automa_regole():
+    """Compila REGOLE_RIPOSO e MAX_GIORNI_CONSECUTIVI in un automa sui valori di turno.
+
+    Lo stato e' (turno serale del giorno prima, giorni lavorati di fila): i turni vietati
+    dal riposo e il giorno oltre il massimo consecutivo semplicemente non hanno transizione.
+    """
+    classi = [None] + list(REGOLE_RIPOSO)
+    stato = lambda c, k: c * (MAX_GIORNI_CONSECUTIVI + 1) + k
+    transitions = []
+    for c, prev in enumerate(classi):
+        vietati = set(REGOLE_RIPOSO.get(prev, []))
+        for k in range(MAX_GIORNI_CONSECUTIVI + 1):
+            transitions.append((stato(c, k), 0, stato(0, 0)))
+            if k == MAX_GIORNI_CONSECUTIVI: continue
+            for t in TURNI_CONFIG:
+                if t in vietati: continue
+                c_next = classi.index(t) if t in REGOLE_RIPOSO else 0
+                transitions.append((stato(c, k), t, stato(c_next, k + 1)))
+    finals = list(range(len(classi) * (MAX_GIORNI_CONSECUTIVI + 1)))
+    return stato(0, 0), finals, transitions
+
+def _build_model_int(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita=500):
+    """Modello storico: una IntVar 0..10 per cella, canalizzata su BoolVar reificate."""
+    model = cp_model.CpModel()
+    misura = _Misuratore(model)
+    misura.inizio("variabili")
+    shifts = {}
+    for n in range(NUM_STAFF):
+        for d in range(NUM_GIORNI): shifts[(n, d)] = model.NewIntVar(0, 10, f's_{n}_{d}')
+    worked = {}
+    for n in range(NUM_STAFF):
+        for d in range(NUM_GIORNI):
+            bw = model.NewBoolVar(f'wk_{n}_{d}')
+            model.Add(shifts[(n, d)] > 0).OnlyEnforceIf(bw)
+            model.Add(shifts[(n, d)] == 0).OnlyEnforceIf(bw.Not())
+            worked[(n, d)] = bw
+
+    # APPLICAZIONI INPUT
+    misura.inizio("input")
+    for nome, indices in FERIE_INDICI.items():
+        if nome in ORGANICO.indice:
+            n_idx = ORGANICO.indice[nome]
+            for d in indices: model.Add(shifts[(n_idx, d)] == 0)
+    for nome, indices in REQ_OFF_INDICI.items():
+        if nome in ORGANICO.indice:
+            n_idx = ORGANICO.indice[nome]
+            for d in indices: model.Add(shifts[(n_idx, d)] == 0)
+    for nome, req_map in REQ_TURNI_INDICI.items():
+        if nome in ORGANICO.indice:
+            n_idx = ORGANICO.indice[nome]
+            for d, t_id in req_map.items(): model.Add(shifts[(n_idx, d)] == t_id)
+
+    # MODALITA' RIPARAZIONE
+    misura.inizio("stabilita")
+    score_stability = 0
+    if previous_solution and peso_stabilita:
+        for n in range(NUM_STAFF):
+            nome = ALL_STAFF[n]
+            for d in range(NUM_GIORNI):
+                if (nome, d) in previous_solution:
+                    old_val = previous_solution[(nome, d)]
+                    is_now_ferie = (d in FERIE_INDICI.get(nome, []) or d in REQ_OFF_INDICI.get(nome, []))
+                    if not is_now_ferie:
+                        is_same = model.NewBoolVar(f'same_{n}_{d}')
+                        model.Add(shifts[(n, d)] == old_val).OnlyEnforceIf(is_same)
+                        model.Add(shifts[(n, d)] != old_val).OnlyEnforceIf(is_same.Not())
+                        score_stability += is_same * peso_stabilita
+
+    # VINCOLI RUOLI
+    misura.inizio("ruoli")
+    tutti = {0} | set(TURNI_CONFIG)
+    for n in range(NUM_STAFF):
+        vietati = [sorted(tutti - ORGANICO.turni_ammessi(n, g)) for g in range(7)]
+        for d in range(NUM_GIORNI):
+            for t in vietati[d % 7]: model.Add(shifts[(n, d)] != t)
+
+    for n, turno, massimo in ORGANICO.max_settimana:
+        for w in range(NUM_SETTIMANE):
+            s = w * 7; e = s + 7
+            conteggio = []
+            for d in range(s, e):
+                if d < NUM_GIORNI:
+                    b = model.NewBoolVar(f'max_{n}_{turno}_{d}')
+                    model.Add(shifts[(n, d)] == turno).OnlyEnforceIf(b)
+                    model.Add(shifts[(n, d)] != turno).OnlyEnforceIf(b.Not())
+                    conteggio.append(b)
+            model.Add(sum(conteggio) <= massimo)
+
+    misura.inizio("rotazione")
+    for w in range(NUM_SETTIMANE if ORGANICO.rotazione else 0):
+        idx = ORGANICO.rotazione[w % len(ORGANICO.rotazione)]
+        nome_rot = ALL_STAFF[idx]
+        ven = 4 + (w*7); sab = 5 + (w*7); dom = 6 + (w*7)
+        if ven < NUM_GIORNI:
+            skip_rot = False
+            if nome_rot in FERIE_INDICI and (ven in FERIE_INDICI[nome_rot] or sab in FERIE_INDICI[nome_rot]): skip_rot = True
+            if nome_rot in REQ_OFF_INDICI and (ven in REQ_OFF_INDICI[nome_rot] or sab in REQ_OFF_INDICI[nome_rot]): skip_rot = True
+            if not skip_rot:
+                model.Add(shifts[(idx, ven)] == 9)
+                if sab < NUM_GIORNI: model.Add(shifts[(idx, sab)] == 9)
+                if dom < NUM_GIORNI: model.Add(shifts[(idx, dom)] == 0)
+
+    misura.inizio("copertura")
+    score_coverage = 0 
+    score_balance = 0
+    score_weekend_balance = 0
+    staff_m_counts = [[] for _ in range(NUM_STAFF)]
+    staff_l_counts = [[] for _ in range(NUM_STAFF)]
+    bit_acc = ORGANICO.bit(RUOLO_ACCETTATORI)
+
+    for d in range(NUM_GIORNI):
+        counts = {t: [] for t in TURNI_CONFIG}
+        acc_eve = []
+        seniors = []
+        giorno_sett = d % 7
+        is_weekend_night = (giorno_sett == 4 or giorno_sett == 5)
+        
+        weight_day = 20
+        if giorno_sett == 5 or giorno_sett == 6: weight_day = 100 
+        elif giorno_sett == 0 or giorno_sett == 4: weight_day = 1   
+
+        for n in range(NUM_STAFF):
+            for t in TURNI_CONFIG:
+                b = model.NewBoolVar(f'is_{t}_{n}_{d}')
+                model.Add(shifts[(n, d)] == t).OnlyEnforceIf(b)
+                model.Add(shifts[(n, d)] != t).OnlyEnforceIf(b.Not())
+                counts[t].append(b)
+                if TURNI_CONFIG[t]['cat'] == 'M': staff_m_counts[n].append(b)
+                elif TURNI_CONFIG[t]['cat'] == 'L': staff_l_counts[n].append(b)
+
+            if ORGANICO.bit_ruoli[n] & bit_acc:
+                v_eve = model.NewBoolVar(f'acc_eve_{n}_{d}')
+                model.Add(shifts[(n, d)] >= 8).OnlyEnforceIf(v_eve)
+                model.Add(shifts[(n, d)] < 8).OnlyEnforceIf(v_eve.Not())
+                acc_eve.append(v_eve)
+                seniors.append(worked[(n, d)])
+
+        if is_weekend_night: model.Add(sum(counts[10]) == 1)
+        else: model.Add(sum(counts[10]) == 0)
+        model.Add(sum(counts[9]) == 1)
+
+        for t, cfg in TURNI_CONFIG.items():
+            if t == 10 or t == 9: continue
+            if cfg['critico'] > 0: model.Add(sum(counts[t]) >= cfg['critico'])
+            if cfg['ideale'] > cfg['critico'] or cfg['critico'] == 0:
+                covered = model.NewBoolVar(f'cov_{t}_{d}')
+                model.Add(sum(counts[t]) >= cfg['ideale']).OnlyEnforceIf(covered)
+                weight_shift = 10
+                if t == 1: weight_shift = 50 
+                elif t == 7: weight_shift = 5 
+                score_coverage += covered * weight_day * weight_shift
+
+        model.Add(sum(acc_eve) >= 2)
+        model.Add(sum(seniors) >= 3)
+
+    misura.inizio("bilanciamento")
+    for n in range(NUM_STAFF):
+        if ORGANICO.bilanciati[n]:
+            tot_m = sum(staff_m_counts[n])
+            tot_l = sum(staff_l_counts[n])
+            diff = model.NewIntVar(0, NUM_GIORNI, f'diff_ml_{n}')
+            model.Add(diff >= tot_m - tot_l)
+            model.Add(diff >= tot_l - tot_m)
+            score_balance -= diff * 5
+
+    misura.inizio("weekend")
+    for n in range(NUM_STAFF):
+        we_days_worked = []
+        for w in range(NUM_SETTIMANE):
+            idx_sab = 5 + (w * 7); idx_dom = 6 + (w * 7)
+            if idx_dom < NUM_GIORNI:
+                is_we_active = model.NewBoolVar(f'we_act_{n}_{w}')
+                model.AddMaxEquality(is_we_active, [worked[(n, idx_sab)], worked[(n, idx_dom)]])
+                we_days_worked.append(is_we_active)
+        tot_we = sum(we_days_worked)
+        excess = model.NewIntVar(0, NUM_SETTIMANE, f'exc_we_{n}')
+        model.Add(tot_we <= int(NUM_SETTIMANE * 0.7) + excess)
+        score_weekend_balance -= excess * 50
+
+    # RIPOSI E GIORNI CONSECUTIVI: un automa per dipendente
+    misura.inizio("riposi")
+    start, finals, transitions = _automa_regole()
+    for n in range(NUM_STAFF):
+        model.AddAutomaton([shifts[(n, d)] for d in range(NUM_GIORNI)], start, finals, transitions)
+
+    misura.inizio("finestra")
+    for n in range(NUM_STAFF):
+        for w in range(NUM_SETTIMANE):
+            s = w*7; e = min(s+7, NUM_GIORNI)
+            target = target_settimanale(ALL_STAFF[n], s, e, FERIE_INDICI, REQ_OFF_INDICI)
+            model.Add(sum(worked[(n, d)] for d in range(s, e)) == target)
+
+    misura.inizio("copertura")
+    for d in range(NUM_GIORNI):
+        for i, turno, peso in ORGANICO.bonus:
+            b = model.NewBoolVar(f'bonus_{turno}_{d}_{i}')
+            model.Add(shifts[(i, d)] == turno).OnlyEnforceIf(b)
+            score_coverage += b * peso
+
+    misura.fine()
+    obiettivi = {"copertura": score_coverage, "stabilita": score_stability, "equilibrio": score_balance + score_weekend_balance}
+    return ModelloTurni(model, shifts, score_coverage + score_balance + score_weekend_balance + score_stability, misura.famiglie,
+                        obiettivi=obiettivi)
+
+def _gruppi_simmetrici(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution=None,
+                       contesto=None):
+    """Gruppi di id (almeno due per gruppo) di dipendenti intercambiabili per il modello con questi input.
+
+    La firma di un dipendente mette insieme ruoli, bilanciamento, limiti e bonus personali,
+    il dominio di ogni cella (assenze, richieste e rotazione gia' applicate) e quello che
+    l'obiettivo sa di lui (piano precedente, storico del blocco precedente): due righe con la
+    stessa firma si scambiano in qualunque soluzione senza cambiarne ammissibilita' o valore.
+    """
+    contesto = contesto or ContestoBlocco()
+    domini = domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, contesto.settimana)
+    gruppi = {}
+    for n, nome in enumerate(ALL_STAFF):
+        firma = (ORGANICO.bit_ruoli[n], ORGANICO.bilanciati[n],
+                 tuple((t, m) for i, t, m in ORGANICO.max_settimana if i == n),
+                 tuple((t, p) for i, t, p in ORGANICO.bonus if i == n),
+                 tuple(tuple(sorted(domini[(n, d)])) for d in range(NUM_GIORNI)),
+                 tuple(previous_solution.get((nome, d)) for d in range(NUM_GIORNI)) if previous_solution else None,
+                 tuple(contesto.storico.get(nome, [])), contesto.weekend.get(nome, 0),
+                 contesto.mattine.get(nome, 0), contesto.sere.get(nome, 0))
+        gruppi.setdefault(firma, []).append(n)
+    return [g for g in gruppi.values() if len(g) > 1]
+
+def _rompi_simmetrie(model, shifts, gruppi, NUM_GIORNI):
+    """Righe dei dipendenti di ogni gruppo in ordine lessicografico non crescente (id turno giorno per giorno).
+
+    `uguali` e' vero quando le due righe coincidono fino al giorno precedente: solo allora
+    il giorno corrente deve rispettare l'ordine. Bastano le implicazioni in un verso, il
+    solver non ha interesse a rendere vero un letterale che aggiunge vincoli.
+    """
+    for gruppo in gruppi:
+        for a, b in zip(gruppo, gruppo[1:]):
+            uguali = None
+            for d in range(NUM_GIORNI):
+                vincolo = model.Add(shifts[(a, d)] >= shifts[(b, d)])
+                if uguali is not None: vincolo.OnlyEnforceIf(uguali)
+                if d == NUM_GIORNI - 1: break
+                pari = model.NewBoolVar(f'sim_eq_{a}_{b}_{d}')
+                model.Add(shifts[(a, d)] != shifts[(b, d)]).OnlyEnforceIf(pari.Not())
+                if uguali is not None:
+                    prefisso = model.NewBoolVar(f'sim_pre_{a}_{b}_{d}')
+                    model.AddBoolOr([uguali.Not(), pari.Not(), prefisso])
+                    pari = prefisso
+                uguali = pari
+
+def _ordina_hint(hint, gruppi):
+    """Permuta le righe dell'hint dentro ogni gruppo simmetrico perche' rispettino l'ordine lessicografico."""
+    hint = dict(hint)
+    giorni = sorted({d for _, d in hint})
+    for gruppo in gruppi:
+        righe = sorted(([hint.get((n, d), -1) for d in giorni] for n in gruppo), reverse=True)
+        for n, riga in zip(gruppo, righe):
+            for d, t in zip(giorni, riga):
+                if t >= 0: hint[(n, d)] = t
+                else: hint.pop((n, d), None)
+    return hint
+
+def _build_model_bool(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita=500,
+                      giorni_liberi=None, contesto=None, base=False):
+    """Modello one-hot: un letterale per ogni turno ammesso della cella ed exactly-one per cella.
+
+    Ruoli, assenze, richieste e rotazione sono gia' nei domini, quindi qui restano solo
+    copertura, riposi, carichi settimanali e obiettivo.
+
+    Con `giorni_liberi` (riparazione locale) le celle degli altri giorni sono fissate a
+    `previous_solution` e i vincoli che toccano solo giorni fissati non vengono creati; un
+    giorno in cui `previous_solution` non ha tutte le celle (piano importato parziale) resta libero.
+
+    Con `contesto` (orizzonte mobile) il blocco prosegue le settimane gia' fissate: rotazione,
+    riposi e finestra al confine, conteggi cumulati di weekend e mattine/sere.
+
+    Con `base` costruisce il modello base (vedi `_modello_base`): niente rotazione e giorni
+    da lavorare per settimana come variabili in `carichi`, da fissare sulla copia.
+    """
+    contesto = contesto or ContestoBlocco()
+    model = cp_model.CpModel()
+    misura = _Misuratore(model)
+    misura.inizio("ruoli")
+    domini = domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    misura.inizio("rotazione")
+    if not base: applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, contesto.settimana)
+    misura.inizio("riposi")
+    for n, nome in enumerate(ALL_STAFF):
+        storico = contesto.storico.get(nome)
+        if storico and storico[-1] in REGOLE_RIPOSO: domini[(n, 0)] -= set(REGOLE_RIPOSO[storico[-1]])
+
+    misura.inizio("variabili")
+    completo = lambda d: bool(previous_solution) and all((nome, d) in previous_solution for nome in ALL_STAFF)
+    libero = [giorni_liberi is None or d in giorni_liberi or not completo(d) for d in range(NUM_GIORNI)]
+    if giorni_liberi is not None and previous_solution:
+        for n, nome in enumerate(ALL_STAFF):
+            for d in range(NUM_GIORNI):
+                if not libero[d]: domini[(n, d)] = {previous_solution[(nome, d)]}
+    x = {}
+    shifts = {}
+    worked = {}
+    for n in range(NUM_STAFF):
+        for d in range(NUM_GIORNI):
+            lits = {t: model.NewBoolVar(f'x_{n}_{d}_{t}') for t in sorted(domini[(n, d)])}
+            model.AddExactlyOne(lits.values())
+            x[(n, d)] = lits
+            shifts[(n, d)] = cp_model.LinearExpr.WeightedSum(list(lits.values()), list(lits.keys()))
+            worked[(n, d)] = sum(b for t, b in lits.items() if t > 0)
+
+    # MODALITA' RIPARAZIONE
+    misura.inizio("stabilita")
+    score_stability = 0
+    if previous_solution and peso_stabilita:
+        for n in range(NUM_STAFF):
+            nome = ALL_STAFF[n]
+            for d in range(NUM_GIORNI):
+                if libero[d] and (nome, d) in previous_solution:
+                    old_val = previous_solution[(nome, d)]
+                    is_now_ferie = (d in FERIE_INDICI.get(nome, []) or d in REQ_OFF_INDICI.get(nome, []))
+                    if not is_now_ferie and old_val in x[(n, d)]:
+                        score_stability += x[(n, d)][old_val] * peso_stabilita
+
+    misura.inizio("ruoli")
+    for n, turno, massimo in ORGANICO.max_settimana:
+        for w in range(NUM_SETTIMANE):
+            if not any(libero[w*7:w*7 + 7]): continue
+            conteggio = [x[(n, d)][turno] for d in range(w*7, min(w*7 + 7, NUM_GIORNI)) if turno in x[(n, d)]]
+            model.Add(sum(conteggio) <= massimo)
+
+    misura.inizio("copertura")
+    score_coverage = 0
+    score_balance = 0
+    score_weekend_balance = 0
+    acc_idx = ORGANICO.con_ruolo(RUOLO_ACCETTATORI)
+
+    for d in range(NUM_GIORNI):
+        if not libero[d]: continue
+        counts = {t: [x[(n, d)][t] for n in range(NUM_STAFF) if t in x[(n, d)]] for t in TURNI_CONFIG}
+        giorno_sett = d % 7
+
+        weight_day = 20
+        if giorno_sett == 5 or giorno_sett == 6: weight_day = 100
+        elif giorno_sett == 0 or giorno_sett == 4: weight_day = 1
+
+        if giorno_sett in (4, 5): model.Add(sum(counts[10]) == 1)
+        model.Add(sum(counts[9]) == 1)
+
+        for t, cfg in TURNI_CONFIG.items():
+            if t == 10 or t == 9: continue
+            if cfg['critico'] > 0: model.Add(sum(counts[t]) >= cfg['critico'])
+            if cfg['ideale'] > cfg['critico'] or cfg['critico'] == 0:
+                covered = model.NewBoolVar(f'cov_{t}_{d}')
+                model.Add(sum(counts[t]) >= cfg['ideale']).OnlyEnforceIf(covered)
+                weight_shift = 10
+                if t == 1: weight_shift = 50
+                elif t == 7: weight_shift = 5
+                score_coverage += covered * weight_day * weight_shift
+
+        model.Add(sum(x[(n, d)][t] for n in acc_idx for t in TURNI_SERA if t in x[(n, d)]) >= 2)
+        model.Add(sum(worked[(n, d)] for n in acc_idx) >= 3)
+
+    misura.inizio("bilanciamento")
+    for n in range(NUM_STAFF):
+        nome = ALL_STAFF[n]
+        if ORGANICO.bilanciati[n]:
+            tot_m = sum(b for d in range(NUM_GIORNI) for t, b in x[(n, d)].items() if t > 0 and TURNI_CONFIG[t]['cat'] == 'M')
+            tot_l = sum(b for d in range(NUM_GIORNI) for t, b in x[(n, d)].items() if t > 0 and TURNI_CONFIG[t]['cat'] == 'L')
+            tot_m += contesto.mattine.get(nome, 0)
+            tot_l += contesto.sere.get(nome, 0)
+            diff = model.NewIntVar(0, NUM_GIORNI + 7 * contesto.settimane_contate, f'diff_ml_{n}')
+            model.Add(diff >= tot_m - tot_l)
+            model.Add(diff >= tot_l - tot_m)
+            score_balance -= diff * 5
+
+    misura.inizio("weekend")
+    for n in range(NUM_STAFF):
+        we_days_worked = []
+        for w in range(NUM_SETTIMANE):
+            idx_sab = 5 + (w * 7); idx_dom = 6 + (w * 7)
+            if idx_dom < NUM_GIORNI:
+                is_we_active = model.NewBoolVar(f'we_act_{n}_{w}')
+                model.Add(is_we_active >= worked[(n, idx_sab)])
+                model.Add(is_we_active >= worked[(n, idx_dom)])
+                model.Add(is_we_active <= worked[(n, idx_sab)] + worked[(n, idx_dom)])
+                we_days_worked.append(is_we_active)
+        tot_we = sum(we_days_worked) + contesto.weekend.get(ALL_STAFF[n], 0)
+        excess = model.NewIntVar(0, NUM_SETTIMANE + contesto.settimane_contate, f'exc_we_{n}')
+        model.Add(tot_we <= int((NUM_SETTIMANE + contesto.settimane_contate) * 0.7) + excess)
+        score_weekend_balance -= excess * 50
+
+    # RIPOSI E GIORNI CONSECUTIVI: clausole sui letterali condivisi della cella
+    misura.inizio("riposi")
+    for n in range(NUM_STAFF):
+        for d in range(NUM_GIORNI - 1):
+            if not (libero[d] or libero[d+1]): continue
+            for t, vietati in REGOLE_RIPOSO.items():
+                if t not in x[(n, d)]: continue
+                dopo = [x[(n, d+1)][v] for v in vietati if v in x[(n, d+1)]]
+                if dopo: model.Add(x[(n, d)][t] + sum(dopo) <= 1)
+
+    misura.inizio("finestra")
+    carichi = {} if base else None
+    for n in range(NUM_STAFF):
+        for w in range(NUM_SETTIMANE):
+            s = w*7; e = min(s+7, NUM_GIORNI)
+            if not any(libero[s:e]): continue
+            if base: target = carichi[(n, w)] = model.NewIntVar(0, GIORNI_LAVORO_SETTIMANA, f'carico_{n}_{w}')
+            else: target = target_settimanale(ALL_STAFF[n], s, e, FERIE_INDICI, REQ_OFF_INDICI)
+            model.Add(sum(worked[(n, d)] for d in range(s, e)) == target)
+
+        for d in range(NUM_GIORNI - MAX_GIORNI_CONSECUTIVI):
+            if not any(libero[d:d + MAX_GIORNI_CONSECUTIVI + 1]): continue
+            model.Add(sum(worked[(n, d+k)] for k in range(MAX_GIORNI_CONSECUTIVI + 1)) <= MAX_GIORNI_CONSECUTIVI)
+
+        # finestre a cavallo del confine con il blocco precedente
+        prima = [t > 0 for t in contesto.storico.get(ALL_STAFF[n], [])]
+        for k in range(1, len(prima) + 1):
+            model.Add(sum(prima[-k:]) + sum(worked[(n, d)] for d in range(min(NUM_GIORNI, MAX_GIORNI_CONSECUTIVI + 1 - k)))
+                      <= MAX_GIORNI_CONSECUTIVI)
+
+    misura.inizio("copertura")
+    for d in range(NUM_GIORNI):
+        if not libero[d]: continue
+        for i, turno, peso in ORGANICO.bonus:
+            if turno in x[(i, d)]: score_coverage += x[(i, d)][turno] * peso
+
+    misura.fine()
+    obiettivi = {"copertura": score_coverage, "stabilita": score_stability, "equilibrio": score_balance + score_weekend_balance}
+    return ModelloTurni(model, shifts, score_coverage + score_balance + score_weekend_balance + score_stability, misura.famiglie, x,
+                        carichi, obiettivi)
+
+def _modello_base(NUM_SETTIMANE):
+    """Modello bool che non dipende dagli input, costruito una volta per orizzonte e tenuto in memoria.
+
+    Contiene i letterali di tutti i turni ammessi dai ruoli e tutti i vincoli; non dipende
+    dalla data d'inizio (i giorni sono indici dal lunedi') e l'organico e' fisso per processo.
+    """
+    base = _MODELLI_BASE.pop(NUM_SETTIMANE, None)
+    if base is None: base = _build_model_bool(7 * NUM_SETTIMANE, NUM_SETTIMANE, {}, {}, {}, None, base=True)
+    _MODELLI_BASE[NUM_SETTIMANE] = base
+    while len(_MODELLI_BASE) > MAX_MODELLI_BASE: _MODELLI_BASE.popitem(last=False)
+    return base
+
+def _build_model_da_base(NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita=500):
+    """Stesso modello di `_build_model_bool` su una copia del modello base: gli input diventano domini fissati.
+
+    I letterali dei turni esclusi da assenze, richieste e rotazione sono fissati a 0 e i
+    giorni da lavorare di ogni settimana al loro valore; il presolve di CP-SAT li elimina.
+    """
+    NUM_GIORNI = 7 * NUM_SETTIMANE
+    base = _modello_base(NUM_SETTIMANE)
+    t0 = time.perf_counter()
+    model = base.model.clone()
+    variabili = model.Proto().variables
+
+    def fissa(var, valore):
+        dominio = variabili[var.Index()].domain
+        dominio[0] = dominio[1] = valore
+
+    domini = domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+    applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI)
+    x = {}
+    for (n, d), lits in base.lits.items():
+        for t, b in lits.items():
+            if t not in domini[(n, d)]: fissa(b, 0)
+        x[(n, d)] = {t: b for t, b in lits.items() if t in domini[(n, d)]}
+    for (n, w), carico in base.carichi.items():
+        fissa(carico, target_settimanale(ALL_STAFF[n], 7 * w, 7 * w + 7, FERIE_INDICI, REQ_OFF_INDICI))
+
+    score_stability = 0
+    if previous_solution and peso_stabilita:
+        for n, nome in enumerate(ALL_STAFF):
+            assenze = set(FERIE_INDICI.get(nome, [])) | set(REQ_OFF_INDICI.get(nome, []))
+            for d in range(NUM_GIORNI):
+                old_val = previous_solution.get((nome, d))
+                if old_val is not None and d not in assenze and old_val in x[(n, d)]:
+                    score_stability += x[(n, d)][old_val] * peso_stabilita
+
+    famiglie = {k: dict(f, secondi=0.0) for k, f in base.famiglie.items()}
+    famiglie["input su modello base"] = {"secondi": time.perf_counter() - t0, "variabili": 0, "vincoli": 0}
+    obiettivi = dict(base.obiettivi, stabilita=score_stability)
+    return ModelloTurni(model, base.shifts, base.objective + score_stability, famiglie, x, obiettivi=obiettivi)
+
+def solve_turni(start_date, weeks_to_generate, list_assenze, list_req_turni, previous_solution=None, model_backend="bool", report_sheet=False, profilo="bilanciato", on_progress=None,
+                hint=None, repair_hint=True, peso_stabilita=500, riparazione_locale=False, vicinato=1, giorni_liberi=None,
+                settimane_blocco=None, sovrapposizione=1, diagnosi=True, obiettivo="pesato", simmetrie=False, storico=None):
+    """Risolve il piano e restituisce (Excel in BytesIO o None, ReportSolver, soluzione o None).
+
+    La soluzione ha lo stesso formato di `previous_solution`: {(nome, giorno): id turno}.
+
+    `profilo` e' una chiave di PROFILI_SOLVER (o un dict con le stesse voci); `on_progress`, se dato, riceve un dict per
+    ogni soluzione migliorativa trovata (chiamato dai thread del solver).
+
+    `hint` (stesso formato, di default `previous_solution`) parte la ricerca da quel piano;
+    con `repair_hint` CP-SAT prova prima a ripararlo se non e' piu' ammissibile.
+    `peso_stabilita` premia ogni cella uguale a `previous_solution`; 0 lo disattiva.
+
+    Con `riparazione_locale` e una `previous_solution` ricalcola solo le settimane toccate
+    dalle nuove assenze/richieste (vedi `ripara_locale`); `giorni_liberi` e' il livello
+    sotto: l'insieme esplicito dei giorni da ricalcolare, solo modello bool.
+
+    Con `settimane_blocco` minore dell'orizzonte il piano e' calcolato a blocchi di settimane
+    in sequenza (vedi `risolvi_orizzonte_mobile`), solo con il modello bool.
+
+    `obiettivo` "pesato" massimizza la somma pesata di copertura, stabilita' ed equilibrio in
+    una sola ricerca; "a_fasi" li ottimizza uno dopo l'altro (vedi `_risolvi_a_fasi`).
+    Con `simmetrie` i dipendenti intercambiabili per questi input hanno le righe in ordine
+    lessicografico, cosi' il solver non esplora le loro permutazioni (vedi `_gruppi_simmetrici`).
+
+    `storico` (solo modello bool) e' un ContestoBlocco con i piani gia' pubblicati, di solito da
+    turni.archivio.Archivio.contesto: weekend e mattine/sere si bilanciano sommando i loro
+    totali, riposi e giorni consecutivi proseguono dagli ultimi giorni prima di start_date.
+
+    Se `previous_solution` copre tutte le celle e rispetta gia' le regole con questi input (vedi
+    turni.controllo) il solver non parte: il piano torna com'e' con stato "VALIDO". Altrimenti le
+    sue violazioni restano in report.violazioni.
+
+    Con `diagnosi` una verifica preliminare di pochi millisecondi blocca i piani evidentemente
+    impossibili (report.problemi) e, se il solver non trova soluzione, report.conflitto
+    elenca un insieme minimo di input in conflitto (vedi turni.diagnosi).
+    """
+    if giorni_liberi is not None and model_backend != "bool":
+        raise ValueError("La riparazione locale richiede il modello bool")
+    if storico is not None and model_backend != "bool": raise ValueError("Lo storico dei piani pubblicati richiede il modello bool")
+    if settimane_blocco and weeks_to_generate > settimane_blocco and model_backend != "bool":
+        raise ValueError("L'orizzonte mobile (settimane_blocco) richiede il modello bool")
+    if obiettivo not in OBIETTIVI: raise ValueError(f"Obiettivo sconosciuto: {obiettivo} (ammessi: {', '.join(OBIETTIVI)})")
+    NUM_SETTIMANE = weeks_to_generate
+    NUM_GIORNI = 7 * NUM_SETTIMANE
+    start_date, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI = indici_input(start_date, NUM_GIORNI, list_assenze, list_req_turni)
+    violazioni = None
+    if previous_solution and giorni_liberi is None:
+        from turni.controllo import controlla_matrice
+        t0 = time.perf_counter()
+        matrice = matrice_da_soluzione(previous_solution, NUM_GIORNI, MANCANTE)
+        violazioni = controlla_matrice(matrice, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, storico)
+        if not violazioni:
+            report = ReportSolver(backend=model_backend, profilo=_profilo(profilo)[0], stato="VALIDO", violazioni=[],
+                                  tempo_modello=time.perf_counter() - t0)
+            output = scrivi_excel(start_date, matrice, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, report if report_sheet else None)
+            return output, report, soluzione_da_matrice(matrice)
+    diagnosi = diagnosi and giorni_liberi is None  # i passi interni di ripara_locale non ripetono la diagnosi
+    if diagnosi:
+        from turni.diagnosi import verifica_preliminare
+        problemi = verifica_preliminare(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+        if problemi:
+            return None, ReportSolver(backend=model_backend, profilo=_profilo(profilo)[0], stato="INFEASIBLE", problemi=problemi,
+                                      violazioni=violazioni), None
+
+    if riparazione_locale and previous_solution and giorni_liberi is None:
+        output, report, soluzione = ripara_locale(start_date, weeks_to_generate, list_assenze, list_req_turni, previous_solution,
+                                                  vicinato, violazioni, report_sheet=report_sheet, profilo=profilo, on_progress=on_progress,
+                                                  hint=hint, repair_hint=repair_hint, peso_stabilita=peso_stabilita, obiettivo=obiettivo,
+                                                  simmetrie=simmetrie, storico=storico)
+    elif settimane_blocco and weeks_to_generate > settimane_blocco and giorni_liberi is None:
+        output, report, soluzione = risolvi_orizzonte_mobile(start_date, weeks_to_generate, list_assenze, list_req_turni, settimane_blocco,
+                                                             sovrapposizione, previous_solution=previous_solution, report_sheet=report_sheet,
+                                                             profilo=profilo, on_progress=on_progress, hint=hint, repair_hint=repair_hint,
+                                                             peso_stabilita=peso_stabilita, obiettivo=obiettivo, simmetrie=simmetrie,
+                                                             storico=storico)
+    else:
+        report, matrice = _risolvi(NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, model_backend,
+                                   profilo, on_progress, hint, repair_hint, peso_stabilita, giorni_liberi, storico, obiettivo=obiettivo,
+                                   simmetrie=simmetrie)
+        output = soluzione = None
+        if matrice is not None:
+            output = scrivi_excel(start_date, matrice, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, report if report_sheet else None)
+            soluzione = soluzione_da_matrice(matrice)
+
+    report.violazioni = violazioni
+    if diagnosi and soluzione is None:
+        from turni.diagnosi import spiega_conflitto
+        report.conflitto = spiega_conflitto(start_date, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI)
+        if not report.conflitto:
+            report.conflitto = ["Nessun conflitto tra i vincoli: serve piu' tempo di calcolo (profilo piu' lungo)"]
+    return output, report, soluzione
+
+def _profilo(profilo):
+    """(nome, parametri) di un profilo: chiave di PROFILI_SOLVER o dict con le stesse voci."""
+    if isinstance(profilo, dict): return profilo.get("label", "personalizzato"), profilo
+    return profilo, PROFILI_SOLVER[profilo]
+
+def _risolvi(NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, model_backend, profilo,
+             on_progress=None, hint=None, repair_hint=True, peso_stabilita=500, giorni_liberi=None, contesto=None, riusa_modello=True,
+             obiettivo="pesato", simmetrie=False):
+    """Costruisce e risolve il modello su indici gia' calcolati: (ReportSolver, matrice dipendente x giorno o None)."""
+    NUM_GIORNI = 7 * NUM_SETTIMANE
+    nome_profilo, cfg = _profilo(profilo)
+    report = ReportSolver(backend=model_backend, profilo=nome_profilo)
+    t0 = time.perf_counter()
+    if model_backend == "int":
+        modello = _build_model_int(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita)
+    elif riusa_modello and giorni_liberi is None and contesto is None:
+        modello = _build_model_da_base(NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita)
+    else:
+        modello = _build_model_bool(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, peso_stabilita,
+                                    giorni_liberi, contesto)
+        if giorni_liberi is not None: report.giorni_liberi = len(giorni_liberi)
+    model, shifts = modello.model, modello.shifts
+    report.famiglie = modello.famiglie
+    model.Maximize(modello.objective)
+    gruppi = []
+    if simmetrie:
+        misura = _Misuratore(model)
+        misura.inizio("simmetrie")
+        gruppi = _gruppi_simmetrici(NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution, contesto)
+        _rompi_simmetrie(model, shifts, gruppi, NUM_GIORNI)
+        misura.fine()
+        report.famiglie = {**modello.famiglie, **misura.famiglie}
+        report.gruppi_simmetrici = [[ALL_STAFF[n] for n in g] for g in gruppi]
+
+    if hint is None: hint = previous_solution
+    if hint:
+        indici = ORGANICO.indice
+        celle = {(indici[nome], d): t for (nome, d), t in hint.items() if nome in indici}
+        report.celle_hint = modello.aggiungi_hint(_ordina_hint(celle, gruppi) if gruppi else celle)
+    report.tempo_modello = time.perf_counter() - t0
+    if obiettivo == "a_fasi": return _risolvi_a_fasi(modello, cfg, report, NUM_GIORNI, on_progress, bool(hint) and repair_hint)
+    solver = _solver(cfg, cfg["max_time"], bool(hint) and repair_hint)
+    status = solver.Solve(model, _CallbackProgresso(shifts, NUM_GIORNI, report, on_progress))
+    report.registra_solver(solver, status)
+
+    if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]: return report, None
+    return report, modello.matrice(solver)
+
+def _solver(cfg, max_time, repair_hint=False):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time
+    solver.parameters.num_workers = max(1, min(cfg["workers"], os.cpu_count() or 1))
+    solver.parameters.relative_gap_limit = cfg["gap"]
+    if repair_hint: solver.parameters.repair_hint = True
+    return solver
+
+def _risolvi_a_fasi(modello, cfg, report, NUM_GIORNI, on_progress=None, repair_hint=False):
+    """Ottimizzazione lessicografica sulle fasi di FASI_OBIETTIVO, ciascuna con la sua quota di tempo.
+
+    Ogni fase massimizza il proprio termine con i livelli raggiunti nelle fasi precedenti
+    imposti come vincoli, partendo dalla soluzione della fase prima (hint completo). I
+    valori delle fasi vanno in report.fasi; report.obiettivo e' l'obiettivo pesato della
+    soluzione finale, confrontabile con quello del modo "pesato", mentre report.bound e
+    report.gap sono quelli dell'ultima fase risolta, sul suo termine.
+    """
+    model = modello.model
+    fasi = [(nome, quota) for nome, quota in FASI_OBIETTIVO.items() if not isinstance(modello.obiettivi[nome], int)]
+    restante, quote = cfg["max_time"], sum(quota for _, quota in fasi)
+    ottimo, solver_finale = True, None
+    for nome, quota in fasi:
+        termine = modello.obiettivi[nome]
+        model.Maximize(termine)
+        solver = _solver(cfg, max(0.1, restante * quota / quote), repair_hint)
+        avanzamento = None
+        if on_progress:
+            avanzamento = lambda p, t=report.tempo_solver, f=nome: on_progress(dict(p, tempo=p["tempo"] + t, fase=f))
+        status = solver.Solve(model, _CallbackProgresso(modello.shifts, NUM_GIORNI, report, avanzamento))
+        risolto = status in [cp_model.OPTIMAL, cp_model.FEASIBLE]
+        report.tempo_solver += solver.WallTime()
+        report.conflitti += solver.NumConflicts()
+        report.branch += solver.NumBranches()
+        report.fasi.append({"Fase": nome, "Stato": solver.StatusName(status), "Secondi": round(solver.WallTime(), 3),
+                            "Valore": round(solver.ObjectiveValue()) if risolto else "-",
+                            "Bound": round(solver.BestObjectiveBound()) if risolto else "-"})
+        restante -= solver.WallTime()
+        quote -= quota
+        if not risolto:
+            if solver_finale is None: report.stato = solver.StatusName(status)
+            break
+        ottimo = ottimo and status == cp_model.OPTIMAL
+        solver_finale = solver
+        model.Add(termine >= round(solver.ObjectiveValue()))
+        model.ClearHints()
+        for i, valore in enumerate(solver.ResponseProto().solution): model.AddHint(model.GetIntVarFromProtoIndex(i), valore)
+        repair_hint = False
+    if solver_finale is None: return report, None
+    report.stato = "OPTIMAL" if ottimo and len(report.fasi) == len(fasi) else "FEASIBLE"
+    report.obiettivo = solver_finale.Value(modello.objective)
+    report.bound = solver_finale.BestObjectiveBound()
+    report.gap = abs(report.bound - solver_finale.ObjectiveValue()) / max(1.0, abs(solver_finale.ObjectiveValue()))
+    return report, modello.matrice(solver_finale)
+
+def ripara_locale(start_date, weeks_to_generate, list_assenze, list_req_turni, previous_solution, vicinato=1, violazioni=None,
+                  **kwargs):
+    """Riparazione che ricalcola solo l'intorno dei giorni toccati da assenze, richieste e violazioni.
+
+    Le settimane dei giorni toccati (vedi `_settimane_toccate`), piu' `vicinato` settimane per
+    lato (riposi e finestra dei giorni consecutivi attraversano il confine), sono libere; il
+    resto resta com'era in `previous_solution`. Se l'intorno non ammette soluzione lo allarga
+    di una settimana per lato e riprova, fino all'intero orizzonte. Stessi risultati di `solve_turni`.
+
+    Sono toccati anche i giorni delle `violazioni` del piano precedente (turni.controllo,
+    calcolate qui se non passate): sui giorni fissati i vincoli non sono imposti, quindi una
+    settimana che viola le regole va sempre ricalcolata.
+    """
+    NUM_GIORNI = 7 * weeks_to_generate
+    _, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI = indici_input(start_date, NUM_GIORNI, list_assenze, list_req_turni)
+    settimane = _settimane_toccate(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution)
+    if violazioni is None:
+        from turni.controllo import controlla_matrice
+        violazioni = controlla_matrice(matrice_da_soluzione(previous_solution, NUM_GIORNI, MANCANTE), FERIE_INDICI, REQ_OFF_INDICI,
+                                       REQ_TURNI_INDICI, kwargs.get("storico"))
+    settimane |= {v.giorno // 7 for v in violazioni}
+
+    kwargs["model_backend"] = "bool"
+    espansioni = 0
+    while True:
+        liberi = {d for w in settimane for d in range(max(0, (w - vicinato) * 7), min(NUM_GIORNI, (w + vicinato + 1) * 7))}
+        output, report, soluzione = solve_turni(start_date, weeks_to_generate, list_assenze, list_req_turni, previous_solution,
+                                                giorni_liberi=liberi, **kwargs)
+        report.espansioni = espansioni
+        if output is not None or not settimane or len(liberi) == NUM_GIORNI: return output, report, soluzione
+        vicinato += 1
+        espansioni += 1
+
+def _settimane_toccate(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, previous_solution):
+    """Settimane con assenze o richieste che `previous_solution` non rispetta gia'.
+
+    Un input gia' rispettato (le ferie di un piano ripreso dall'archivio insieme ai suoi input)
+    non libera la settimana; la liberano un giorno lavorato in ferie o richiesta OFF, un turno
+    diverso da quello richiesto o piu' giorni lavorati di quanti la settimana ne ammette. La
+    liberano anche le celle che mancano in `previous_solution` (piano importato parziale).
+    """
+    toccate = {d // 7 for d in range(NUM_GIORNI) if any((nome, d) not in previous_solution for nome in ALL_STAFF)}
+    for nome in set(FERIE_INDICI) | set(REQ_OFF_INDICI):
+        assenze = FERIE_INDICI.get(nome, []) + REQ_OFF_INDICI.get(nome, [])
+        toccate |= {d // 7 for d in assenze if previous_solution.get((nome, d), 0) > 0}
+        for w in {d // 7 for d in assenze}:
+            s, e = 7 * w, min(7 * w + 7, NUM_GIORNI)
+            lavorati = sum(1 for d in range(s, e) if previous_solution.get((nome, d), 0) > 0)
+            if lavorati > target_settimanale(nome, s, e, FERIE_INDICI, REQ_OFF_INDICI): toccate.add(w)
+    for nome, giorni in REQ_TURNI_INDICI.items():
+        toccate |= {d // 7 for d, t in giorni.items() if previous_solution.get((nome, d)) != t}
+    return toccate
+
+def risolvi_orizzonte_mobile(start_date, weeks_to_generate, list_assenze, list_req_turni, settimane_blocco=4, sovrapposizione=1,
+                             previous_solution=None, report_sheet=False, profilo="bilanciato", on_progress=None, hint=None,
+                             repair_hint=True, peso_stabilita=500, obiettivo="pesato", simmetrie=False, storico=None):
+    """Piano lungo calcolato a blocchi di `settimane_blocco` settimane, in sequenza (solo modello bool).
+
+    Di ogni blocco si fissano le prime settimane e le ultime `sovrapposizione` vengono
+    ricalcolate dal blocco successivo, che eredita un ContestoBlocco dalle settimane fissate.
+    Memoria e tempo per blocco restano costanti al crescere dell'orizzonte; l'Excel e la
+    soluzione coprono l'intero periodo come con `solve_turni`; `storico` fa da contesto al primo blocco.
+    """
+    NUM_GIORNI = 7 * weeks_to_generate
+    start_date, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI = indici_input(start_date, NUM_GIORNI, list_assenze, list_req_turni)
+    passo = max(1, settimane_blocco - sovrapposizione)
+    report = ReportSolver(backend="bool", profilo=_profilo(profilo)[0])
+    matrice = np.zeros((NUM_STAFF, NUM_GIORNI), dtype=np.int8)
+    contesto = storico or ContestoBlocco()
+    w0 = 0
+    while w0 < weeks_to_generate:
+        ns = min(settimane_blocco, weeks_to_generate - w0)
+        s0, e0 = 7 * w0, 7 * (w0 + ns)
+        ferie = {nome: [d - s0 for d in giorni if s0 <= d < e0] for nome, giorni in FERIE_INDICI.items()}
+        off = {nome: [d - s0 for d in giorni if s0 <= d < e0] for nome, giorni in REQ_OFF_INDICI.items()}
+        richieste = {nome: {d - s0: t for d, t in giorni.items() if s0 <= d < e0} for nome, giorni in REQ_TURNI_INDICI.items()}
+        precedente, suggerito = ({(nome, d - s0): t for (nome, d), t in sol.items() if s0 <= d < e0} if sol else sol
+                                 for sol in (previous_solution, hint))
+        avanzamento = None
+        if on_progress:
+            trascorso, blocco = report.tempo_modello + report.tempo_solver, len(report.blocchi) + 1
+            avanzamento = lambda p, t=trascorso, b=blocco: on_progress(dict(p, tempo=p["tempo"] + t, blocco=b))
+        rep_blocco, mat_blocco = _risolvi(ns, ferie, off, richieste, precedente, "bool", profilo, avanzamento, suggerito,
+                                          repair_hint, peso_stabilita, contesto=contesto, obiettivo=obiettivo, simmetrie=simmetrie)
+        report.aggiungi_blocco(w0, ns, rep_blocco)
+        if mat_blocco is None: return None, report, None
+
+        fissate = ns if w0 + ns >= weeks_to_generate else min(passo, ns)
+        matrice[:, s0:s0 + 7 * fissate] = mat_blocco[:, :7 * fissate]
+        w0 += fissate
+        contesto = ContestoBlocco.da_matrice(matrice, w0, storico)
+
+    output = scrivi_excel(start_date, matrice, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, report if report_sheet else None)
+    return output, report, soluzione_da_matrice(matrice)
@@ -0,0 +1,184 @@
+"""Export del piano risolto: workbook Excel e tabella per payroll/BI (CSV, Parquet, JSON).
+
+Tutto parte dalla matrice dipendente x giorno degli id turno (righe in ordine ALL_STAFF):
+statistiche e testi delle celle sono calcolati sull'intera matrice, e il workbook e'
+scritto da xlsxwriter in modalita' constant_memory, una riga alla volta, nell'ordine e
+con le etichette di ruolo dell'organico.
+xlsxwriter e pandas sono importati solo da chi li usa.
+"""
+
+import io
+
+import numpy as np
+
+from turni.config import (
+    ALL_STAFF, NUM_STAFF, ORGANICO, TURNI_CONFIG, RIPOSO_CFG,
+)
+from turni.regole import MAX_ID_TURNO, testo_giorno
+
+# Tabelle di lookup indicizzate per id turno (0 = riposo)
+TESTI = np.array([RIPOSO_CFG['txt']] + [TURNI_CONFIG[t]['txt'] if t in TURNI_CONFIG else "" for t in range(1, MAX_ID_TURNO + 1)], dtype=object)
+CATEGORIE = np.array([""] + [TURNI_CONFIG[t]['cat'] if t in TURNI_CONFIG else "" for t in range(1, MAX_ID_TURNO + 1)], dtype=object)
+_MATTINA = CATEGORIE == "M"
+_SERA = CATEGORIE == "L"
+
+# Codici di formato delle celle: id turno, id turno richiesto (+ _RICHIESTO), ferie, richiesta OFF
+_RICHIESTO = MAX_ID_TURNO + 1
+_FERIE = 2 * _RICHIESTO
+_REQ = _FERIE + 1
+
+FORMATI_TABELLA = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet", "json": "application/json"}
+
+
+def matrice_da_soluzione(soluzione, num_giorni, vuota=0):
+    """Da {(nome, giorno): turno} alla matrice NUM_STAFF x num_giorni, con `vuota` (riposo) nelle celle assenti."""
+    matrice = np.full((NUM_STAFF, num_giorni), vuota, dtype=np.int8)
+    indici = ORGANICO.indice
+    for (nome, d), t in soluzione.items():
+        if nome in indici and 0 <= d < num_giorni: matrice[indici[nome], d] = t
+    return matrice
+
+
+def soluzione_da_matrice(matrice):
+    """Dalla matrice al formato di previous_solution, {(nome, giorno): turno}."""
+    return {(nome, d): int(t) for nome, riga in zip(ALL_STAFF, matrice.tolist()) for d, t in enumerate(riga)}
+
+
+def _maschera(indici, num_giorni):
+    """Maschera NUM_STAFF x num_giorni dei giorni elencati in {nome: [giorni]} o {nome: {giorno: ...}}."""
+    maschera = np.zeros((NUM_STAFF, num_giorni), dtype=bool)
+    for n, nome in enumerate(ALL_STAFF):
+        giorni = [d for d in indici.get(nome, ()) if 0 <= d < num_giorni]
+        maschera[n, giorni] = True
+    return maschera
+
+
+def scrivi_excel(start_date, matrice, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI, report=None):
+    """Foglio 'Turni' del piano (e 'Statistiche' se c'e' il report) in un BytesIO."""
+    import xlsxwriter
+    NUM_GIORNI = matrice.shape[1]
+    shift_ids = sorted(TURNI_CONFIG.keys())
+
+    # statistiche per dipendente e per giorno, sull'intera matrice
+    lavorato = matrice > 0
+    cnt_tot = lavorato.sum(axis=1)
+    weekend_worked = (lavorato[:, 5::7] | lavorato[:, 6::7]).sum(axis=1)
+    quota_m = np.divide(_MATTINA[matrice].sum(axis=1), cnt_tot, out=np.zeros(NUM_STAFF), where=cnt_tot > 0)
+    quota_l = np.divide(_SERA[matrice].sum(axis=1), cnt_tot, out=np.zeros(NUM_STAFF), where=cnt_tot > 0)
+    per_turno = (matrice[:, :, None] == np.array(shift_ids)).sum(axis=1)
+    daily_staff_count = lavorato.sum(axis=0)
+    daily_shift_breakdown = (matrice[None, :, :] == np.array(shift_ids)[:, None, None]).sum(axis=1)
+
+    # testo e formato di ogni cella
+    testi = TESTI[matrice]
+    chiusura_weekend = np.isin(np.arange(NUM_GIORNI) % 7, [4, 5])
+    testi[matrice == 9] = np.where(np.broadcast_to(chiusura_weekend, matrice.shape), "20-04", "18-02")[matrice == 9]
+    richiesti = np.zeros(matrice.shape, dtype=np.int8)
+    for n, nome in enumerate(ALL_STAFF):
+        for d, t in REQ_TURNI_INDICI.get(nome, {}).items():
+            if 0 <= d < NUM_GIORNI: richiesti[n, d] = t
+    codici = np.where((richiesti == matrice) & lavorato, matrice + _RICHIESTO, matrice)
+    ferie, req = _maschera(FERIE_INDICI, NUM_GIORNI), _maschera(REQ_OFF_INDICI, NUM_GIORNI)
+    codici = np.where(req, _REQ, codici)
+    codici = np.where(ferie, _FERIE, codici)
+    testi[req] = "REQ"
+    testi[ferie] = "FERIE"
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    sheet = workbook.add_worksheet("Turni")
+
+    fmt_base = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter'})
+    fmt_head = workbook.add_format({'border': 1, 'bold': True, 'bg_color': '#E7E6E6', 'align': 'center'})
+    fmt_name = workbook.add_format({'border': 1, 'bold': True, 'align': 'left', 'valign': 'vcenter'})
+    fmt_pct = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'num_format': '0%'})
+    fmt_total = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bold': True, 'bg_color': '#FFFF00'})
+
+    formati = [None] * (_REQ + 1)
+    formati[0] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': RIPOSO_CFG['bg'], 'font_color': RIPOSO_CFG['font']})
+    for t, cfg in TURNI_CONFIG.items():
+        formati[t] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': cfg['bg'], 'font_color': cfg['font']})
+        formati[t + _RICHIESTO] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': cfg['bg'], 'font_color': '#0000CC', 'bold': True})
+    formati[_FERIE] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#595959', 'font_color': '#FFFFFF', 'bold': True})
+    formati[_REQ] = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#E4DFEC', 'font_color': '#000000', 'bold': True})
+
+    # constant_memory: le righe vanno scritte in ordine, le larghezze colonna prima
+    sheet.set_column(0, 1, 20)
+    sheet.set_column(2, NUM_GIORNI+2, 5)
+
+    headers_cal = ['Ruolo', 'Dipendente'] + [testo_giorno(start_date, d)
+                                             for d in range(NUM_GIORNI)]
+    headers_stats = ["Tot", "Weekend", "Mat %", "Sera %", "Bilancio"] + [TURNI_CONFIG[t]['txt'] for t in shift_ids]
+    sheet.write_row(0, 0, headers_cal + headers_stats, fmt_head)
+
+    col = NUM_GIORNI + 2
+    r = 1
+    for n in ORGANICO.ordine_righe:
+        sheet.write(r, 0, ORGANICO.etichette[n], fmt_base)
+        sheet.write(r, 1, ALL_STAFF[n], fmt_name)
+        for d, (txt, codice) in enumerate(zip(testi[n].tolist(), codici[n].tolist())):
+            sheet.write_string(r, d+2, txt, formati[codice])
+
+        bal = "OK"
+        if abs(quota_m[n] - quota_l[n]) > 0.4: bal = "Sbil."
+        if not ORGANICO.bilanciati[n]: bal = "Fix"
+        sheet.write_row(r, col, [int(cnt_tot[n]), int(weekend_worked[n])], fmt_base)
+        sheet.write_row(r, col+2, [float(quota_m[n]), float(quota_l[n])], fmt_pct)
+        sheet.write(r, col+4, bal, fmt_base)
+        sheet.write_row(r, col+5, per_turno[n].tolist(), fmt_base)
+        r += 1
+
+    r += 2
+    sheet.write(r, 1, "STAFF AL LAVORO:", fmt_total)
+    sheet.write_row(r, 2, daily_staff_count.tolist(), fmt_total)
+    r += 2
+    sheet.write(r, 1, "DETTAGLIO ORARI:", fmt_head)
+    r += 1
+    for i, t_id in enumerate(shift_ids):
+        sheet.write(r, 1, TURNI_CONFIG[t_id]['txt'], formati[t_id])
+        sheet.write_row(r, 2, daily_shift_breakdown[i].tolist(), fmt_base)
+        r += 1
+
+    if report is not None:
+        sheet_stats = workbook.add_worksheet("Statistiche")
+        sheet_stats.set_column(0, 0, 22)
+        sheet_stats.set_column(1, 3, 14)
+        r = 0
+        for k, v in report.riepilogo().items():
+            sheet_stats.write(r, 0, k, fmt_name)
+            sheet_stats.write(r, 1, v, fmt_base)
+            r += 1
+        r += 1
+        righe = report.tabella_famiglie()  # vuota se il solver non e' partito (piano precedente gia' valido)
+        if righe: sheet_stats.write_row(r, 0, list(righe[0].keys()), fmt_head)
+        for riga in righe:
+            r += 1
+            sheet_stats.write_row(r, 0, list(riga.values()), fmt_base)
+    workbook.close()
+    return output
+
+
+def tabella_turni(start_date, matrice):
+    """Il piano in forma lunga, una riga per dipendente e giorno."""
+    import pandas as pd
+    NUM_GIORNI = matrice.shape[1]
+    return pd.DataFrame({
+        "dipendente": np.repeat(ALL_STAFF, NUM_GIORNI),
+        "data": np.tile(pd.date_range(start_date, periods=NUM_GIORNI).date, NUM_STAFF),
+        "id_turno": matrice.ravel(),
+        "turno": TESTI[matrice].ravel(),
+        "categoria": CATEGORIE[matrice].ravel(),
+    })
+
+
+def esporta_tabella(start_date, matrice, formato):
+    """La tabella di `tabella_turni` come bytes in uno dei FORMATI_TABELLA (parquet richiede pyarrow)."""
+    tabella = tabella_turni(start_date, matrice)
+    if formato == "csv": return tabella.to_csv(index=False).encode()
+    if formato == "json":
+        return tabella.assign(data=tabella["data"].astype(str)).to_json(orient="records", force_ascii=False).encode()
+    if formato == "parquet":
+        buf = io.BytesIO()
+        tabella.to_parquet(buf, index=False)
+        return buf.getvalue()
+    raise ValueError(f"Formato non supportato: {formato}")
@@ -0,0 +1,133 @@
+"""Import di un piano Excel esportato dall'app (foglio 'Turni').
+
+Il file e' letto in streaming (openpyxl read-only): una passata sull'intestazione per
+portare le colonne "Lun 05/01" sugli indici di giorno rispetto alla data d'inizio, poi le
+righe dei dipendenti fino alla prima riga vuota (sotto ci sono i totali). I testi delle
+celle sono tradotti in blocco con TEXT_TO_ID in una matrice densa dipendente x giorno; le
+celle "FERIE" e "REQ" diventano riposi ma restano anche come assenze del piano.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from turni.config import ALL_STAFF, NUM_STAFF, ORGANICO, TEXT_TO_ID
+
+MANCANTE = -1  # cella assente nel file o con testo non riconosciuto
+
+_INTESTAZIONE_GIORNO = re.compile(r"^\s*\w{3}\s+(\d{1,2})/(\d{1,2})\s*$")
+
+
+@dataclass
+class PianoImportato:
+    """Piano letto da Excel: `turni[n, d]` e' l'id del turno di ALL_STAFF[n] al giorno d, o MANCANTE."""
+    turni: np.ndarray
+    giorni_trovati: int = 0
+    nomi_sconosciuti: list = field(default_factory=list)
+    token_sconosciuti: dict = field(default_factory=dict)  # testo -> numero di celle
+    assenze: list = field(default_factory=list)            # dalle celle FERIE e REQ: {"nome", "tipo", "data"}
+
+    def come_soluzione(self):
+        """Formato di previous_solution, {(nome, giorno): turno}, senza le celle mancanti."""
+        righe, giorni = np.nonzero(self.turni != MANCANTE)
+        return {(ALL_STAFF[n], int(d)): int(self.turni[n, d]) for n, d in zip(righe, giorni)}
+
+    def input_riparazione(self, assenze=(), richieste=()):
+        """(assenze, richieste) da passare alla riparazione: quelle lette dal piano piu' le nuove."""
+        return unisci_input(self.assenze, [], assenze, richieste)
+
+    def avvisi(self):
+        """Testo per l'utente sui dati scartati, o None se il file e' stato letto tutto."""
+        avvisi = []
+        if self.nomi_sconosciuti: avvisi.append("Dipendenti non in organico: " + ", ".join(self.nomi_sconosciuti))
+        if self.token_sconosciuti:
+            avvisi.append("Turni non riconosciuti: " + ", ".join(f"'{t}' ({c} celle)" for t, c in self.token_sconosciuti.items()))
+        return "; ".join(avvisi) or None
+
+
+def unisci_input(assenze_piano, richieste_piano, assenze=(), richieste=()):
+    """Input di un piano gia' pubblicato piu' quelli nuovi: su uno stesso dipendente e giorno prevalgono i nuovi."""
+    giorno = lambda voce: voce["data"].date() if isinstance(voce["data"], datetime) else voce["data"]
+    nuove = {(v["nome"], giorno(v)) for v in list(assenze) + list(richieste)}
+    return ([a for a in assenze_piano if (a["nome"], giorno(a)) not in nuove] + list(assenze),
+            [r for r in richieste_piano if (r["nome"], giorno(r)) not in nuove] + list(richieste))
+
+
+def _giorno_da_intestazione(testo, start_date, atteso=0):
+    """Indice di giorno di un'intestazione "Lun 05/01" rispetto a start_date, o None.
+
+    L'anno non e' nell'intestazione: si prende la data piu' vicina al giorno `atteso`
+    (quello dopo la colonna precedente), cosi' anche i piani oltre i sei mesi restano in fila.
+    """
+    m = _INTESTAZIONE_GIORNO.match(str(testo)) if testo is not None else None
+    if not m: return None
+    giorno, mese = int(m[1]), int(m[2])
+    delta = []
+    for anno in (start_date.year - 1, start_date.year, start_date.year + 1):
+        try: delta.append((datetime(anno, mese, giorno) - start_date).days)
+        except ValueError: pass
+    return min(delta, key=lambda x: abs(x - atteso)) if delta else None
+
+
+def leggi_piano(file, start_date, num_days):
+    """Legge il foglio 'Turni' (o il primo foglio) di `file` sui giorni [start_date, +num_days)."""
+    import openpyxl
+    if not isinstance(start_date, datetime): start_date = datetime.combine(start_date, datetime.min.time())
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb["Turni"] if "Turni" in wb.sheetnames else wb.active
+        righe = ws.iter_rows(values_only=True)
+        intestazione = next(righe, None) or ()
+        if "Dipendente" not in intestazione: raise ValueError("Colonna 'Dipendente' non trovata.")
+        col_nome = intestazione.index("Dipendente")
+        colonne, giorni = [], []
+        atteso = 0
+        for c, testo in enumerate(intestazione):
+            d = _giorno_da_intestazione(testo, start_date, atteso)
+            if d is None: continue
+            atteso = d + 1
+            if 0 <= d < num_days:
+                colonne.append(c)
+                giorni.append(d)
+        if not colonne: raise ValueError("Nessuna colonna 'Lun gg/mm' nel periodo del piano.")
+
+        nomi, celle = [], []
+        for riga in righe:
+            nome = riga[col_nome] if col_nome < len(riga) else None
+            if nome is None or not str(nome).strip(): break
+            nomi.append(str(nome).strip())
+            celle.append([riga[c] if c < len(riga) and riga[c] is not None else "" for c in colonne])
+    finally:
+        wb.close()
+
+    # traduzione in blocco: ogni testo distinto passa da TEXT_TO_ID una volta sola
+    testi = np.char.strip(np.array(celle, dtype=object).reshape(len(nomi), len(colonne)).astype(str))
+    distinti, inverso, conteggi = np.unique(testi, return_inverse=True, return_counts=True)
+    tabella = np.array([TEXT_TO_ID.get(t, MANCANTE) for t in distinti], dtype=np.int8)
+    codici = tabella[inverso].reshape(testi.shape)
+    token_sconosciuti = {t: int(c) for t, c, id_ in zip(distinti, conteggi, tabella) if id_ == MANCANTE and t}
+
+    indici = ORGANICO.indice
+    righe_note = [r for r, nome in enumerate(nomi) if nome in indici]
+    turni = np.full((NUM_STAFF, num_days), MANCANTE, dtype=np.int8)
+    if righe_note:
+        turni[np.array([indici[nomi[r]] for r in righe_note])[:, None], np.array(giorni)[None, :]] = codici[righe_note]
+    assenze = []
+    for testo, tipo in (("FERIE", "Ferie"), ("REQ", "Richiesta OFF")):
+        for r, c in zip(*np.nonzero(testi == testo)):
+            if nomi[r] in indici:
+                assenze.append({"nome": nomi[r], "tipo": tipo, "data": (start_date + timedelta(days=giorni[c])).date()})
+    return PianoImportato(turni, len(colonne), [nome for nome in nomi if nome not in indici], token_sconosciuti, assenze)
+
+
+def parse_uploaded_schedule(file, start_date_obj, num_days):
+    """Piano caricato nel formato di previous_solution: (soluzione o None, messaggio o None).
+
+    Con una soluzione il messaggio elenca eventuali nomi o turni non riconosciuti.
+    """
+    try:
+        piano = leggi_piano(file, start_date_obj, num_days)
+        return piano.come_soluzione(), piano.avvisi()
+    except Exception as e: return None, str(e)
@@ -0,0 +1,199 @@
+"""Esecuzione dei calcoli in background: processi worker con coda e limite di concorrenza.
+
+Il GestoreJob vive nel processo del server (una istanza condivisa da tutte le sessioni),
+quindi un job sopravvive al reload della pagina: basta conoscerne l'id. Un job gira in un
+processo worker a se'; finito il job il worker resta in attesa del successivo, con import e
+modelli base gia' in memoria, e viene chiuso solo se il job e' annullato, il processo muore
+o il gestore e' chiuso (`chiudi()`, o uscendo da un blocco `with GestoreJob() as gestore`).
+"""
+
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+
+from turni.cache import CacheRisultati, chiave_calcolo
+
+# Numero massimo di calcoli contemporanei; ogni calcolo usa gia' piu' worker CP-SAT
+MAX_SOLVE_CONCORRENTI = int(os.environ.get("TURNI_MAX_SOLVE", max(1, (os.cpu_count() or 1) // 8)))
+# Job conclusi da conservare in memoria prima di scartare i piu' vecchi
+MAX_JOB_CONCLUSI = 50
+
+IN_CODA = "in coda"
+IN_ESECUZIONE = "in esecuzione"
+COMPLETATO = "completato"
+FALLITO = "fallito"
+ANNULLATO = "annullato"
+STATI_FINALI = (COMPLETATO, FALLITO, ANNULLATO)
+
+_RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class Job:
+    id: str
+    descrizione: str
+    kwargs: dict
+    stato: str = IN_CODA
+    creato: float = field(default_factory=time.time)
+    avviato: float | None = None
+    concluso: float | None = None
+    progressi: list = field(default_factory=list)
+    excel: bytes | None = None
+    report: object = None
+    soluzione: dict | None = None
+    errore: str | None = None
+    chiave: str = ""
+    da_cache: bool = False
+
+    @property
+    def attivo(self):
+        return self.stato not in STATI_FINALI
+
+
+class GestoreJob:
+    """Coda di job di calcolo eseguiti in processi separati, al massimo `max_concorrenti` insieme.
+
+    Prima di accodare consulta la cache: a parita' di input il job nasce gia' completato.
+    """
+
+    def __init__(self, max_concorrenti=None, cache=None):
+        self.max_concorrenti = max_concorrenti or MAX_SOLVE_CONCORRENTI
+        self.cache = cache if cache is not None else CacheRisultati()
+        self._jobs = {}
+        self._coda = deque()
+        self._processi = {}
+        self._liberi = []     # worker in attesa di un job: (processo, file di stderr)
+        self._chiuso = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+    def invia(self, descrizione, **kwargs):
+        """Accoda un calcolo (argomenti di solve_turni) e ne restituisce l'id."""
+        job = Job(id=uuid.uuid4().hex[:12], descrizione=descrizione, kwargs=kwargs, chiave=chiave_calcolo(**kwargs))
+        voce = self.cache.get(job.chiave)
+        if voce is not None:
+            job.excel, job.report, job.soluzione = voce["excel"], voce["report"], voce["soluzione"]
+            job.stato, job.da_cache = COMPLETATO, True
+            job.avviato = job.concluso = time.time()
+        with self._lock:
+            self._jobs[job.id] = job
+            if job.attivo: self._coda.append(job.id)
+            self._pulisci()
+            self._avvia()
+        return job.id
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def elenco(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.creato, reverse=True)
+
+    def posizione_in_coda(self, job_id):
+        with self._lock:
+            return list(self._coda).index(job_id) + 1 if job_id in self._coda else 0
+
+    def annulla(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.attivo: return False
+            if job_id in self._coda: self._coda.remove(job_id)
+            proc = self._processi.get(job_id)
+            job.stato = ANNULLATO
+            job.concluso = time.time()
+        if proc is not None: proc.terminate()
+        return True
+
+    def chiudi(self):
+        """Annulla i job non conclusi e chiude i worker, anche quelli in attesa del job successivo."""
+        with self._lock:
+            self._chiuso = True
+            attivi = [job_id for job_id, job in self._jobs.items() if job.attivo]
+        for job_id in attivi: self.annulla(job_id)
+        with self._lock:
+            liberi, self._liberi = self._liberi, []
+        for proc, errori in liberi: self._chiudi_worker(proc, errori)
+
+    def _avvia(self):
+        while self._coda and not self._chiuso and len(self._processi) < self.max_concorrenti:
+            job = self._jobs[self._coda.popleft()]
+            proc, errori = self._invia_a_worker(job.kwargs)
+            self._processi[job.id] = proc
+            job.stato = IN_ESECUZIONE
+            job.avviato = time.time()
+            threading.Thread(target=self._segui, args=(job, proc, errori, os.fstat(errori.fileno()).st_size), daemon=True).start()
+
+    def _invia_a_worker(self, kwargs):
+        """Passa il job a un worker in attesa ancora vivo, altrimenti a uno nuovo."""
+        while self._liberi:
+            proc, errori = self._liberi.pop()
+            try:
+                pickle.dump(kwargs, proc.stdin)
+                proc.stdin.flush()
+                return proc, errori
+            except OSError:
+                self._chiudi_worker(proc, errori)
+        errori = tempfile.TemporaryFile()
+        proc = subprocess.Popen([sys.executable, "-m", "turni.worker"], cwd=_RADICE,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errori)
+        pickle.dump(kwargs, proc.stdin)
+        proc.stdin.flush()
+        return proc, errori
+
+    @staticmethod
+    def _chiudi_worker(proc, errori):
+        try: proc.stdin.close()
+        except OSError: pass
+        proc.wait()
+        errori.close()
+
+    def _segui(self, job, proc, errori, inizio_errori):
+        """Legge i messaggi del worker fino alla fine del job, poi libera lo slot e tiene il worker se e' sano."""
+        concluso = False
+        while not concluso:
+            try: tipo, dati = pickle.load(proc.stdout)
+            except (EOFError, pickle.UnpicklingError): break
+            concluso = tipo in ("fatto", "errore")
+            with self._lock:
+                if not job.attivo: continue
+                if tipo == "progresso": job.progressi.append(dati)
+                elif tipo == "fatto":
+                    job.excel, job.report, job.soluzione = dati
+                    job.stato = COMPLETATO
+                elif tipo == "errore":
+                    job.errore = dati
+                    job.stato = FALLITO
+        if not concluso: proc.wait()
+        with self._lock:
+            if job.attivo:
+                errori.seek(inizio_errori)
+                job.stato = FALLITO
+                job.errore = f"Worker terminato (exit code {proc.returncode})\n" + errori.read().decode(errors="replace")
+            job.concluso = job.concluso or time.time()
+            del self._processi[job.id]
+            riusa = (concluso and not self._chiuso and job.stato != ANNULLATO and proc.poll() is None
+                     and len(self._liberi) < self.max_concorrenti)
+            if riusa: self._liberi.append((proc, errori))
+            self._avvia()
+        if not riusa: self._chiudi_worker(proc, errori)
+        if job.stato == COMPLETATO and job.excel:
+            self.cache.put(job.chiave, {"excel": job.excel, "report": job.report, "soluzione": job.soluzione,
+                                        "kwargs": job.kwargs})
+
+    def _pulisci(self):
+        conclusi = sorted((j for j in self._jobs.values() if not j.attivo), key=lambda j: j.concluso or j.creato)
+        for job in conclusi[:max(0, len(conclusi) - MAX_JOB_CONCLUSI)]:
+            del self._jobs[job.id]
@@ -0,0 +1,143 @@
+"""Organico di una sede: dipendenti, ruoli, permessi sui turni e rotazione notti.
+
+L'organico arriva da un file JSON (`turni/organico.json`, oppure quello indicato da
+`TURNI_ORGANICO`, uno per sede) ed e' compilato una volta sola in un Organico
+indicizzato: id interi per dipendenti e ruoli, bitset dei ruoli di ogni dipendente e
+maschere dei turni ammessi per (dipendente, giorno della settimana). Modello ed export
+consultano queste tabelle invece di confrontare nomi.
+
+Schema del file:
+
+    {"sede": "...",
+     "ruoli": {"solo_mattina": {"etichetta": "Solo Mattina", "ordine": 0,
+                                "vietati": [4, 5, ...], "bilanciamento": false}, ...},
+     "turni_riservati": {"9": ["accettatore", "notte"]},   # ruoli tutti necessari
+     "dipendenti": [{"nome": "...", "ruoli": ["..."],
+                     "ammessi": {"tutti": [9]},              # eccezioni a turni_riservati
+                     "vietati": {"tutti": [2], "Sab": [1]},  # per giorno o "tutti"
+                     "max_settimana": {"6": 2},              # turno -> massimo a settimana
+                     "bonus": {"1": 5}}, ...],                # turno -> premio nell'obiettivo
+     "rotazione_notti": ["...", ...]}
+
+I ruoli sono nell'ordine di precedenza dell'etichetta mostrata nell'Excel; `ordine`
+decide l'ordine delle righe (chi non ne ha va in fondo).
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from functools import cached_property
+
+ORGANICO_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "organico.json")
+ETICHETTA_DEFAULT = "Staff"
+
+
+@dataclass(frozen=True)
+class Organico:
+    """Organico compilato: il dipendente n e' `nomi[n]`, il ruolo r e' `ruoli[r]`."""
+    sede: str
+    nomi: tuple
+    ruoli: tuple
+    bit_ruoli: tuple           # per dipendente, bitset degli id ruolo
+    maschere: tuple            # per dipendente, 7 maschere (bit t = turno t ammesso, bit 0 = riposo)
+    bilanciati: tuple          # per dipendente, se entra nel bilanciamento mattine/sere
+    etichette: tuple           # per dipendente, ruolo mostrato nell'Excel
+    ordine_righe: tuple        # id dei dipendenti nell'ordine delle righe dell'Excel
+    rotazione: tuple           # id dei dipendenti nella rotazione notti
+    max_settimana: tuple       # (id, turno, massimo)
+    bonus: tuple               # (id, turno, peso)
+    dati: dict = field(default_factory=dict, compare=False)  # il JSON d'origine, per la chiave di cache
+
+    @cached_property
+    def indice(self):
+        return {nome: n for n, nome in enumerate(self.nomi)}
+
+    def bit(self, ruolo):
+        """Bit del ruolo, 0 se la sede non lo usa."""
+        return 1 << self.ruoli.index(ruolo) if ruolo in self.ruoli else 0
+
+    def con_ruolo(self, ruolo):
+        """Id dei dipendenti con il ruolo."""
+        b = self.bit(ruolo)
+        return [n for n, r in enumerate(self.bit_ruoli) if r & b]
+
+    def turni_ammessi(self, n, giorno_sett):
+        """Turni (0 = riposo) consentiti dal ruolo al dipendente n nel giorno della settimana."""
+        m = self.maschere[n][giorno_sett]
+        return {t for t in range(m.bit_length()) if m >> t & 1}
+
+
+def _maschera(turni):
+    m = 0
+    for t in turni: m |= 1 << int(t)
+    return m
+
+
+def compila_organico(dati, turni, giorni):
+    """Compila il dict del file JSON. `turni` sono gli id dei turni, `giorni` le sigle Lun..Dom."""
+    ruoli = dati.get("ruoli", {})
+    nomi_ruolo = tuple(ruoli)
+    riservati = {int(t): r for t, r in dati.get("turni_riservati", {}).items()}
+    dipendenti = {}
+    for d in dati.get("dipendenti", []):
+        if d["nome"] in dipendenti: raise ValueError(f"Dipendente ripetuto nell'organico: {d['nome']}")
+        dipendenti[d["nome"]] = d
+    for nome, d in dipendenti.items():
+        for r in d.get("ruoli", []):
+            if r not in ruoli: raise ValueError(f"Ruolo sconosciuto per {nome}: {r}")
+    for r in (r for lista in riservati.values() for r in lista):
+        if r not in ruoli: raise ValueError(f"Ruolo sconosciuto in turni_riservati: {r}")
+    noti = set(turni) | {0}
+    for t in riservati:
+        if t not in noti: raise ValueError(f"Turno sconosciuto in turni_riservati: {t}")
+
+    def per_giorno(voce, nome):
+        """{"tutti": [...], "Sab": [...]} -> 7 maschere."""
+        maschere = [0] * 7
+        for chiave, lista in voce.items():
+            if chiave != "tutti" and chiave not in giorni: raise ValueError(f"Giorno sconosciuto per {nome}: {chiave}")
+            if set(map(int, lista)) - noti: raise ValueError(f"Turno sconosciuto per {nome}: {lista}")
+            for g in (range(7) if chiave == "tutti" else [giorni.index(chiave)]): maschere[g] |= _maschera(lista)
+        return maschere
+
+    tutti = _maschera(noti)
+    nomi = tuple(sorted(dipendenti))
+    bit_ruoli, maschere, bilanciati, etichette, ordini = [], [], [], [], []
+    for nome in nomi:
+        d = dipendenti[nome]
+        propri = [r for r in nomi_ruolo if r in d.get("ruoli", [])]
+        bit_ruoli.append(sum(1 << nomi_ruolo.index(r) for r in propri))
+        base = tutti
+        for r in propri: base &= ~_maschera(ruoli[r].get("vietati", []))
+        for t, richiesti in riservati.items():
+            if not set(richiesti) <= set(propri): base &= ~(1 << t)
+        extra, vietati = per_giorno(d.get("ammessi", {}), nome), per_giorno(d.get("vietati", {}), nome)
+        maschere.append(tuple((base | extra[g]) & ~vietati[g] for g in range(7)))
+        bilanciati.append(all(ruoli[r].get("bilanciamento", True) for r in propri))
+        con_etichetta = sorted((ruoli[r].get("ordine", len(nomi_ruolo)), nomi_ruolo.index(r)) for r in propri if "etichetta" in ruoli[r])
+        etichette.append(ruoli[nomi_ruolo[con_etichetta[0][1]]]["etichetta"] if con_etichetta else ETICHETTA_DEFAULT)
+        ordini.append(min((ruoli[r]["ordine"] for r in propri if "ordine" in ruoli[r]), default=len(nomi_ruolo)))
+
+    indice = {nome: n for n, nome in enumerate(nomi)}
+    for nome in dati.get("rotazione_notti", []):
+        if nome not in indice: raise ValueError(f"Dipendente in rotazione_notti non in organico: {nome}")
+    return Organico(
+        sede=dati.get("sede", ""),
+        nomi=nomi,
+        ruoli=nomi_ruolo,
+        bit_ruoli=tuple(bit_ruoli),
+        maschere=tuple(maschere),
+        bilanciati=tuple(bilanciati),
+        etichette=tuple(etichette),
+        ordine_righe=tuple(sorted(range(len(nomi)), key=lambda n: ordini[n])),
+        rotazione=tuple(indice[nome] for nome in dati.get("rotazione_notti", [])),
+        max_settimana=tuple((indice[nome], int(t), int(m)) for nome in nomi
+                            for t, m in dipendenti[nome].get("max_settimana", {}).items()),
+        bonus=tuple((indice[nome], int(t), int(p)) for nome in nomi for t, p in dipendenti[nome].get("bonus", {}).items()),
+        dati=dati,
+    )
+
+
+def carica_organico(percorso, turni, giorni):
+    """Legge e compila il file JSON dell'organico."""
+    with open(percorso, encoding="utf-8") as f: return compila_organico(json.load(f), turni, giorni)
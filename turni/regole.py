@@ -0,0 +1,92 @@
+"""Regole dei turni condivise da motore, controllo del piano, diagnosi ed export.
+
+Niente CP-SAT qui: il controllo di un piano (turni.controllo) e la verifica preliminare le
+usano senza costruire un modello, il motore le stesse per i vincoli.
+"""
+
+from datetime import datetime, timedelta
+
+from turni.config import ALL_STAFF, NUM_STAFF, ORGANICO, GIORNI_LAVORO_SETTIMANA, GIORNI_SETT_IT, TURNI_CONFIG
+
+MAX_ID_TURNO = max(TURNI_CONFIG)
+# Turni serali che contano per i 2 accettatori di sera: 16:00, 17:00 e CHIUSURA
+TURNI_SERA = (8, 10, 9)
+
+
+def testo_giorno(start_date, d):
+    """Intestazione del giorno d del piano che parte da start_date, come nell'Excel: "Lun 05/01"."""
+    return f"{GIORNI_SETT_IT[d % 7]} {(start_date + timedelta(days=int(d))):%d/%m}"
+
+
+def turni_ammessi(n, giorno_sett):
+    """Turni (0 = riposo) consentiti al dipendente n dall'organico in un giorno della settimana."""
+    ammessi = ORGANICO.turni_ammessi(n, giorno_sett)
+    # il 17:00 esiste solo venerdi' e sabato
+    if giorno_sett not in (4, 5): ammessi.discard(10)
+    return ammessi
+
+
+def domini_turni(NUM_GIORNI, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI):
+    """Dominio di ogni cella (n, d): vincoli di ruolo, assenze e richieste applicati a monte."""
+    base = [[turni_ammessi(n, g) for g in range(7)] for n in range(NUM_STAFF)]
+    domini = {}
+    for n, nome in enumerate(ALL_STAFF):
+        assenze = set(FERIE_INDICI.get(nome, [])) | set(REQ_OFF_INDICI.get(nome, []))
+        richieste = REQ_TURNI_INDICI.get(nome, {})
+        for d in range(NUM_GIORNI):
+            ammessi = {0} if d in assenze else set(base[n][d % 7])
+            if d in richieste: ammessi &= {richieste[d]}
+            domini[(n, d)] = ammessi
+    return domini
+
+
+def applica_rotazione(domini, NUM_GIORNI, NUM_SETTIMANE, FERIE_INDICI, REQ_OFF_INDICI, settimana_iniziale=0):
+    """Restringe i domini alla rotazione notti: CHIUSURA venerdi' e sabato, riposo la domenica."""
+    if not ORGANICO.rotazione: return
+    for w in range(NUM_SETTIMANE):
+        n = ORGANICO.rotazione[(settimana_iniziale + w) % len(ORGANICO.rotazione)]
+        nome_rot = ALL_STAFF[n]
+        ven = 4 + (w*7); sab = 5 + (w*7); dom = 6 + (w*7)
+        if ven >= NUM_GIORNI: continue
+        assenze = set(FERIE_INDICI.get(nome_rot, [])) | set(REQ_OFF_INDICI.get(nome_rot, []))
+        if ven in assenze or sab in assenze: continue
+        domini[(n, ven)] &= {9}
+        if sab < NUM_GIORNI: domini[(n, sab)] &= {9}
+        if dom < NUM_GIORNI: domini[(n, dom)] &= {0}
+
+
+def target_settimanale(nome, s, e, FERIE_INDICI, REQ_OFF_INDICI):
+    """Giorni da lavorare nei giorni [s, e): GIORNI_LAVORO_SETTIMANA meno ferie e richieste OFF."""
+    giorni_ferie_sett = sum(1 for fd in FERIE_INDICI.get(nome, []) if s <= fd < e)
+    giorni_ferie_sett += sum(1 for fd in REQ_OFF_INDICI.get(nome, []) if s <= fd < e)
+    return max(0, GIORNI_LAVORO_SETTIMANA - giorni_ferie_sett)
+
+
+def indici_input(start_date, NUM_GIORNI, list_assenze, list_req_turni):
+    """Porta assenze e richieste (per data) sugli indici di giorno del piano che parte da start_date."""
+    if isinstance(start_date, datetime): start_date = start_date
+    else: start_date = datetime.combine(start_date, datetime.min.time())
+    
+    FERIE_INDICI = {}
+    REQ_OFF_INDICI = {}
+    REQ_TURNI_INDICI = {}
+
+    for item in list_assenze:
+        nome = item['nome']
+        tipo = item['tipo']
+        d_input = item['data']
+        if not isinstance(d_input, datetime): d_input = datetime.combine(d_input, datetime.min.time())
+        delta = (d_input - start_date).days
+        if 0 <= delta < NUM_GIORNI:
+            if tipo == "Ferie": FERIE_INDICI.setdefault(nome, []).append(delta)
+            elif tipo == "Richiesta OFF": REQ_OFF_INDICI.setdefault(nome, []).append(delta)
+
+    for item in list_req_turni:
+        nome = item['nome']
+        d_input = item['data']
+        if not isinstance(d_input, datetime): d_input = datetime.combine(d_input, datetime.min.time())
+        t_id = int(str(item['turno']).split(" - ")[0])
+        delta = (d_input - start_date).days
+        if 0 <= delta < NUM_GIORNI: REQ_TURNI_INDICI.setdefault(nome, {})[delta] = t_id
+
+    return start_date, FERIE_INDICI, REQ_OFF_INDICI, REQ_TURNI_INDICI
@@ -0,0 +1,157 @@
+"""Scenari what-if: varianti di assenze e richieste risolte in parallelo e confrontate.
+
+Ogni scenario aggiunge assenze e richieste a quelle del piano base e gira come job a se'
+(un processo worker ciascuno, vedi turni.jobs) con il proprio tempo massimo; i worker
+CP-SAT disponibili sono divisi tra gli scenari che girano insieme. Le varianti sono sempre
+riparazioni del piano base: quello pubblicato se c'e', altrimenti il base e' calcolato
+prima di loro. Il confronto e' fatto sulle matrici dipendente x giorno: obiettivo, scoperture
+rispetto al fabbisogno ideale per turno e giorno, weekend lavorati e celle cambiate
+rispetto al base.
+"""
+
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from turni.config import PROFILI_SOLVER, TURNI_CONFIG
+from turni.esporta import matrice_da_soluzione, soluzione_da_matrice
+from turni.importa import unisci_input
+from turni.jobs import COMPLETATO, GestoreJob
+
+BASE = "Base"
+TURNI = sorted(TURNI_CONFIG)
+# Fabbisogno ideale per turno (righe in ordine TURNI) e giorno della settimana; il 17:00 solo venerdi' e sabato
+FABBISOGNO = np.array([[TURNI_CONFIG[t]['ideale'] if t != 10 or g in (4, 5) else 0 for g in range(7)] for t in TURNI])
+
+
+@dataclass
+class Scenario:
+    """Variante del piano base: assenze e richieste in aggiunta a quelle del base."""
+    nome: str
+    assenze: list = field(default_factory=list)
+    richieste: list = field(default_factory=list)
+
+
+@dataclass
+class EsitoScenario:
+    """Risultato di uno scenario: `matrice` e' None se non risolto."""
+    nome: str
+    stato: str
+    matrice: object = None
+    report: object = None
+    excel: bytes | None = None
+    errore: str | None = None
+
+    @property
+    def risolto(self):
+        return self.matrice is not None
+
+
+def profilo_scenario(profilo, max_tempo, paralleli):
+    """Profilo di calcolo di uno scenario: tempo massimo proprio e core divisi tra `paralleli` scenari."""
+    cfg = dict(PROFILI_SOLVER[profilo])
+    cfg["label"] = f"{cfg['label']} (scenario, max {max_tempo} s)"
+    cfg["max_time"] = max_tempo
+    cfg["workers"] = max(1, min(cfg["workers"], (os.cpu_count() or 1) // max(1, paralleli)))
+    return cfg
+
+
+def calcolo_base(start_date, settimane, assenze_base=(), richieste_base=(), profilo="bilanciato", max_tempo=60,
+                 paralleli=None, **opzioni):
+    """(nome, descrizione, kwargs di solve_turni) del piano base, da risolvere prima degli scenari se non ce n'e' uno pubblicato.
+
+    Gira da solo, con tutti i core: `paralleli` (come in `calcoli_scenari`) e' ignorato.
+    """
+    return (BASE, f"Scenario {BASE}: {start_date} x {settimane} sett.",
+            dict(opzioni, start_date=start_date, weeks_to_generate=settimane, list_assenze=list(assenze_base),
+                 list_req_turni=list(richieste_base), profilo=profilo_scenario(profilo, max_tempo, 1)))
+
+
+def calcoli_scenari(start_date, settimane, scenari, assenze_base=(), richieste_base=(), piano_base=None,
+                    profilo="bilanciato", max_tempo=60, paralleli=None, **opzioni):
+    """[(nome, descrizione, kwargs di solve_turni)], uno per scenario, riparazioni di `piano_base`.
+
+    `piano_base` ({(nome, giorno): turno}) e' quello pubblicato o quello di `calcolo_base` gia'
+    risolto: partendo dallo stesso piano con il peso di stabilita' di solve_turni, le celle
+    cambiate misurano l'effetto dello scenario e non il rumore del solver. Gli input di uno
+    scenario prevalgono su quelli del base nello stesso giorno (turni.importa.unisci_input). Le `opzioni`
+    passano a solve_turni (model_backend, report_sheet, riparazione_locale, ...). `paralleli` e' quanti
+    calcoli girano insieme (gli slot del GestoreJob), per dividere i core; di default tutti.
+    """
+    if piano_base is None: raise ValueError("Gli scenari riparano un piano base: risolvi prima calcolo_base")
+    cfg = profilo_scenario(profilo, max_tempo, min(paralleli or len(scenari), max(1, len(scenari))))
+    risultato = []
+    for s in scenari:
+        list_assenze, list_req_turni = unisci_input(assenze_base, richieste_base, s.assenze, s.richieste)
+        risultato.append((s.nome, f"Scenario {s.nome}: {start_date} x {settimane} sett.",
+                          dict(opzioni, start_date=start_date, weeks_to_generate=settimane, list_assenze=list_assenze,
+                               list_req_turni=list_req_turni, previous_solution=piano_base, profilo=cfg)))
+    return risultato
+
+
+def esito_job(nome, job, num_giorni):
+    """EsitoScenario da un Job concluso di turni.jobs."""
+    if job.stato != COMPLETATO: return EsitoScenario(nome, job.stato, errore=job.errore)
+    matrice = matrice_da_soluzione(job.soluzione, num_giorni) if job.soluzione else None
+    return EsitoScenario(nome, job.report.stato, matrice, job.report, job.excel)
+
+
+def _esegui(gestore, calcoli, num_giorni):
+    ids = [(nome, gestore.invia(descrizione, **kwargs)) for nome, descrizione, kwargs in calcoli]
+    while any(gestore.job(job_id).attivo for _, job_id in ids): time.sleep(0.2)
+    return [esito_job(nome, gestore.job(job_id), num_giorni) for nome, job_id in ids]
+
+
+def confronta_scenari(start_date, settimane, scenari, assenze_base=(), richieste_base=(), piano_base=None,
+                      gestore=None, **opzioni):
+    """Risolve gli scenari in parallelo come riparazioni del base e restituisce gli EsitoScenario (il base per primo).
+
+    Senza `piano_base` il base e' risolto prima (`calcolo_base`); se non ha soluzione gli
+    scenari non partono e torna solo il suo esito. Senza `gestore` usa un GestoreJob con uno
+    slot per scenario, chiuso alla fine insieme ai suoi worker; le altre opzioni come in
+    `calcoli_scenari`. Blocca fino alla fine di tutti i calcoli.
+    """
+    num_giorni = 7 * settimane
+    if gestore is not None: opzioni.setdefault("paralleli", gestore.max_concorrenti)
+    with GestoreJob(max_concorrenti=max(1, len(scenari))) if gestore is None else nullcontext(gestore) as gestore:
+        if piano_base is None:
+            [base] = _esegui(gestore, [calcolo_base(start_date, settimane, assenze_base, richieste_base, **opzioni)], num_giorni)
+            if not base.risolto: return [base]
+            piano_base = soluzione_da_matrice(base.matrice)
+        else:
+            base = EsitoScenario(BASE, "PUBBLICATO", matrice_da_soluzione(piano_base, num_giorni))
+        calcoli = calcoli_scenari(start_date, settimane, scenari, assenze_base, richieste_base, piano_base, **opzioni)
+        return [base] + _esegui(gestore, calcoli, num_giorni)
+
+
+def scoperture(matrice):
+    """Posti scoperti rispetto al fabbisogno ideale, matrice turno (ordine TURNI) x giorno."""
+    conteggi = (matrice[None, :, :] == np.array(TURNI)[:, None, None]).sum(axis=1)
+    return np.maximum(0, FABBISOGNO[:, np.arange(matrice.shape[1]) % 7] - conteggi)
+
+
+def tabella_confronto(esiti, base=BASE):
+    """Una riga per scenario: obiettivo, scoperture per turno, weekend e celle cambiate rispetto al base."""
+    matrice_base = next((e.matrice for e in esiti if e.nome == base and e.risolto), None)
+    righe = []
+    for e in esiti:
+        riga = {"Scenario": e.nome, "Stato": e.stato,
+                "Obiettivo": e.report.obiettivo if e.report is not None else None,
+                "Secondi": round(e.report.tempo_solver, 1) if e.report is not None else None}
+        if e.risolto:
+            mancanti = scoperture(e.matrice)
+            lavorato = e.matrice > 0
+            weekend = (lavorato[:, 5::7] | lavorato[:, 6::7]).sum(axis=1)
+            riga["Scoperture"] = int(mancanti.sum())
+            riga.update({f"Scop. {TURNI_CONFIG[t]['txt']}": int(v) for t, v in zip(TURNI, mancanti.sum(axis=1))})
+            riga["Weekend max"] = int(weekend.max())
+            riga["Scarto weekend"] = int(weekend.max() - weekend.min())
+            if matrice_base is not None:
+                cambiate = e.matrice != matrice_base
+                riga["Celle cambiate"] = int(cambiate.sum())
+                riga["Dipendenti toccati"] = int(cambiate.any(axis=1).sum())
+        righe.append(riga)
+    return righe
@@ -0,0 +1,35 @@
+"""Processo worker dei job di calcolo (`python -m turni.worker`).
+
+Legge da stdin gli argomenti di solve_turni (un pickle per job) e per ogni job scrive su
+stdout una sequenza di messaggi pickle `(tipo, dati)`: "progresso" per ogni soluzione
+migliorativa, poi "fatto" con (bytes dell'Excel o None, ReportSolver, soluzione) oppure
+"errore" con il traceback. Resta in attesa del job successivo finche' stdin non si chiude,
+cosi' import e modelli base (vedi turni.engine._modello_base) servono a piu' calcoli.
+"""
+
+import pickle
+import sys
+import traceback
+
+
+def main():
+    canale = sys.stdout.buffer
+    sys.stdout = sys.stderr  # eventuali print non devono finire nel canale dei messaggi
+
+    def invia(tipo, dati):
+        pickle.dump((tipo, dati), canale)
+        canale.flush()
+
+    while True:
+        try: kwargs = pickle.load(sys.stdin.buffer)
+        except EOFError: return
+        try:
+            from turni.engine import solve_turni
+            res, report, soluzione = solve_turni(on_progress=lambda p: invia("progresso", p), **kwargs)
+            invia("fatto", (res.getvalue() if res else None, report, soluzione))
+        except Exception:
+            invia("errore", traceback.format_exc())
+
+
+if __name__ == "__main__":
+    main()